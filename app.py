@@ -1,32 +1,45 @@
 import os
 import sys
-import base64
 import json
 import re
 import time
 import uuid
-import requests
 import logging
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify
-import pdfplumber
-import PyPDF2
-from io import BytesIO
-from PIL import Image
 from openai import OpenAI
 from dotenv import load_dotenv
+from app.utils.logging_utils import configure_logging
+from app.utils.json_provider import FastJSONProvider
+from app.utils.compression import RequestDecompressionMiddleware, compress_response
+from app.utils.fact_utils import normalize_facts, build_conflict_links, build_signal_links
+from app.utils.fact_model import FactSource, facts_from_dicts, facts_to_dicts
+from app.services.analysis_cache_service import conditional_analysis
+from app.utils.prompt_format import format_fact_matrix, format_signals, count_tokens
+from app.prompts.layout import build_messages
+from app.config import Config
+from app.services import image_service
+from app.services.image_service import ImageDeduplicator
+from app.services.pdf_service import extract_pdf_content
+from app.services.vision_service import VisionDetailPlanner, get_image_role
+from app.services import model_router
+from app.services.model_router import TASK_CLASSIFICATION, TASK_SUMMARY, TASK_TIMELINE, TASK_EMAIL_DRAFT
+from app.services.metrics_service import (
+    span, record_token_usage, STAGE_UPLOAD_SAVE, STAGE_PDF_PARSE,
+    STAGE_CLASSIFICATION, STAGE_MODEL_CALL, STAGE_CONFLICT_DETECTION
+)
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (LOG_LEVEL, LOG_FORMAT, LOG_ASYNC)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = FastJSONProvider(app)
+app.wsgi_app = RequestDecompressionMiddleware(app.wsgi_app)  # Accept gzip/deflate request bodies
+app.after_request(compress_response)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # Session configuration for login authentication
@@ -57,15 +70,13 @@ else:
     openai_client = None
     print("Warning: OPENAI_API_KEY not found in environment variables")
 
-# Image processing configuration (memory optimization)
-IMAGE_DPI = int(os.getenv('IMAGE_DPI', '72'))  # Reduced from 150 to 72
-MAX_IMAGE_DIMENSION = int(os.getenv('MAX_IMAGE_DIMENSION', '2048'))  # Max width or height in pixels
-MAX_IMAGE_SIZE_MB = float(os.getenv('MAX_IMAGE_SIZE_MB', '2.0'))  # Max size per image after compression
-MAX_IMAGE_SIZE_BYTES = int(MAX_IMAGE_SIZE_MB * 1024 * 1024)
-MAX_IMAGES_PER_PAGE = int(os.getenv('MAX_IMAGES_PER_PAGE', '5'))  # Max images per PDF page
-MAX_IMAGES_PER_PDF = int(os.getenv('MAX_IMAGES_PER_PDF', '20'))  # Max total images per PDF
-MAX_TOTAL_IMAGES_PER_REQUEST = int(os.getenv('MAX_TOTAL_IMAGES_PER_REQUEST', '50'))  # Max images across all files
-JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', '85'))  # JPEG compression quality (1-100)
+
+def _completion_json(response):
+    """Parse a JSON-mode completion's content, or None if it is not valid JSON."""
+    try:
+        return json.loads(response.choices[0].message.content)
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
 
 
 # OpenAI API helper function with retry logic and optimization
@@ -76,19 +87,21 @@ def call_openai_api(
     temperature=0.0,
     response_format=None,
     timeout=120,
-    max_retries=3
+    max_retries=3,
+    model=None
 ):
     """
     Centralized OpenAI API call helper with retry logic, timeout, and optimized parameters.
     
     Args:
-        system_prompt: System message content (instructions)
+        system_prompt: System message content (instructions), or static instruction blocks joined in order
         user_content: User message content (can be str, list of dicts for multimodal)
         max_tokens: Maximum tokens in response
         temperature: Temperature (0.0-2.0), default 0.0 for deterministic outputs
         response_format: Optional response format dict (e.g., {"type": "json_object"})
         timeout: Request timeout in seconds (default 120)
         max_retries: Maximum number of retry attempts (default 3)
+        model: Model to use (default: Config.OPENAI_MODEL)
     
     Returns:
         Response object from OpenAI API
@@ -99,22 +112,9 @@ def call_openai_api(
     if not openai_client:
         raise Exception("OpenAI client not initialized. Please set OPENAI_API_KEY in your environment.")
     
-    # Build messages array with proper system/user separation
-    messages = []
-    if system_prompt:
-        messages.append({
-            "role": "system",
-            "content": system_prompt
-        })
-    
-    if user_content:
-        messages.append({
-            "role": "user",
-            "content": user_content
-        })
-    
-    if not messages:
-        raise ValueError("At least one of system_prompt or user_content must be provided")
+    # Static instructions first, request data after, so repeated calls share a cacheable prefix
+    messages = build_messages(system_prompt, user_content)
+    system_prompt = messages[0]["content"] if messages[0]["role"] == "system" else None
     
     # Estimate tokens (rough: 1 token ≈ 4 characters for text)
     estimated_input_tokens = 0
@@ -135,7 +135,7 @@ def call_openai_api(
     
     # Prepare API call parameters
     api_params = {
-        "model": "gpt-4o",
+        "model": model or Config.OPENAI_MODEL,
         "messages": messages,
         "max_tokens": max_tokens,
         "temperature": temperature,
@@ -149,7 +149,9 @@ def call_openai_api(
     last_exception = None
     for attempt in range(max_retries):
         try:
-            response = openai_client.chat.completions.create(**api_params)
+            with span(STAGE_MODEL_CALL):
+                response = openai_client.chat.completions.create(**api_params)
+            record_token_usage(api_params["model"], getattr(response, 'usage', None))
             return response
         
         except Exception as e:
@@ -181,308 +183,21 @@ def call_openai_api(
     raise Exception(f"OpenAI API call failed: {str(last_exception)}")
 
 
-def optimize_image(pil_image):
-    """
-    Optimize image for memory efficiency: resize if needed, convert to JPEG, compress.
-    Returns (optimized_image_bytes, mime_type) or None if optimization fails.
-    """
-    try:
-        # Convert RGBA to RGB if needed (JPEG doesn't support transparency)
-        if pil_image.mode in ('RGBA', 'LA', 'P'):
-            # Create white background
-            rgb_image = Image.new('RGB', pil_image.size, (255, 255, 255))
-            if pil_image.mode == 'P':
-                pil_image = pil_image.convert('RGBA')
-            rgb_image.paste(pil_image, mask=pil_image.split()[-1] if pil_image.mode in ('RGBA', 'LA') else None)
-            pil_image = rgb_image
-        elif pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
-        
-        # Resize if dimensions exceed maximum
-        width, height = pil_image.size
-        if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
-            # Calculate new dimensions maintaining aspect ratio
-            ratio = min(MAX_IMAGE_DIMENSION / width, MAX_IMAGE_DIMENSION / height)
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Compress to JPEG with quality setting
-        img_buffer = BytesIO()
-        pil_image.save(img_buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
-        img_bytes = img_buffer.getvalue()
-        
-        # Check if image size exceeds limit
-        if len(img_bytes) > MAX_IMAGE_SIZE_BYTES:
-            # Try reducing quality progressively
-            for quality in [75, 65, 55, 45]:
-                img_buffer = BytesIO()
-                pil_image.save(img_buffer, format='JPEG', quality=quality, optimize=True)
-                img_bytes = img_buffer.getvalue()
-                if len(img_bytes) <= MAX_IMAGE_SIZE_BYTES:
-                    break
-            
-            # If still too large, resize further
-            if len(img_bytes) > MAX_IMAGE_SIZE_BYTES:
-                current_width, current_height = pil_image.size
-                scale_factor = (MAX_IMAGE_SIZE_BYTES / len(img_bytes)) ** 0.5
-                new_width = max(100, int(current_width * scale_factor))
-                new_height = max(100, int(current_height * scale_factor))
-                pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                img_buffer = BytesIO()
-                pil_image.save(img_buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
-                img_bytes = img_buffer.getvalue()
-        
-        return img_bytes, 'image/jpeg'
-    
-    except Exception as e:
-        print(f"Error optimizing image: {str(e)}")
-        return None, None
-
-
-def extract_pdf_content(pdf_path):
-    """
-    Extract full content from PDF including text, images, and metadata.
-    Returns a dictionary with page-by-page content.
-    """
-    result = {
-        'pages': [],
-        'metadata': {
-            'page_count': 0,
-            'title': '',
-            'author': '',
-            'subject': '',
-        }
-    }
-    
-    # Extract text and metadata using pdfplumber
-    with pdfplumber.open(pdf_path) as pdf:
-        result['metadata']['page_count'] = len(pdf.pages)
-        
-        # Get metadata
-        if pdf.metadata:
-            result['metadata']['title'] = pdf.metadata.get('Title', '')
-            result['metadata']['author'] = pdf.metadata.get('Author', '')
-            result['metadata']['subject'] = pdf.metadata.get('Subject', '')
-        
-        # Extract text and images from each page
-        total_images_extracted = 0
-        for page_num, page in enumerate(pdf.pages):
-            # Extract text
-            text = page.extract_text() or ''
-            
-            # Extract images from pdfplumber (with limits)
-            images = []
-            if page.images and total_images_extracted < MAX_IMAGES_PER_PDF:
-                for img_index, img_obj in enumerate(page.images):
-                    # Limit images per page
-                    if len(images) >= MAX_IMAGES_PER_PAGE:
-                        break
-                    
-                    # Limit total images per PDF
-                    if total_images_extracted >= MAX_IMAGES_PER_PDF:
-                        break
-                    
-                    try:
-                        # Get image bounding box
-                        bbox = (img_obj.get('x0', 0), img_obj.get('top', 0), 
-                                img_obj.get('x1', 0), img_obj.get('bottom', 0))
-                        if bbox[2] > bbox[0] and bbox[3] > bbox[1]:
-                            cropped = page.crop(bbox)
-                            
-                            # Try to get image as PIL Image using pdfplumber's to_image
-                            try:
-                                # Use reduced DPI for memory efficiency
-                                pil_image = cropped.to_image(resolution=IMAGE_DPI)
-                                
-                                # Optimize image (resize, compress, convert to JPEG)
-                                img_bytes, mime_type = optimize_image(pil_image)
-                                
-                                if img_bytes and mime_type:
-                                    # Convert to base64
-                                    image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-                                    images.append({
-                                        'index': img_index,
-                                        'data': f"data:{mime_type};base64,{image_base64}",
-                                        'ext': 'jpg'
-                                    })
-                                    total_images_extracted += 1
-                                    
-                                    # Explicitly delete large objects to free memory
-                                    del pil_image
-                                    del img_bytes
-                                else:
-                                    print(f"Warning: Failed to optimize image {img_index} from page {page_num}")
-                                
-                            except MemoryError as mem_error:
-                                print(f"Memory error extracting image {img_index} from page {page_num}: {mem_error}")
-                                break  # Stop processing images on this page if out of memory
-                            except Exception as img_error:
-                                print(f"Error converting image {img_index} from page {page_num} to PIL: {img_error}")
-                    except MemoryError as mem_error:
-                        print(f"Memory error processing image {img_index} from page {page_num}: {mem_error}")
-                        break
-                    except Exception as e:
-                        print(f"Error extracting image {img_index} from page {page_num}: {e}")
-            
-            # Get page dimensions
-            width = page.width
-            height = page.height
-            
-            result['pages'].append({
-                'page_number': page_num + 1,
-                'text': text,
-                'images': images,
-                'width': width,
-                'height': height
-            })
-    
-    # Also try to extract images using PyPDF2 as fallback (with optimization)
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num, page in enumerate(pdf_reader.pages):
-                # Skip if we've already hit the limit
-                if page_num < len(result['pages']):
-                    current_page_images = len(result['pages'][page_num]['images'])
-                    if current_page_images >= MAX_IMAGES_PER_PAGE:
-                        continue
-                
-                try:
-                    if '/Resources' in page and '/XObject' in page['/Resources']:
-                        xobjects = page['/Resources']['/XObject']
-                        if hasattr(xobjects, 'get_object'):
-                            xobjects = xobjects.get_object()
-                        
-                        for obj_name, obj in xobjects.items():
-                            # Check limits
-                            if page_num < len(result['pages']):
-                                if len(result['pages'][page_num]['images']) >= MAX_IMAGES_PER_PAGE:
-                                    break
-                                if total_images_extracted >= MAX_IMAGES_PER_PDF:
-                                    break
-                            
-                            if hasattr(obj, 'get') and obj.get('/Subtype') == '/Image':
-                                try:
-                                    # Extract image data
-                                    data = obj.get_data()
-                                    
-                                    # Check raw data size before processing
-                                    if len(data) > MAX_IMAGE_SIZE_BYTES * 3:  # Allow 3x before compression
-                                        print(f"Skipping very large image from PyPDF2 on page {page_num} ({len(data)} bytes)")
-                                        continue
-                                    
-                                    # Try to load and optimize the image
-                                    try:
-                                        img_buffer = BytesIO(data)
-                                        pil_image = Image.open(img_buffer)
-                                        img_bytes, mime_type = optimize_image(pil_image)
-                                        
-                                        if img_bytes and mime_type:
-                                            # Convert to base64
-                                            image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-                                            
-                                            # Add to images
-                                            if page_num < len(result['pages']):
-                                                new_index = len(result['pages'][page_num]['images'])
-                                                result['pages'][page_num]['images'].append({
-                                                    'index': new_index,
-                                                    'data': f"data:{mime_type};base64,{image_base64}",
-                                                    'ext': 'jpg'
-                                                })
-                                                total_images_extracted += 1
-                                                
-                                                # Clean up
-                                                del pil_image
-                                                del img_bytes
-                                        else:
-                                            # Fallback: use original data if optimization fails
-                                            image_base64 = base64.b64encode(data).decode('utf-8')
-                                            ext = 'jpg' if '/DCTDecode' in str(obj.get('/Filter', '')) else 'png'
-                                            if page_num < len(result['pages']):
-                                                new_index = len(result['pages'][page_num]['images'])
-                                                result['pages'][page_num]['images'].append({
-                                                    'index': new_index,
-                                                    'data': f"data:image/{ext};base64,{image_base64}",
-                                                    'ext': ext
-                                                })
-                                                total_images_extracted += 1
-                                    except Exception as img_process_error:
-                                        # Fallback: use original data
-                                        image_base64 = base64.b64encode(data).decode('utf-8')
-                                        ext = 'jpg' if '/DCTDecode' in str(obj.get('/Filter', '')) else 'png'
-                                        if page_num < len(result['pages']):
-                                            new_index = len(result['pages'][page_num]['images'])
-                                            result['pages'][page_num]['images'].append({
-                                                'index': new_index,
-                                                'data': f"data:image/{ext};base64,{image_base64}",
-                                                'ext': ext
-                                            })
-                                            total_images_extracted += 1
-                                    
-                                except MemoryError as mem_error:
-                                    print(f"Memory error extracting PyPDF2 image from page {page_num}: {mem_error}")
-                                    break
-                                except Exception as e:
-                                    print(f"Error extracting image with PyPDF2 from page {page_num}: {e}")
-                except MemoryError as mem_error:
-                    print(f"Memory error processing page {page_num} with PyPDF2: {mem_error}")
-                    break
-                except Exception as e:
-                    print(f"Error processing page {page_num} with PyPDF2: {e}")
-    except MemoryError as mem_error:
-        print(f"Memory error in PyPDF2 image extraction: {mem_error}")
-    except Exception as e:
-        print(f"Error in PyPDF2 image extraction: {e}")
-    
-    return result
-
-
 # Root route moved to app/routes/main.py blueprint
 # This allows for login authentication before accessing the review page
 
 
 def extract_image_content(image_path):
     """
-    Extract content from an image file with memory optimization.
-    Returns a dictionary with image data.
+    Extract content from an image file with image_service, which records its
+    perceptual hash for deduplication. The optimized width and height are also
+    returned at the top level for the upload preview.
     """
-    try:
-        with Image.open(image_path) as img:
-            # Get original image dimensions
-            original_width, original_height = img.size
-            
-            # Optimize image (resize if needed, compress, convert to JPEG)
-            img_bytes, mime_type = optimize_image(img.copy())
-            
-            if not img_bytes or not mime_type:
-                raise Exception('Failed to optimize image')
-            
-            # Get final dimensions after optimization
-            optimized_img = Image.open(BytesIO(img_bytes))
-            final_width, final_height = optimized_img.size
-            optimized_img.close()
-            
-            # Convert to base64
-            image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-            
-            # Check size limit
-            if len(img_bytes) > MAX_IMAGE_SIZE_BYTES:
-                print(f"Warning: Image {os.path.basename(image_path)} size ({len(img_bytes)} bytes) exceeds limit ({MAX_IMAGE_SIZE_BYTES} bytes)")
-            
-            return {
-                'type': 'image',
-                'filename': os.path.basename(image_path),
-                'width': final_width,
-                'height': final_height,
-                'format': 'JPEG',  # Always JPEG after optimization
-                'data': f"data:{mime_type};base64,{image_base64}",
-                'size': len(img_bytes)
-            }
-    except MemoryError as mem_error:
-        raise Exception(f'Memory error processing image: {str(mem_error)}')
-    except Exception as e:
-        raise Exception(f'Error processing image: {str(e)}')
+    content = image_service.extract_image_content(image_path)
+    dimensions = content.get('optimized_dimensions') or {}
+    content.setdefault('width', dimensions.get('width'))
+    content.setdefault('height', dimensions.get('height'))
+    return content
 
 
 def transcribe_audio(audio_file_path):
@@ -537,12 +252,14 @@ def upload_file():
         
         # Save uploaded file
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(file_path)
+        with span(STAGE_UPLOAD_SAVE):
+            file.save(file_path)
         
         try:
             if is_pdf:
                 # Extract PDF content
-                extracted_content = extract_pdf_content(file_path)
+                with span(STAGE_PDF_PARSE):
+                    extracted_content = extract_pdf_content(file_path)
                 extracted_content['type'] = 'pdf'
                 extracted_content['filename'] = file.filename
                 
@@ -627,14 +344,16 @@ def upload_multiple_files():
                 
                 # Save uploaded file
                 file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-                file.save(file_path)
+                with span(STAGE_UPLOAD_SAVE):
+                    file.save(file_path)
                 
                 try:
                     # Extract content
                     content_text = ''
                     if is_pdf:
                         # Extract PDF content
-                        extracted_content = extract_pdf_content(file_path)
+                        with span(STAGE_PDF_PARSE):
+                            extracted_content = extract_pdf_content(file_path)
                         extracted_content['type'] = 'pdf'
                         extracted_content['filename'] = file.filename
                         
@@ -749,14 +468,20 @@ Return your response as a JSON object with this exact structure:
     user_content = f"Filename: {filename}\n\nContent:\n{content_sample}"
     
     try:
-        response = call_openai_api(
-            system_prompt=system_prompt,
-            user_content=user_content,
-            max_tokens=500,
-            temperature=0.0,
-            response_format={"type": "json_object"},
-            timeout=60
-        )
+        with span(STAGE_CLASSIFICATION):
+            response = model_router.run_with_escalation(
+                TASK_CLASSIFICATION,
+                lambda model: call_openai_api(
+                    system_prompt=system_prompt,
+                    user_content=user_content,
+                    max_tokens=500,
+                    temperature=0.0,
+                    response_format={"type": "json_object"},
+                    timeout=60,
+                    model=model
+                ),
+                lambda response: model_router.accept_classification(_completion_json(response))
+            )
         
         response_text = response.choices[0].message.content
         
@@ -809,51 +534,6 @@ def identify_document_source(filename, content=None):
     return (source, is_relevant)
 
 
-def normalize_facts(facts_list):
-    """Unify conflicting facts into standard schema."""
-    normalized_facts = []
-    
-    for fact in facts_list:
-        normalized = fact.copy()
-        
-        # Normalize directions
-        if 'normalized_value' in fact and fact.get('category') == 'location':
-            direction = fact.get('normalized_value', '').lower()
-            direction_mapping = {
-                'north': 'N', 'south': 'S', 'east': 'E', 'west': 'W',
-                'northeast': 'NE', 'northwest': 'NW',
-                'southeast': 'SE', 'southwest': 'SW'
-            }
-            for key, value in direction_mapping.items():
-                if key in direction:
-                    normalized['normalized_value'] = value
-                    break
-        
-        # Normalize impact points
-        if fact.get('category') == 'impact':
-            impact = fact.get('normalized_value', '').lower()
-            impact = impact.replace('-', '_').replace(' ', '_')
-            normalized['normalized_value'] = impact
-        
-        # Normalize time formats
-        if fact.get('category') == 'temporal':
-            time_value = fact.get('normalized_value', '')
-            # Try to extract and normalize time format
-            time_match = re.search(r'(\d{1,2}):(\d{2})\s*(AM|PM|am|pm)?', time_value)
-            if time_match:
-                hour = int(time_match.group(1))
-                minute = time_match.group(2)
-                period = time_match.group(3) or ''
-                if period:
-                    normalized['normalized_value'] = f"{hour:02d}:{minute} {period.upper()}"
-                else:
-                    normalized['normalized_value'] = f"{hour:02d}:{minute}"
-        
-        normalized_facts.append(normalized)
-    
-    return normalized_facts
-
-
 def detect_conflicts(facts_list):
     """Identify contradictions across sources using OpenAI."""
     if not openai_client:
@@ -932,18 +612,7 @@ Return your response as a JSON object with this exact structure:
 Analyze the following fact matrix:"""
     
     # Format facts for the prompt
-    facts_text = "\n\nFact Matrix:\n"
-    for idx, fact in enumerate(facts_list):
-        facts_text += f"\nFact {idx + 1}:\n"
-        facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-        facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-        facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-        facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-        facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-        if fact.get('normalized_value'):
-            facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
-        if fact.get('is_implied'):
-            facts_text += f"  Is Implied: {fact.get('is_implied')}\n"
+    facts_text = format_fact_matrix(facts_list)
     
     # Call OpenAI API with JSON mode
     try:
@@ -1095,7 +764,8 @@ def extract_facts_from_documents(files_data):
     
     # Prepare content for OpenAI
     content_parts = []
-    images_added_count = 0  # Track number of images being sent to OpenAI
+    planner = VisionDetailPlanner()  # Assigns detail levels within the vision-token budget
+    deduplicator = ImageDeduplicator()  # Collapses the same image across pages and documents
     
     text_content = """You are an expert at extracting structured facts from auto insurance claim narratives. 
 Analyze the following documents and extract ALL accident-relevant facts in a structured format.
@@ -1164,16 +834,12 @@ Documents to analyze:
                     page_text = page.get('text', '').strip()
                     if page_text:
                         text_content += f"\nAudio Transcription:\n{page_text}\n"
-            
-            # Add images from PDF (with limits)
-            for page in pages:
-                images = page.get('images', [])
-                for img in images:
-                    # Limit total images sent to OpenAI API
-                    if images_added_count >= MAX_TOTAL_IMAGES_PER_REQUEST:
-                        print(f"Warning: Reached image limit ({MAX_TOTAL_IMAGES_PER_REQUEST}), skipping remaining images")
-                        break
-                    
+        
+        if file_type in ('pdf', 'audio'):
+            # Queue images from PDF pages; detail and budget are planned once all are known
+            for page in file_data.get('pages', []):
+                role = get_image_role(file_type, page.get('text', ''))
+                for img in page.get('images', []):
                     img_data = img.get('data', '')
                     if img_data:
                         if img_data.startswith('data:'):
@@ -1192,58 +858,78 @@ Documents to analyze:
                             mime_type = img.get('ext', 'png')
                         
                         # Check individual image size before adding
-                        if len(base64_data) > MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
+                        if len(base64_data) > Config.MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
                             print(f"Warning: Skipping large image ({len(base64_data)} bytes) from {filename}")
                             continue
                         
-                        content_parts.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{mime_type};base64,{base64_data}"
-                            }
-                        })
-                        images_added_count += 1
-                
-                if images_added_count >= MAX_TOTAL_IMAGES_PER_REQUEST:
-                    break
+                        # Skip copies of images already sent from this or another document
+                        if deduplicator.should_skip_encoded(base64_data, img.get('phash')):
+                            continue
+                        
+                        planner.add(
+                            f"data:image/{mime_type};base64,{base64_data}",
+                            base64_data,
+                            role,
+                            width=img.get('width'),
+                            height=img.get('height')
+                        )
         
         elif file_type == 'image':
-            # Limit total images sent to OpenAI API
-            if images_added_count >= MAX_TOTAL_IMAGES_PER_REQUEST:
-                print(f"Warning: Reached image limit ({MAX_TOTAL_IMAGES_PER_REQUEST}), skipping image {filename}")
-                text_content += f"\nThis is an image file: {filename} (skipped due to image limit)\n"
-            else:
-                img_data = file_data.get('data', '')
-                if img_data:
-                    if img_data.startswith('data:'):
-                        parts = img_data.split(',')
-                        if len(parts) == 2:
-                            base64_data = parts[1]
-                            mime_part = parts[0]
-                            if 'image/' in mime_part:
-                                mime_type = mime_part.split('image/')[1].split(';')[0]
-                            else:
-                                mime_type = file_data.get('format', 'png').lower()
+            img_data = file_data.get('data', '')
+            if img_data:
+                if img_data.startswith('data:'):
+                    parts = img_data.split(',')
+                    if len(parts) == 2:
+                        base64_data = parts[1]
+                        mime_part = parts[0]
+                        if 'image/' in mime_part:
+                            mime_type = mime_part.split('image/')[1].split(';')[0]
                         else:
-                            continue
-                    else:
-                        base64_data = img_data
-                        mime_type = file_data.get('format', 'png').lower()
-                    
-                    # Check individual image size before adding
-                    if len(base64_data) > MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
-                        print(f"Warning: Skipping large image ({len(base64_data)} bytes): {filename}")
-                        text_content += f"\nThis is an image file: {filename} (skipped due to size limit)\n"
+                            mime_type = file_data.get('format', 'png').lower()
                     else:
-                        content_parts.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{mime_type};base64,{base64_data}"
-                            }
-                        })
-                        images_added_count += 1
-                        text_content += f"\nThis is an image file: {filename}\n"
-        
+                        continue
+                else:
+                    base64_data = img_data
+                    mime_type = file_data.get('format', 'png').lower()
+                
+                # Check individual image size before adding
+                if len(base64_data) > Config.MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
+                    print(f"Warning: Skipping large image ({len(base64_data)} bytes): {filename}")
+                    text_content += f"\nThis is an image file: {filename} (skipped due to size limit)\n"
+                elif deduplicator.should_skip_encoded(base64_data, file_data.get('phash')):
+                    text_content += f"\nThis is an image file: {filename} (duplicate of an image already included)\n"
+                else:
+                    dimensions = file_data.get('optimized_dimensions') or {}
+                    planner.add(
+                        f"data:image/{mime_type};base64,{base64_data}",
+                        base64_data,
+                        get_image_role(file_type),
+                        width=dimensions.get('width'),
+                        height=dimensions.get('height'),
+                        label=filename
+                    )
+                    text_content += f"\nThis is an image file: {filename}\n"
+    
+    if deduplicator.duplicates_skipped or deduplicator.low_information_skipped:
+        logger.info("Image dedupe: skipped %d duplicate and %d low-information images",
+                    deduplicator.duplicates_skipped, deduplicator.low_information_skipped)
+    
+    # Choose low/high detail per image within the vision-token budget
+    planned_images, skipped_images = planner.plan()
+    for image in planned_images:
+        content_parts.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image['url'],
+                "detail": image['detail']
+            }
+        })
+    for image in skipped_images:
+        if image['label']:
+            text_content += f"\nImage file {image['label']} was not included (image budget reached)\n"
+    logger.info("Vision plan: %d images, ~%d of %d tokens (%d downgraded to low detail, %d skipped)",
+                len(planned_images), planner.tokens_planned, planner.token_budget, planner.downgraded, planner.skipped)
+    
     # Split text_content into system prompt and user content
     system_prompt_end = text_content.find("Documents to analyze:")
     if system_prompt_end != -1:
@@ -1291,7 +977,7 @@ Documents to analyze:
         # Parse JSON response
         try:
             result = json.loads(response_text)
-            facts = result.get('facts', [])
+            facts = facts_from_dicts(result.get('facts', []))
             
             # Create a mapping of document identifiers to sources
             doc_source_map = {}
@@ -1321,15 +1007,15 @@ Documents to analyze:
             
             # Ensure all facts have source properly set
             for fact in facts:
-                if not fact.get('source') or fact.get('source') == 'unknown':
-                    fact_source_text = fact.get('source_text', '').lower()
+                if not fact.source or fact.source == FactSource.UNKNOWN:
+                    fact_source_text = fact.source_text.lower()
                     
                     # Try to match by document name keywords
                     matched = False
                     for doc_name, source in doc_source_map.items():
                         doc_keywords = doc_name.replace('_', ' ').replace('-', ' ').split()
                         if any(keyword in fact_source_text for keyword in doc_keywords if len(keyword) > 3):
-                            fact['source'] = source
+                            fact.set_source(source)
                             matched = True
                             break
                     
@@ -1340,17 +1026,18 @@ Documents to analyze:
                             fact_words = set([w for w in fact_source_text.split() if len(w) > 4])
                             doc_words = set([w for w in text_sample.split() if len(w) > 4])
                             if fact_words and len(fact_words.intersection(doc_words)) >= 2:
-                                fact['source'] = source
+                                fact.set_source(source)
                                 break
             
             # Normalize facts
             normalized_facts = normalize_facts(facts)
             
             # Detect conflicts
-            conflicts = detect_conflicts(normalized_facts)
+            with span(STAGE_CONFLICT_DETECTION):
+                conflicts = detect_conflicts(normalized_facts)
             
             return {
-                'facts': normalized_facts,
+                'facts': facts_to_dicts(normalized_facts),
                 'conflicts': conflicts
             }
         
@@ -1359,11 +1046,12 @@ Documents to analyze:
             json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
             if json_match:
                 result = json.loads(json_match.group())
-                facts = result.get('facts', [])
+                facts = facts_from_dicts(result.get('facts', []))
                 normalized_facts = normalize_facts(facts)
-                conflicts = detect_conflicts(normalized_facts)
+                with span(STAGE_CONFLICT_DETECTION):
+                    conflicts = detect_conflicts(normalized_facts)
                 return {
-                    'facts': normalized_facts,
+                    'facts': facts_to_dicts(normalized_facts),
                     'conflicts': conflicts
                 }
             else:
@@ -1398,11 +1086,11 @@ def extract_facts():
         # Memory limit validation: Count total images and check payload size
         total_images = 0
         total_payload_size = 0
+        seen_hashes = set()  # Repeated images (same perceptual hash) only use one slot
         
         try:
-            # Estimate payload size and count images
-            payload_json = json.dumps(request.json)
-            total_payload_size = sys.getsizeof(payload_json)
+            # Estimate payload size (raw request body; no re-encoding) and count images
+            total_payload_size = len(request.get_data(cache=True))
             
             for file_data in files_data:
                 file_type = file_data.get('type', 'unknown')
@@ -1411,26 +1099,31 @@ def extract_facts():
                     pages = file_data.get('pages', [])
                     for page in pages:
                         images = page.get('images', [])
-                        total_images += len(images)
                         
                         # Estimate size of image data
                         for img in images:
+                            image_hash = img.get('phash')
+                            if not image_hash or image_hash not in seen_hashes:
+                                total_images += 1
+                                if image_hash:
+                                    seen_hashes.add(image_hash)
                             img_data = img.get('data', '')
                             if img_data:
                                 # Base64 data size estimation (rough)
                                 total_payload_size += sys.getsizeof(img_data)
                 
                 elif file_type == 'image':
-                    total_images += 1
+                    image_hash = file_data.get('phash')
+                    if not image_hash or image_hash not in seen_hashes:
+                        total_images += 1
+                        if image_hash:
+                            seen_hashes.add(image_hash)
                     img_data = file_data.get('data', '')
                     if img_data:
                         total_payload_size += sys.getsizeof(img_data)
             
-            # Check limits
-            if total_images > MAX_TOTAL_IMAGES_PER_REQUEST:
-                return jsonify({
-                    'error': f'Too many images ({total_images}). Maximum allowed: {MAX_TOTAL_IMAGES_PER_REQUEST}. Please reduce the number of images or split your request.'
-                }), 400
+            # Image count is not capped here: extraction fits images into
+            # the VISION_TOKEN_BUDGET, downgrading detail before dropping any
             
             # Check payload size (rough estimate: 50MB limit)
             MAX_PAYLOAD_SIZE_MB = 50
@@ -1449,6 +1142,17 @@ def extract_facts():
         # Extract facts from documents
         try:
             result = extract_facts_from_documents(files_data)
+            result['conflict_links'] = build_conflict_links(result['facts'], result['conflicts'])
+            
+            # Index the facts so the fact matrix can page through them with /claims/<claim_id>/facts
+            from app.services.fact_query_service import get_fact_store
+            from app.services.rationale_service import is_valid_claim_id
+            from app.services.prefetch_service import schedule_prefetch
+            claim_id = request.json.get('claim_id')
+            if is_valid_claim_id(claim_id):
+                get_fact_store().put(claim_id, result['facts'])
+                result['claim_id'] = claim_id
+            schedule_prefetch(claim_id if is_valid_claim_id(claim_id) else None, result['facts'], files_data)
             return jsonify(result), 200
         
         except MemoryError as mem_error:
@@ -1471,6 +1175,7 @@ def extract_facts():
 
 
 @app.route('/generate-summary', methods=['POST'])
+@conditional_analysis()  # Prompts are inline, so the view's own strings version the ETag
 def generate_summary():
     """Generate a summary of all uploaded files using OpenAI."""
     try:
@@ -1486,8 +1191,8 @@ def generate_summary():
         # Prepare content for OpenAI
         content_parts = []
         
-        # Build a text summary of all content first
-        text_content = "Please analyze the following auto insurance claim documents and provide a comprehensive summary:\n\n"
+        # Build a text summary of all content first (the instructions are the static system prefix)
+        text_content = ""
         
         for file_data in files_data:
             filename = file_data.get('filename', file_data.get('originalFilename', 'Unknown'))
@@ -1564,26 +1269,33 @@ def generate_summary():
                     if file_data.get('width') and file_data.get('height'):
                         text_content += f"Image dimensions: {file_data.get('width')}x{file_data.get('height')} pixels\n"
         
-        # Separate system prompt from user content
-        system_prompt = "You are an expert auto insurance claims analyst. Analyze the provided claim documents and generate a comprehensive summary."
-        
-        user_text = text_content + "\n\nPlease provide a comprehensive summary of all the claim documents, including:\n1. Key information from each document\n2. Important dates, names, and locations\n3. Damage descriptions\n4. Any inconsistencies or missing information\n5. Overall assessment of the claim"
+        # Separate system prompt from user content; every instruction block is static and comes first
+        system_prompt = (
+            "You are an expert auto insurance claims analyst. Analyze the provided claim documents and generate a comprehensive summary.",
+            "Please provide a comprehensive summary of all the claim documents, including:\n1. Key information from each document\n2. Important dates, names, and locations\n3. Damage descriptions\n4. Any inconsistencies or missing information\n5. Overall assessment of the claim",
+            "Please analyze the following auto insurance claim documents and provide a comprehensive summary:"
+        )
         
         # Build user content with text and images
         user_content_parts = [{
             "type": "text",
-            "text": user_text
+            "text": text_content or "(No document text; see the attached images.)"
         }]
         user_content_parts.extend(content_parts)
         
         # Call OpenAI API
         try:
-            response = call_openai_api(
-                system_prompt=system_prompt,
-                user_content=user_content_parts,
-                max_tokens=2000,
-                temperature=0.2,  # Slightly higher for summary (more creative)
-                timeout=180  # Longer timeout for multimodal content
+            response = model_router.run_with_escalation(
+                TASK_SUMMARY,
+                lambda model: call_openai_api(
+                    system_prompt=system_prompt,
+                    user_content=user_content_parts,
+                    max_tokens=2000,
+                    temperature=0.2,  # Slightly higher for summary (more creative)
+                    timeout=180,  # Longer timeout for multimodal content
+                    model=model
+                ),
+                lambda response: model_router.accept_text(response.choices[0].message.content)
             )
             
             summary = response.choices[0].message.content
@@ -1601,6 +1313,7 @@ def generate_summary():
 
 
 @app.route('/analyze-liability-signals', methods=['POST'])
+@conditional_analysis()
 def analyze_liability_signals():
     """Analyze fact matrix to identify liability signals using OpenAI."""
     request_start_time = time.time()
@@ -1686,22 +1399,14 @@ Analyze the following fact matrix:"""
         
         # Format facts for the prompt
         logger.info("LIABILITY_SIGNAL_LOG: [analyze_liability_signals] Formatting facts for prompt...")
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
+        facts_text = format_fact_matrix(facts)
         
         prompt_size = len(system_prompt) + len(facts_text)
         logger.info(f"LIABILITY_SIGNAL_LOG: [analyze_liability_signals] Prompt prepared:")
         logger.info(f"LIABILITY_SIGNAL_LOG: [analyze_liability_signals] - System prompt length: {len(system_prompt)} chars")
         logger.info(f"LIABILITY_SIGNAL_LOG: [analyze_liability_signals] - Facts text length: {len(facts_text)} chars")
         logger.info(f"LIABILITY_SIGNAL_LOG: [analyze_liability_signals] - Total prompt size: {prompt_size} chars")
+        logger.info(f"LIABILITY_SIGNAL_LOG: [analyze_liability_signals] - Prompt tokens: ~{count_tokens(system_prompt) + count_tokens(facts_text)}")
         
         # Call OpenAI API with JSON mode
         logger.info("LIABILITY_SIGNAL_LOG: [analyze_liability_signals] Initiating OpenAI API call...")
@@ -1752,6 +1457,7 @@ Analyze the following fact matrix:"""
                 
                 return jsonify({
                     'signals': signals,
+                    'signal_links': build_signal_links(facts, signals),
                     'success': True
                 }), 200
             
@@ -1773,6 +1479,7 @@ Analyze the following fact matrix:"""
                     
                     return jsonify({
                         'signals': signals,
+                        'signal_links': build_signal_links(facts, signals),
                         'success': True
                     }), 200
                 else:
@@ -1803,6 +1510,7 @@ Analyze the following fact matrix:"""
 
 
 @app.route('/check-evidence-completeness', methods=['POST'])
+@conditional_analysis()
 def check_evidence_completeness():
     """Check completeness of standard evidence package using OpenAI."""
     try:
@@ -2065,6 +1773,7 @@ def load_sample_file(filename):
 
 
 @app.route('/generate-timeline', methods=['POST'])
+@conditional_analysis()
 def generate_timeline():
     """Generate timeline reconstruction (sequence of events) using OpenAI based on fact matrix."""
     try:
@@ -2124,26 +1833,22 @@ Return your response as a JSON object with this exact structure:
 Analyze the following fact matrix:"""
         
         # Format facts for the prompt
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
+        facts_text = format_fact_matrix(facts, quotes=False)
         
         # Call OpenAI API with JSON mode
         try:
-            response = call_openai_api(
-                system_prompt=system_prompt,
-                user_content=facts_text,
-                max_tokens=4000,
-                temperature=0.0,
-                response_format={"type": "json_object"},
-                timeout=120
+            response = model_router.run_with_escalation(
+                TASK_TIMELINE,
+                lambda model: call_openai_api(
+                    system_prompt=system_prompt,
+                    user_content=facts_text,
+                    max_tokens=4000,
+                    temperature=0.0,
+                    response_format={"type": "json_object"},
+                    timeout=120,
+                    model=model
+                ),
+                lambda response: model_router.accept_timeline(_completion_json(response))
             )
             
             response_text = response.choices[0].message.content
@@ -2179,6 +1884,7 @@ Analyze the following fact matrix:"""
 
 
 @app.route('/get-liability-recommendation', methods=['POST'])
+@conditional_analysis()
 def get_liability_recommendation():
     """Generate liability percentage recommendation using OpenAI based on fact matrix and liability signals."""
     try:
@@ -2246,28 +1952,10 @@ Return your response as a JSON object with this exact structure:
 Analyze the following fact matrix and liability signals:"""
         
         # Format facts for the prompt
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
+        facts_text = format_fact_matrix(facts, quotes=False)
         
         # Format signals for the prompt
-        signals_text = "\n\nLiability Signals:\n"
-        for idx, signal in enumerate(signals):
-            signals_text += f"\nSignal {idx + 1}:\n"
-            signals_text += f"  Signal Type: {signal.get('signal_type', 'N/A')}\n"
-            signals_text += f"  Evidence Text: {signal.get('evidence_text', 'N/A')}\n"
-            signals_text += f"  Impact on Liability: {signal.get('impact_on_liability', 'N/A')}\n"
-            signals_text += f"  Severity Score: {signal.get('severity_score', 0)}\n"
-            signals_text += f"  Related Facts: {', '.join(signal.get('related_facts', []))}\n"
-            if signal.get('discrepancies'):
-                signals_text += f"  Discrepancies: {signal.get('discrepancies')}\n"
+        signals_text = format_signals(signals, with_related=True)
         
         # Call OpenAI API with JSON mode
         try:
@@ -2351,6 +2039,24 @@ Analyze the following fact matrix and liability signals:"""
         return jsonify({'error': f'Liability recommendation generation failed: {str(e)}'}), 500
 
 
+def _store_generated_rationale(claim_id, rationale):
+    """Persist a generated rationale when the client sent a claim ID and build the response body."""
+    from app.services.rationale_service import get_rationale_store, is_valid_claim_id, SOURCE_GENERATED
+    
+    response_data = {
+        'rationale': rationale,
+        'success': True
+    }
+    if is_valid_claim_id(claim_id):
+        try:
+            stored = get_rationale_store().append(claim_id, rationale, source=SOURCE_GENERATED)
+            response_data['claim_id'] = claim_id
+            response_data['version'] = stored['version']
+        except Exception as e:
+            logger.warning(f"Could not store generated rationale for claim {claim_id}: {str(e)}")
+    return response_data
+
+
 @app.route('/generate-claim-rationale', methods=['POST'])
 def generate_claim_rationale():
     """Generate audit-ready adjuster narrative rationale using OpenAI."""
@@ -2403,28 +2109,10 @@ Return your response as a JSON object with this exact structure:
 Analyze the following fact matrix and liability signals:"""
         
         # Format facts for the prompt
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
+        facts_text = format_fact_matrix(facts)
         
         # Format signals for the prompt
-        signals_text = "\n\nLiability Signals:\n"
-        if signals and len(signals) > 0:
-            for idx, signal in enumerate(signals):
-                signals_text += f"\nSignal {idx + 1}:\n"
-                signals_text += f"  Signal Type: {signal.get('signal_type', 'N/A')}\n"
-                signals_text += f"  Evidence Text: {signal.get('evidence_text', 'N/A')}\n"
-                signals_text += f"  Impact on Liability: {signal.get('impact_on_liability', 'N/A')}\n"
-                signals_text += f"  Severity Score: {signal.get('severity_score', 0)}\n"
-        else:
-            signals_text += "\nNo liability signals provided.\n"
+        signals_text = format_signals(signals)
         
         # Call OpenAI API with JSON mode
         try:
@@ -2473,10 +2161,7 @@ Analyze the following fact matrix and liability signals:"""
                 # Add images to response
                 result['images'] = images_data
                 
-                return jsonify({
-                    'rationale': result,
-                    'success': True
-                }), 200
+                return jsonify(_store_generated_rationale(request_data.get('claim_id'), result)), 200
             
             except json.JSONDecodeError as e:
                 # Fallback: try to extract JSON from response
@@ -2514,10 +2199,7 @@ Analyze the following fact matrix and liability signals:"""
                     # Add images to response
                     result['images'] = images_data
                     
-                    return jsonify({
-                        'rationale': result,
-                        'success': True
-                    }), 200
+                    return jsonify(_store_generated_rationale(request_data.get('claim_id'), result)), 200
                 else:
                     raise Exception(f"Failed to parse JSON response: {str(e)}")
         
@@ -2529,6 +2211,7 @@ Analyze the following fact matrix and liability signals:"""
 
 
 @app.route('/generate-escalation-package', methods=['POST'])
+@conditional_analysis()
 def generate_escalation_package():
     """Generate condensed high-risk summary for supervisor escalation using OpenAI."""
     try:
@@ -2578,28 +2261,10 @@ Return your response as a JSON object with this exact structure:
 Analyze the following fact matrix and liability signals:"""
         
         # Format facts for the prompt
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
+        facts_text = format_fact_matrix(facts, quotes=False)
         
         # Format signals for the prompt
-        signals_text = "\n\nLiability Signals:\n"
-        if signals and len(signals) > 0:
-            for idx, signal in enumerate(signals):
-                signals_text += f"\nSignal {idx + 1}:\n"
-                signals_text += f"  Signal Type: {signal.get('signal_type', 'N/A')}\n"
-                signals_text += f"  Evidence Text: {signal.get('evidence_text', 'N/A')}\n"
-                signals_text += f"  Impact on Liability: {signal.get('impact_on_liability', 'N/A')}\n"
-                signals_text += f"  Severity Score: {signal.get('severity_score', 0)}\n"
-        else:
-            signals_text += "\nNo liability signals provided.\n"
+        signals_text = format_signals(signals)
         
         # Call OpenAI API with JSON mode
         try:
@@ -2642,249 +2307,32 @@ Analyze the following fact matrix and liability signals:"""
         return jsonify({'error': f'Escalation package generation failed: {str(e)}'}), 500
 
 
-@app.route('/download-claim-rationale-pdf', methods=['POST'])
-def download_claim_rationale_pdf():
-    """Generate and return a PDF of the claim rationale."""
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-        from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
-        from io import BytesIO
-        import html2text
-        
-        # Parse and validate request data
-        request_data = request.json
-        if not request_data:
-            print("download_claim_rationale_pfd: No request data provided.")
-            return jsonify({'error': 'No request data provided.'}), 400
-            
-        rationale = request_data.get('rationale', {})
-        
-        if not rationale:
-            print("download_claim_rationale_pfd: No rationale data provided.")
-            return jsonify({'error': 'No rationale data provided.'}), 400
-        
-        # Ensure rationale is a dictionary
-        if not isinstance(rationale, dict):
-            print("download_claim_rationale_pfd: Rationale is not a dictionary.")
-            return jsonify({'error': 'Invalid rationale format. Expected a dictionary.'}), 400
-        
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter,
-                                rightMargin=72, leftMargin=72,
-                                topMargin=72, bottomMargin=18)
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor='#333333',
-            spaceAfter=12,
-            alignment=TA_LEFT
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor='#333333',
-            spaceAfter=10,
-            spaceBefore=12,
-            alignment=TA_LEFT
-        )
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor='#333333',
-            spaceAfter=8,
-            alignment=TA_JUSTIFY,
-            leading=14
-        )
-        
-        # Convert HTML to plain text
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.body_width = 0
-        
-        # Helper function to safely convert text to PDF paragraph
-        def safe_paragraph(text, style):
-            """Safely convert text to Paragraph, handling empty strings and None."""
-            if not text:
-                return None
-            try:
-                # Convert to string and strip
-                text_str = str(text).strip()
-                if not text_str:
-                    return None
-                # Convert HTML to plain text if needed
-                if '<' in text_str or '>' in text_str:
-                    text_str = h.handle(text_str).strip()
-                # Escape XML special characters for ReportLab
-                text_str = text_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                return Paragraph(text_str, style)
-            except Exception as e:
-                print(f"Error creating paragraph: {e}")
-                return None
-        
-        # Title
-        elements.append(Paragraph("Claim File Rationale", title_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Incident Summary
-        if rationale.get('incident_summary'):
-            para = safe_paragraph(rationale['incident_summary'], normal_style)
-            if para:
-                elements.append(Paragraph("Incident Summary", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Evidence Overview
-        if rationale.get('evidence_overview'):
-            evidence = rationale['evidence_overview']
-            has_evidence = False
-            if isinstance(evidence, dict):
-                if evidence.get('narratives'):
-                    para = safe_paragraph(evidence['narratives'], normal_style)
-                    if para:
-                        if not has_evidence:
-                            elements.append(Paragraph("Evidence Overview", heading_style))
-                            has_evidence = True
-                        elements.append(Paragraph("<b>Narratives:</b>", normal_style))
-                        elements.append(para)
-                if evidence.get('photos'):
-                    para = safe_paragraph(evidence['photos'], normal_style)
-                    if para:
-                        if not has_evidence:
-                            elements.append(Paragraph("Evidence Overview", heading_style))
-                            has_evidence = True
-                        elements.append(Paragraph("<b>Photos:</b>", normal_style))
-                        elements.append(para)
-            if has_evidence:
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Liability Assessment Logic
-        if rationale.get('liability_assessment_logic'):
-            para = safe_paragraph(rationale['liability_assessment_logic'], normal_style)
-            if para:
-                elements.append(Paragraph("Liability Assessment Logic", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Key Evidence
-        if rationale.get('key_evidence') and isinstance(rationale['key_evidence'], list) and len(rationale['key_evidence']) > 0:
-            elements.append(Paragraph("Key Evidence Supporting Assessment", heading_style))
-            for item in rationale['key_evidence']:
-                if item:
-                    item_str = str(item).strip()
-                    if item_str:
-                        # Convert HTML to plain text if needed
-                        if '<' in item_str or '>' in item_str:
-                            item_str = h.handle(item_str).strip()
-                        # Escape XML special characters
-                        item_str = item_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                        elements.append(Paragraph(f"• {item_str}", normal_style))
-            elements.append(Spacer(1, 0.15*inch))
-        
-        # Open Questions
-        if rationale.get('open_questions') and isinstance(rationale['open_questions'], list) and len(rationale['open_questions']) > 0:
-            elements.append(Paragraph("Open Questions / Follow-Up", heading_style))
-            for item in rationale['open_questions']:
-                if item:
-                    item_str = str(item).strip()
-                    if item_str:
-                        # Convert HTML to plain text if needed
-                        if '<' in item_str or '>' in item_str:
-                            item_str = h.handle(item_str).strip()
-                        # Escape XML special characters
-                        item_str = item_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                        elements.append(Paragraph(f"• {item_str}", normal_style))
-            elements.append(Spacer(1, 0.15*inch))
-        
-        # Coverage Considerations
-        if rationale.get('coverage_considerations'):
-            para = safe_paragraph(rationale['coverage_considerations'], normal_style)
-            if para:
-                elements.append(Paragraph("Coverage Considerations", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Recommendation
-        if rationale.get('recommendation'):
-            para = safe_paragraph(rationale['recommendation'], normal_style)
-            if para:
-                elements.append(Paragraph("Recommendation", heading_style))
-                elements.append(para)
-        
-        # Check if we have any content
-        if len(elements) <= 2:  # Only title and spacer
-            return jsonify({'error': 'No content available to generate PDF.'}), 400
-        
-        # Build PDF
-        try:
-            doc.build(elements)
-        except Exception as build_error:
-            print(f"download_claim_rationale_pdf: Error building PDF: {build_error}")
-            return jsonify({'error': f'Error building PDF: {str(build_error)}'}), 500
-        
-        # Get PDF data
-        pdf_data = buffer.getvalue()
-        buffer.close()
-        
-        if not pdf_data or len(pdf_data) == 0:
-            return jsonify({'error': 'Generated PDF is empty.'}), 500
-        
-        # Return PDF as response
-        from flask import Response
-        return Response(
-            pdf_data,
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': 'attachment; filename=claim_rationale.pdf'
-            }
-        )
+def _register_rationale_pdf_route():
+    """Render rationale PDFs through the cached renderer with the same handler as the modular app."""
+    from app.routes import documents
     
-    except ImportError as imp_err:
-        # Fallback: return JSON if reportlab / html2text are not available
-        print(f"download_claim_rationale_pdf: ImportError while generating PDF: {imp_err}")
-        return jsonify({
-            'error': 'PDF generation is currently unavailable. Please contact support.'
-        }), 500
-    except Exception as e:
-        print(f"download_claim_rationale_pdf: Unexpected error: {e}")
-        return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+    app.add_url_rule('/download-claim-rationale-pdf', 'download_claim_rationale_pdf',
+                     documents.download_claim_rationale_pdf, methods=['POST'])
 
 
-@app.route('/save-claim-rationale', methods=['POST'])
-def save_claim_rationale():
-    """Save edited claim rationale."""
-    try:
-        request_data = request.json
-        rationale = request_data.get('rationale', {})
-        
-        if not rationale:
-            return jsonify({'error': 'No rationale data provided.'}), 400
-        
-        # Validate required fields
-        if not isinstance(rationale, dict):
-            return jsonify({'error': 'Invalid rationale format.'}), 400
-        
-        # The rationale is saved on the client side, but we validate and acknowledge here
-        # In a real application, you might want to save this to a database
-        return jsonify({
-            'success': True,
-            'message': 'Rationale saved successfully.'
-        }), 200
+_register_rationale_pdf_route()
+
+
+def _register_rationale_store_routes():
+    """Save and serve stored rationales with the same handlers as the modular app."""
+    from app.routes import analysis
     
-    except Exception as e:
-        return jsonify({'error': f'Failed to save rationale: {str(e)}'}), 500
+    app.add_url_rule('/save-claim-rationale', 'save_claim_rationale',
+                     analysis.save_claim_rationale, methods=['POST'])
+    app.add_url_rule('/claims/<claim_id>/rationale', 'get_claim_rationale',
+                     analysis.get_claim_rationale, methods=['GET'])
+    app.add_url_rule('/claims/<claim_id>/rationale/history', 'get_claim_rationale_history',
+                     analysis.get_claim_rationale_history, methods=['GET'])
+    app.add_url_rule('/claims/<claim_id>/rationale/versions/<int:version>', 'get_claim_rationale_version',
+                     analysis.get_claim_rationale_version, methods=['GET'])
+
+
+_register_rationale_store_routes()
 
 
 @app.route('/generate-email-draft', methods=['POST'])
@@ -2895,10 +2343,6 @@ def generate_email_draft():
         from app.services.openai_service import get_openai_service
         from app.prompts import get_email_draft_prompt
         
-        logger.info("[EMAIL DRAFT] Request received at /generate-email-draft")
-        logger.info(f"[EMAIL DRAFT] Request method: {request.method}")
-        logger.info(f"[EMAIL DRAFT] Request headers: {dict(request.headers)}")
-        
         openai_service = get_openai_service()
         if not openai_service.is_available():
             error_msg = 'OpenAI API key not configured. Please set OPENAI_API_KEY in your environment.'
@@ -2913,14 +2357,11 @@ def generate_email_draft():
             return jsonify({'error': error_msg}), 400
         
         request_data = request.json
-        logger.info(f"[EMAIL DRAFT] Request data keys: {list(request_data.keys())}")
-        
         selected_evidence = request_data.get('selected_evidence', [])
         contact = request_data.get('contact', {})
         claim_context = request_data.get('claim_context', '')
         
-        logger.info(f"[EMAIL DRAFT] Selected evidence count: {len(selected_evidence)}")
-        logger.info(f"[EMAIL DRAFT] Contact: {contact.get('name', 'N/A')} ({contact.get('email', 'N/A')})")
+        logger.debug("[EMAIL DRAFT] Selected evidence count: %d", len(selected_evidence))
         
         if not selected_evidence:
             error_msg = 'No evidence items selected.'
@@ -2960,8 +2401,8 @@ Missing Evidence Items:
         
         system_prompt = get_email_draft_prompt()
         
-        logger.info("[EMAIL DRAFT] Calling OpenAI service to generate draft")
-        draft = openai_service.call_with_text_response(
+        draft = model_router.call_text(
+            TASK_EMAIL_DRAFT,
             system_prompt=system_prompt,
             user_content=user_content,
             max_tokens=2000
@@ -2973,7 +2414,7 @@ Missing Evidence Items:
             logger.error(f"[EMAIL DRAFT ERROR] OpenAI service response was None or empty")
             return jsonify({'error': error_msg}), 500
         
-        logger.info(f"[EMAIL DRAFT] Successfully generated draft (length: {len(draft)} characters)")
+        logger.debug("[EMAIL DRAFT] Generated draft (length: %d characters)", len(draft))
         return jsonify({
             'draft': draft,
             'success': True
@@ -2990,146 +2431,28 @@ Missing Evidence Items:
         return jsonify({'error': error_msg}), 500
 
 
-@app.route('/send-email-request', methods=['POST'])
-def send_email_request():
-    """Send an email request using SendGrid."""
-    try:
-        # Import here to avoid circular imports
-        from app.config import Config
-        
-        request_data = request.json
-        to_email = request_data.get('to')
-        subject = request_data.get('subject', 'Request for Additional Evidence')
-        body = request_data.get('body', '')
-        selected_evidence = request_data.get('selected_evidence', [])
-        
-        if not to_email:
-            return jsonify({'error': 'Recipient email is required.'}), 400
-        
-        if not body:
-            return jsonify({'error': 'Email body is required.'}), 400
-        
-        # Check if SendGrid is configured
-        if not Config.SENDGRID_API_KEY:
-            # Fallback to mock mode for development
-            print(f"[MOCK EMAIL SEND - SendGrid not configured]")
-            print(f"To: {to_email}")
-            print(f"Subject: {subject}")
-            print(f"Body: {body[:200]}...")  # Truncate for logging
-            print(f"Selected Evidence Items: {len(selected_evidence)}")
-            print(f"Timestamp: {datetime.now().isoformat()}")
-            print(f"Note: Set SENDGRID_API_KEY environment variable to enable actual email sending")
-            
-            message_id = str(uuid.uuid4())
-            return jsonify({
-                'success': True,
-                'message_id': message_id,
-                'sent_at': datetime.now().isoformat(),
-                'mock_mode': True,
-                'note': 'SendGrid not configured - email was logged but not sent'
-            }), 200
-        
-        # Validate SendGrid configuration
-        if not Config.SENDGRID_FROM_EMAIL:
-            return jsonify({
-                'error': 'SENDGRID_FROM_EMAIL is required. Please set SENDGRID_FROM_EMAIL environment variable.'
-            }), 500
-        
-        # Send email using SendGrid REST API
-        try:
-            url = 'https://api.sendgrid.com/v3/mail/send'
-            headers = {
-                'Authorization': f'Bearer {Config.SENDGRID_API_KEY}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Format request body according to SendGrid v3 API
-            payload = {
-                'personalizations': [
-                    {
-                        'to': [{'email': to_email}]
-                    }
-                ],
-                'from': {
-                    'email': Config.SENDGRID_FROM_EMAIL,
-                    'name': Config.SENDGRID_FROM_NAME
-                },
-                'subject': subject,
-                'content': [
-                    {
-                        'type': 'text/plain',
-                        'value': body
-                    }
-                ]
-            }
-            
-            # Send request
-            response = requests.post(url, headers=headers, json=payload)
-            
-            # Check response status
-            if response.status_code == 202:
-                # Success - SendGrid returns 202 Accepted
-                # Get message ID from response headers
-                message_id = response.headers.get('X-Message-Id') or str(uuid.uuid4())
-                
-                # Log successful send
-                print(f"[SENDGRID EMAIL SENT]")
-                print(f"To: {to_email}")
-                print(f"Subject: {subject}")
-                print(f"Status Code: {response.status_code}")
-                print(f"Message ID: {message_id}")
-                print(f"Timestamp: {datetime.now().isoformat()}")
-                
-                return jsonify({
-                    'success': True,
-                    'message_id': message_id,
-                    'sent_at': datetime.now().isoformat(),
-                    'status_code': response.status_code
-                }), 200
-            else:
-                # Handle error responses
-                error_message = f"HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    if 'errors' in error_data and len(error_data['errors']) > 0:
-                        error_message = error_data['errors'][0].get('message', error_message)
-                    elif 'error' in error_data:
-                        error_message = error_data['error']
-                except:
-                    error_message = response.text or error_message
-                
-                print(f"[SENDGRID ERROR] Failed to send email: {error_message}")
-                print(f"Response Status: {response.status_code}")
-                print(f"Response Body: {response.text[:500]}")
-                
-                # Provide more helpful error messages
-                if response.status_code == 401:
-                    return jsonify({'error': 'SendGrid authentication failed. Please check your SENDGRID_API_KEY.'}), 500
-                elif response.status_code == 403:
-                    return jsonify({'error': 'SendGrid access forbidden. Please check your API key permissions.'}), 500
-                elif response.status_code == 400:
-                    return jsonify({'error': f'Invalid email request: {error_message}'}), 400
-                else:
-                    return jsonify({'error': f'SendGrid error: {error_message}'}), 500
-        
-        except requests.exceptions.RequestException as send_error:
-            # Handle network/request errors
-            error_message = str(send_error)
-            print(f"[SENDGRID ERROR] Request failed: {error_message}")
-            return jsonify({'error': f'Failed to connect to SendGrid: {error_message}'}), 500
+def _register_email_outbox_routes():
+    """Queue evidence request emails through the outbox with the same handlers as the modular app."""
+    from app.routes import documents
     
-    except Exception as e:
-        print(f"[EMAIL SEND ERROR] Unexpected error: {str(e)}")
-        return jsonify({'error': f'Email sending failed: {str(e)}'}), 500
+    app.add_url_rule('/send-email-request', 'send_email_request',
+                     documents.send_email_request, methods=['POST'])
+    app.add_url_rule('/email-status', 'get_email_status',
+                     documents.get_email_status, methods=['GET'])
+
+
+_register_email_outbox_routes()
 
 
 # Register blueprints for modular routes
 try:
-    from app.routes import main, facts, analysis, documents
+    from app.routes import main, facts, analysis, documents, batch, metrics
     app.register_blueprint(main.bp)
     app.register_blueprint(facts.bp)
     app.register_blueprint(analysis.bp)
     app.register_blueprint(documents.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(metrics.bp)
     logger.info("Blueprints registered successfully")
     
     # Log all registered routes for debugging
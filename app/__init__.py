@@ -6,47 +6,77 @@ import os
 import importlib.util
 from flask import Flask
 from app.config import Config
+from app.utils.logging_utils import configure_logging
+from app.utils.json_provider import FastJSONProvider
+from app.utils.compression import RequestDecompressionMiddleware, compress_response
 
 
 def create_app(config_class=Config):
     """Create and configure Flask application."""
+    configure_logging()
+    
     app = Flask(__name__, static_folder='../static', template_folder='../templates')
     app.config.from_object(config_class)
+    app.json = FastJSONProvider(app)
+    
+    # Accept gzip/deflate request bodies and compress responses
+    app.wsgi_app = RequestDecompressionMiddleware(app.wsgi_app)
+    app.after_request(compress_response)
     
     # Set upload folder from config
     app.config['UPLOAD_FOLDER'] = config_class.get_upload_folder()
     
     # Register blueprints
-    from app.routes import main, facts, analysis, documents
+    from app.routes import main, facts, analysis, documents, batch, metrics
     app.register_blueprint(main.bp)
     app.register_blueprint(facts.bp)
     app.register_blueprint(analysis.bp)
     app.register_blueprint(documents.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(metrics.bp)
     
     return app
 
 
-# Import app instance from root app.py for gunicorn compatibility
-# This allows both "gunicorn app:app" and "gunicorn wsgi:app" to work
-try:
-    # Get the parent directory (project root)
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(current_dir)
-    app_py_path = os.path.join(parent_dir, 'app.py')
-    
-    # Import app.py as a module explicitly to avoid conflict with app/ directory
-    spec = importlib.util.spec_from_file_location("app_module", app_py_path)
-    app_module = importlib.util.module_from_spec(spec)
-    sys.modules["app_module"] = app_module
-    spec.loader.exec_module(app_module)
+def _load_legacy_app():
+    """
+    Load the app instance from root app.py for gunicorn compatibility.
     
-    # Get the app instance from the imported module
-    app = app_module.app
-except Exception as e:
-    # If import fails, fall back to creating app using factory
-    # This ensures the module can still be imported even if app.py has issues
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.warning(f"Could not import app from app.py: {str(e)}. Falling back to create_app().")
-    app = create_app()
+    This allows both "gunicorn app:app" and "gunicorn wsgi:app" to work.
+    """
+    try:
+        # Get the parent directory (project root)
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        parent_dir = os.path.dirname(current_dir)
+        app_py_path = os.path.join(parent_dir, 'app.py')
+        
+        # Import app.py as a module explicitly to avoid conflict with app/ directory
+        spec = importlib.util.spec_from_file_location("app_module", app_py_path)
+        app_module = importlib.util.module_from_spec(spec)
+        sys.modules["app_module"] = app_module
+        spec.loader.exec_module(app_module)
+        
+        # Get the app instance from the imported module
+        return app_module.app
+    except Exception as e:
+        # If import fails, fall back to creating app using factory
+        # This ensures the module can still be imported even if app.py has issues
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.warning(f"Could not import app from app.py: {str(e)}. Falling back to create_app().")
+        return create_app()
 
+
+def __getattr__(name):
+    """
+    Resolve the module-level ``app`` attribute on first access.
+    
+    app.py imports every extraction library and builds its own Flask app, so
+    it is only executed when something actually asks for ``app.app`` rather
+    than whenever the package (or ``create_app``) is imported.
+    """
+    if name == 'app':
+        legacy_app = _load_legacy_app()
+        globals()['app'] = legacy_app
+        return legacy_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
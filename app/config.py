@@ -32,13 +32,168 @@ class Config:
     
     # UPLOAD_FOLDER will be set dynamically via get_upload_folder()
     
+    @staticmethod
+    def get_image_cache_folder():
+        """Get image rendition cache folder path based on environment."""
+        if os.environ.get('VERCEL'):
+            cache_folder = '/tmp/image_cache'
+        else:
+            cache_folder = os.getenv('IMAGE_CACHE_FOLDER', os.path.join('uploads', 'image_cache'))
+        try:
+            os.makedirs(cache_folder, exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create image cache directory: {str(e)}")
+            cache_folder = '/tmp'
+        return cache_folder
+    
+    @staticmethod
+    def get_pdf_cache_folder():
+        """Get rendered PDF cache folder path based on environment."""
+        if os.environ.get('VERCEL'):
+            cache_folder = '/tmp/pdf_cache'
+        else:
+            cache_folder = os.getenv('PDF_CACHE_FOLDER', os.path.join('uploads', 'pdf_cache'))
+        try:
+            os.makedirs(cache_folder, exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create PDF cache directory: {str(e)}")
+            cache_folder = '/tmp'
+        return cache_folder
+    
+    @staticmethod
+    def get_rationale_db_path():
+        """Get claim rationale store database path based on environment."""
+        if os.environ.get('VERCEL'):
+            return '/tmp/rationales.db'
+        db_path = os.getenv('RATIONALE_DB_PATH', os.path.join('uploads', 'rationales.db'))
+        try:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create rationale store directory: {str(e)}")
+            db_path = '/tmp/rationales.db'
+        return db_path
+    
+    @staticmethod
+    def get_email_outbox_path():
+        """Get email outbox database path based on environment."""
+        if os.environ.get('VERCEL'):
+            return '/tmp/email_outbox.db'
+        outbox_path = os.getenv('EMAIL_OUTBOX_PATH', os.path.join('uploads', 'email_outbox.db'))
+        try:
+            os.makedirs(os.path.dirname(outbox_path) or '.', exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create email outbox directory: {str(e)}")
+            outbox_path = '/tmp/email_outbox.db'
+        return outbox_path
+    
+    @staticmethod
+    def get_batch_output_folder():
+        """Get batch ingestion results folder path based on environment."""
+        if os.environ.get('VERCEL'):
+            output_folder = '/tmp/batch_results'
+        else:
+            output_folder = os.getenv('BATCH_OUTPUT_FOLDER', os.path.join('uploads', 'batch_results'))
+        try:
+            os.makedirs(output_folder, exist_ok=True)
+        except OSError as e:
+            print(f"Warning: Could not create batch results directory: {str(e)}")
+            output_folder = '/tmp'
+        return output_folder
+    
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None  # Point at a stand-in server for tests
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o')  # Large tier; default for every call
+    OPENAI_SMALL_MODEL = os.getenv('OPENAI_SMALL_MODEL', 'gpt-4o-mini')  # Small/fast tier
+    
+    # Model routing (small model first for short tasks, large model on escalation)
+    MODEL_ROUTING_ENABLED = os.getenv('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+    MODEL_TIER_OVERRIDES = os.getenv('MODEL_TIER_OVERRIDES', '')  # e.g. "summary=large,timeline=small"
+    MODEL_ESCALATION_CONFIDENCE = float(os.getenv('MODEL_ESCALATION_CONFIDENCE', '0.6'))  # Small-model answers below this go to the large model
+    
+    # OpenAI Batch API backend (non-interactive batch ingestion)
+    OPENAI_BATCH_WINDOW_SECONDS = float(os.getenv('OPENAI_BATCH_WINDOW_SECONDS', '30'))  # Collect requests this long before submitting a batch
+    OPENAI_BATCH_MAX_REQUESTS = int(os.getenv('OPENAI_BATCH_MAX_REQUESTS', '50000'))  # Batch API limit per file
+    OPENAI_BATCH_MAX_BYTES = int(os.getenv('OPENAI_BATCH_MAX_BYTES', str(190 * 1024 * 1024)))  # Below the 200MB input file limit
+    OPENAI_BATCH_POLL_INTERVAL = float(os.getenv('OPENAI_BATCH_POLL_INTERVAL', '60'))  # Seconds between batch status checks
+    OPENAI_BATCH_COMPLETION_WINDOW = os.getenv('OPENAI_BATCH_COMPLETION_WINDOW', '24h')
+    OPENAI_BATCH_CONCURRENCY = int(os.getenv('OPENAI_BATCH_CONCURRENCY', '200'))  # Claims per stage waiting on batches at once
     
     # SendGrid configuration
     SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
     SENDGRID_FROM_EMAIL = os.getenv('SENDGRID_FROM_EMAIL')
     SENDGRID_FROM_NAME = os.getenv('SENDGRID_FROM_NAME', 'Auto Claims System')
+    SENDGRID_API_URL = os.getenv('SENDGRID_API_URL', 'https://api.sendgrid.com').rstrip('/')  # Point at a stand-in server for tests
+    
+    # Outbound HTTP client configuration (pooled session shared per worker)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))  # Retries on connection errors, 429 and 5xx
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.5'))  # Seconds, doubled per retry
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+    
+    # Logging configuration
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # DEBUG enables per-call OpenAI and request details
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # 'text' or 'json' (one object per line)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'false' if os.environ.get('VERCEL') else 'true').lower() == 'true'  # Write logs from a background thread
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # Records dropped beyond this backlog
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '100'))  # Keep 1 in N high-volume per-request lines
+    
+    # JSON responses (orjson-backed provider when orjson is installed)
+    JSON_CHUNK_MIN_BYTES = int(os.getenv('JSON_CHUNK_MIN_BYTES', str(1024 * 1024)))  # Larger bodies are sent as separately encoded parts
+    
+    # Compressed transport (gzip/deflate request bodies, gzip or brotli responses)
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))  # Smaller bodies are sent as-is
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))  # Used when the brotli package is installed
+    MAX_DECOMPRESSED_REQUEST_BYTES = int(os.getenv('MAX_DECOMPRESSED_REQUEST_BYTES', str(64 * 1024 * 1024)))  # Decompression bomb limit
+    
+    # Prompt serialization (fact matrix and signal tables sent to the model)
+    PROMPT_CACHE_SIZE = int(os.getenv('PROMPT_CACHE_SIZE', '8192'))  # Rendered fact rows and cells kept in memory
+    TOKEN_COUNT_MODEL = os.getenv('TOKEN_COUNT_MODEL', 'gpt-4o')  # Tokenizer used for prompt token counts (needs tiktoken)
+    
+    # Analysis result caching (ETag / If-None-Match on analysis endpoints)
+    ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '256'))  # Stored results per worker
+    ANALYSIS_CACHE_VERSION = os.getenv('ANALYSIS_CACHE_VERSION', '1')  # Bump to invalidate every stored result and ETag
+    
+    # Speculative prefetch (analyses run in the background once facts are final)
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'false').lower() == 'true'
+    PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', '1'))  # Background threads per worker process
+    PREFETCH_MAX_ENTRIES = int(os.getenv('PREFETCH_MAX_ENTRIES', '256'))  # Prefetched results kept per worker
+    PREFETCH_TTL_SECONDS = int(os.getenv('PREFETCH_TTL_SECONDS', '1800'))  # Prefetched results older than this are recomputed
+    PREFETCH_WAIT_SECONDS = float(os.getenv('PREFETCH_WAIT_SECONDS', '60'))  # How long a request waits for a prefetch in progress
+    
+    # Request and stage timing (Prometheus /metrics endpoint and Server-Timing header)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'  # Exposes stage timings to clients
+    
+    # Fact query API (server-side filtering and paging of extracted facts)
+    FACT_STORE_MAX_CLAIMS = int(os.getenv('FACT_STORE_MAX_CLAIMS', '200'))  # Indexed fact sets kept per worker (least recently used dropped)
+    FACT_QUERY_PAGE_SIZE = int(os.getenv('FACT_QUERY_PAGE_SIZE', '50'))
+    FACT_QUERY_MAX_PAGE_SIZE = int(os.getenv('FACT_QUERY_MAX_PAGE_SIZE', '500'))
+    
+    # Bulk rationale PDF export
+    PDF_EXPORT_WORKERS = int(os.getenv('PDF_EXPORT_WORKERS', str(min(4, (os.cpu_count() or 1) - 1))))  # 0 renders in the web process
+    PDF_EXPORT_MAX_IN_FLIGHT = int(os.getenv('PDF_EXPORT_MAX_IN_FLIGHT', '8'))  # Renders outstanding at once (bounds memory)
+    PDF_EXPORT_MAX_RATIONALES = int(os.getenv('PDF_EXPORT_MAX_RATIONALES', '500'))
+    PDF_CACHE_MAX_MB = float(os.getenv('PDF_CACHE_MAX_MB', '256'))  # Least recently used PDFs are evicted above this
+    PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', str(24 * 60 * 60)))  # Seconds unused before a PDF (claim PII) is deleted
+    PDF_CACHE_PRUNE_INTERVAL = float(os.getenv('PDF_CACHE_PRUNE_INTERVAL', '60'))  # Seconds between cache checks
+    
+    # Batch claim ingestion (worker threads per pipeline stage)
+    BATCH_INGEST_ROOT = os.getenv('BATCH_INGEST_ROOT')  # Directory the /batch-ingest endpoint may read from; unset disables it
+    BATCH_EXTRACT_WORKERS = int(os.getenv('BATCH_EXTRACT_WORKERS', '4'))  # File extraction and classification
+    BATCH_FACT_WORKERS = int(os.getenv('BATCH_FACT_WORKERS', '4'))  # Fact extraction calls
+    BATCH_ANALYSIS_WORKERS = int(os.getenv('BATCH_ANALYSIS_WORKERS', '4'))  # Signals, recommendation, timeline and rationale calls
+    BATCH_MAX_CLAIMS_IN_FLIGHT = int(os.getenv('BATCH_MAX_CLAIMS_IN_FLIGHT', '8'))  # Claims held in memory at once
+    
+    # Email outbox configuration (durable queue drained by a background sender)
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '1000'))  # SendGrid allows 1000 personalizations per call
+    EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '2.0'))  # Seconds between idle checks
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+    EMAIL_OUTBOX_STALE_SECONDS = int(os.getenv('EMAIL_OUTBOX_STALE_SECONDS', '300'))  # Reclaim batches left 'sending' by a dead worker
     
     @staticmethod
     def validate_sendgrid_config():
@@ -57,6 +212,24 @@ class Config:
     MAX_IMAGE_SIZE_BYTES = int(MAX_IMAGE_SIZE_MB * 1024 * 1024)
     MAX_IMAGES_PER_PAGE = int(os.getenv('MAX_IMAGES_PER_PAGE', '5'))
     MAX_IMAGES_PER_PDF = int(os.getenv('MAX_IMAGES_PER_PDF', '20'))
-    MAX_TOTAL_IMAGES_PER_REQUEST = int(os.getenv('MAX_TOTAL_IMAGES_PER_REQUEST', '50'))
+    MAX_TOTAL_IMAGES_PER_REQUEST = int(os.getenv('MAX_TOTAL_IMAGES_PER_REQUEST', '50'))  # Hard cap on images sent with one model request
     JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', '85'))
+    
+    # Image deduplication configuration (perceptual hashing)
+    IMAGE_DEDUPE_MAX_DISTANCE = int(os.getenv('IMAGE_DEDUPE_MAX_DISTANCE', '6'))  # Max Hamming distance between 64-bit hashes
+    MIN_IMAGE_DIMENSION = int(os.getenv('MIN_IMAGE_DIMENSION', '48'))  # Smaller images (icons, rules) are dropped
+    MIN_IMAGE_ENTROPY = float(os.getenv('MIN_IMAGE_ENTROPY', '1.0'))  # Grayscale entropy in bits (blank areas, signatures)
+    
+    # Image rendition tiers (longest side in pixels); the model tier uses MAX_IMAGE_DIMENSION
+    THUMBNAIL_DIMENSION = int(os.getenv('THUMBNAIL_DIMENSION', '256'))
+    VIEWER_IMAGE_DIMENSION = int(os.getenv('VIEWER_IMAGE_DIMENSION', '1280'))
+    IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', str(365 * 24 * 60 * 60)))  # Renditions are immutable
+    IMAGE_CACHE_MAX_MB = float(os.getenv('IMAGE_CACHE_MAX_MB', '512'))  # Least recently used images are evicted above this
+    IMAGE_CACHE_PRUNE_INTERVAL = float(os.getenv('IMAGE_CACHE_PRUNE_INTERVAL', '60'))  # Seconds between cache size checks
+    
+    # Vision detail planning for fact extraction
+    VISION_TOKEN_BUDGET = int(os.getenv('VISION_TOKEN_BUDGET', '30000'))  # Image input tokens per extraction request
+    VISION_MAX_PAYLOAD_MB = float(os.getenv('VISION_MAX_PAYLOAD_MB', '20'))  # Image data URLs per request; below the API's 50MB request limit
+    VISION_LOW_DETAIL_MAX_DIMENSION = int(os.getenv('VISION_LOW_DETAIL_MAX_DIMENSION', '512'))  # Low detail is lossless at or below this size
+    VISION_PAGE_TEXT_MIN_CHARS = int(os.getenv('VISION_PAGE_TEXT_MIN_CHARS', '200'))  # Page text that makes its images supplementary
 
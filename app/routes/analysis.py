@@ -2,21 +2,28 @@
 Analysis routes (liability, timeline, etc.).
 """
 import re
+import uuid
 from flask import Blueprint, request, jsonify
 from app.services.openai_service import get_openai_service
+from app.services import model_router
+from app.services.model_router import TASK_EVIDENCE_COMPLETENESS, TASK_ESCALATION
+from app.services import analysis_service
+from app.services.rationale_service import get_rationale_store, is_valid_claim_id, SOURCE_GENERATED, SOURCE_EDITED
+from app.utils.fact_utils import build_signal_links
+from app.services.analysis_cache_service import conditional_analysis
 from app.prompts import (
-    get_liability_signals_prompt,
     get_evidence_completeness_prompt,
+    get_escalation_prompt,
+    get_liability_signals_prompt,
     get_timeline_prompt,
     get_liability_recommendation_prompt,
-    get_claim_rationale_prompt,
-    get_escalation_prompt,
 )
 
 bp = Blueprint('analysis', __name__)
 
 
 @bp.route('/analyze-liability-signals', methods=['POST'])
+@conditional_analysis(get_liability_signals_prompt)
 def analyze_liability_signals():
     """Analyze fact matrix to identify liability signals using OpenAI."""
     try:
@@ -31,35 +38,14 @@ def analyze_liability_signals():
         if not facts:
             return jsonify({'error': 'No facts provided. Please extract facts first.'}), 400
         
-        # Format facts for the prompt
-        facts_text = "\n\nFact Matrix:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"\nFact {idx + 1}:\n"
-            facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-            facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-            facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-            facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-            facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-            if fact.get('normalized_value'):
-                facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
-        
-        # Prepare content for OpenAI
-        system_prompt = get_liability_signals_prompt()
-        
-        # Call OpenAI API with JSON mode using system prompt for instructions
-        result = openai_service.call_with_json_response(
-            system_prompt=system_prompt,
-            user_content=facts_text,
-            max_tokens=4000
-        )
+        signals = analysis_service.analyze_liability_signals(facts)
         
-        if not result:
+        if signals is None:
             return jsonify({'error': 'Failed to get response from OpenAI'}), 500
         
-        signals = result.get('signals', [])
-        
         return jsonify({
             'signals': signals,
+            'signal_links': build_signal_links(facts, signals),
             'success': True
         }), 200
     
@@ -68,6 +54,7 @@ def analyze_liability_signals():
 
 
 @bp.route('/check-evidence-completeness', methods=['POST'])
+@conditional_analysis(get_evidence_completeness_prompt)
 def check_evidence_completeness():
     """Check completeness of standard evidence package using OpenAI."""
     try:
@@ -92,7 +79,8 @@ def check_evidence_completeness():
             file_type = file_data.get('type', 'unknown')
             files_text += f"\n{filename} ({file_type})\n"
         
-        result = openai_service.call_with_json_response(
+        result = model_router.call_json(
+            TASK_EVIDENCE_COMPLETENESS,
             system_prompt=system_prompt,
             user_content=files_text,
             max_tokens=4000
@@ -108,6 +96,7 @@ def check_evidence_completeness():
 
 
 @bp.route('/generate-timeline', methods=['POST'])
+@conditional_analysis(get_timeline_prompt)
 def generate_timeline():
     """Generate timeline reconstruction from facts."""
     try:
@@ -121,17 +110,7 @@ def generate_timeline():
         if not facts:
             return jsonify({'error': 'No facts provided. Please extract facts first.'}), 400
         
-        system_prompt = get_timeline_prompt()
-        
-        facts_text = "\n\nFacts:\n"
-        for idx, fact in enumerate(facts):
-            facts_text += f"{idx + 1}. {fact.get('extracted_fact', 'N/A')}\n"
-        
-        result = openai_service.call_with_json_response(
-            system_prompt=system_prompt,
-            user_content=facts_text,
-            max_tokens=4000
-        )
+        result = analysis_service.generate_timeline(facts)
         
         if not result:
             return jsonify({'error': 'Failed to get response from OpenAI'}), 500
@@ -143,6 +122,7 @@ def generate_timeline():
 
 
 @bp.route('/get-liability-recommendation', methods=['POST'])
+@conditional_analysis(get_liability_recommendation_prompt)
 def get_liability_recommendation():
     """Get liability percentage recommendation."""
     try:
@@ -157,44 +137,11 @@ def get_liability_recommendation():
         if not facts:
             return jsonify({'error': 'No facts provided.'}), 400
         
-        system_prompt = get_liability_recommendation_prompt()
-        
-        # Format facts and signals for the user content
-        facts_text = "\n\nFacts:\n"
-        for fact in facts:
-            facts_text += f"- {fact.get('extracted_fact', 'N/A')}\n"
-        
-        signals_text = "\n\nSignals:\n"
-        for signal in signals:
-            signals_text += f"- {signal.get('signal_type', 'N/A')}: {signal.get('impact_on_liability', 'N/A')}\n"
-        
-        user_content = facts_text + signals_text
-        
-        result = openai_service.call_with_json_response(
-            system_prompt=system_prompt,
-            user_content=user_content,
-            max_tokens=4000
-        )
+        result = analysis_service.get_liability_recommendation(facts, signals)
         
         if not result:
             return jsonify({'error': 'Failed to get response from OpenAI'}), 500
         
-        # Validate percentages
-        claimant_percent = result.get('claimant_liability_percent', 50)
-        other_driver_percent = result.get('other_driver_liability_percent', 50)
-        
-        claimant_percent = max(0, min(100, int(round(claimant_percent))))
-        other_driver_percent = max(0, min(100, int(round(other_driver_percent))))
-        
-        # Normalize to sum to 100
-        total = claimant_percent + other_driver_percent
-        if total > 0:
-            claimant_percent = int(round(claimant_percent * 100 / total))
-            other_driver_percent = 100 - claimant_percent
-        
-        result['claimant_liability_percent'] = claimant_percent
-        result['other_driver_liability_percent'] = other_driver_percent
-        
         return jsonify(result), 200
     
     except Exception as e:
@@ -214,36 +161,116 @@ def generate_claim_rationale():
         signals = request_data.get('signals', [])
         recommendation = request_data.get('recommendation', {})
         
-        system_prompt = get_claim_rationale_prompt()
-        
-        content_parts = [
-            "Facts:",
-            *[f"- {fact.get('extracted_fact', 'N/A')}" for fact in facts],
-            "",
-            "Signals:",
-            *[f"- {signal.get('signal_type', 'N/A')}: {signal.get('impact_on_liability', 'N/A')}" for signal in signals],
-            "",
-            "Recommendation:",
-            str(recommendation or {})
-        ]
-        user_content = "\n".join(content_parts)
-        
-        result = openai_service.call_with_json_response(
-            system_prompt=system_prompt,
-            user_content=user_content,
-            max_tokens=4000
-        )
+        result = analysis_service.generate_claim_rationale(facts, signals, recommendation)
         
         if not result:
             return jsonify({'error': 'Failed to get response from OpenAI'}), 500
         
+        # Persist so reopening the claim is a store read rather than another model call
+        claim_id = request_data.get('claim_id')
+        if is_valid_claim_id(claim_id):
+            try:
+                stored = get_rationale_store().append(claim_id, result, source=SOURCE_GENERATED)
+                result['claim_id'] = claim_id
+                result['version'] = stored['version']
+            except Exception as store_error:
+                print(f"Warning: Could not store generated rationale for claim {claim_id}: {str(store_error)}")
+        
         return jsonify(result), 200
     
     except Exception as e:
         return jsonify({'error': f'Claim rationale generation failed: {str(e)}'}), 500
 
 
+@bp.route('/save-claim-rationale', methods=['POST'])
+def save_claim_rationale():
+    """
+    Save an edited claim rationale as a new version.
+    
+    Callers that do not send a claim_id get a new claim ID, returned in the
+    response so later saves can add versions to the same claim.
+    """
+    try:
+        request_data = request.json or {}
+        rationale = request_data.get('rationale', {})
+        claim_id = request_data.get('claim_id') or uuid.uuid4().hex
+        
+        if not rationale:
+            return jsonify({'error': 'No rationale data provided.'}), 400
+        
+        # Validate required fields
+        if not isinstance(rationale, dict):
+            return jsonify({'error': 'Invalid rationale format.'}), 400
+        
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id (letters, digits, ".", "_" or "-", up to 128 characters).'}), 400
+        
+        stored = get_rationale_store().append(claim_id, rationale, source=SOURCE_EDITED)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Rationale saved successfully.',
+            'claim_id': claim_id,
+            'version': stored['version'],
+            'created': stored['created']
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to save rationale: {str(e)}'}), 500
+
+
+@bp.route('/claims/<claim_id>/rationale', methods=['GET'])
+def get_claim_rationale(claim_id):
+    """Get the latest stored rationale for a claim."""
+    try:
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id.'}), 400
+        
+        record = get_rationale_store().get_latest(claim_id)
+        if record is None:
+            return jsonify({'error': 'No rationale stored for this claim.'}), 404
+        
+        return jsonify(record), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to load rationale: {str(e)}'}), 500
+
+
+@bp.route('/claims/<claim_id>/rationale/history', methods=['GET'])
+def get_claim_rationale_history(claim_id):
+    """List every stored version of a claim's rationale with the fields each one changed."""
+    try:
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id.'}), 400
+        
+        return jsonify({
+            'claim_id': claim_id,
+            'versions': get_rationale_store().get_history(claim_id)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to load rationale history: {str(e)}'}), 500
+
+
+@bp.route('/claims/<claim_id>/rationale/versions/<int:version>', methods=['GET'])
+def get_claim_rationale_version(claim_id, version):
+    """Get one stored version of a claim's rationale."""
+    try:
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id.'}), 400
+        
+        record = get_rationale_store().get_version(claim_id, version)
+        if record is None:
+            return jsonify({'error': 'Rationale version not found.'}), 404
+        
+        return jsonify(record), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to load rationale version: {str(e)}'}), 500
+
+
 @bp.route('/generate-escalation-package', methods=['POST'])
+@conditional_analysis(get_escalation_prompt)
 def generate_escalation_package():
     """Generate supervisor escalation package."""
     try:
@@ -274,7 +301,8 @@ def generate_escalation_package():
         ]
         user_content = "\n".join(content_parts)
         
-        result = openai_service.call_with_json_response(
+        result = model_router.call_json(
+            TASK_ESCALATION,
             system_prompt=system_prompt,
             user_content=user_content,
             max_tokens=4000
@@ -0,0 +1,99 @@
+"""
+Batch ingestion routes (headless processing of claim folders on the server).
+"""
+import os
+import re
+from flask import Blueprint, request, jsonify, send_file
+from app.config import Config
+
+bp = Blueprint('batch', __name__)
+
+_UNSAFE_NAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+@bp.route('/batch-ingest', methods=['POST'])
+def start_batch_ingest():
+    """
+    Start processing a directory of claim folders under BATCH_INGEST_ROOT.
+    
+    Set openai_batch to send model calls through the OpenAI Batch API for
+    backlogs where cost matters more than turnaround.
+    """
+    try:
+        from app.services.batch_service import start_batch_job
+        
+        if not Config.BATCH_INGEST_ROOT:
+            return jsonify({'error': 'Batch ingestion is not enabled. Set BATCH_INGEST_ROOT to the directory claim drops are written to.'}), 403
+        
+        request_data = request.json or {}
+        directory = request_data.get('directory', '')
+        if not isinstance(directory, str):
+            return jsonify({'error': 'directory must be a path relative to the batch ingestion root.'}), 400
+        
+        # Security: only directories inside the configured root
+        ingest_root = os.path.realpath(Config.BATCH_INGEST_ROOT)
+        batch_root = os.path.realpath(os.path.join(ingest_root, directory))
+        if os.path.commonpath([ingest_root, batch_root]) != ingest_root:
+            return jsonify({'error': 'directory must be inside the batch ingestion root.'}), 400
+        if not os.path.isdir(batch_root):
+            return jsonify({'error': f'Directory not found: {directory}'}), 404
+        
+        # One results file per directory, so posting the same directory again resumes it
+        relative_root = os.path.relpath(batch_root, ingest_root)
+        output_name = _UNSAFE_NAME_CHARS.sub('_', relative_root).strip('._') or 'root'
+        output_path = os.path.join(Config.get_batch_output_folder(), f"{output_name}.jsonl")
+        
+        try:
+            job = start_batch_job(batch_root, output_path, openai_batch=bool(request_data.get('openai_batch')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.job_id,
+            'status': job.get_stats()['status']
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to start batch ingestion: {str(e)}'}), 500
+
+
+@bp.route('/batch-ingest/<job_id>', methods=['GET'])
+def get_batch_ingest_status(job_id):
+    """Get progress and throughput of a batch job."""
+    from app.services.batch_service import get_batch_job
+    
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Batch job not found.'}), 404
+    return jsonify(job.get_stats()), 200
+
+
+@bp.route('/batch-ingest/<job_id>/results', methods=['GET'])
+def download_batch_ingest_results(job_id):
+    """Download a batch job's JSONL results (claims finished so far)."""
+    from app.services.batch_service import get_batch_job
+    
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Batch job not found.'}), 404
+    if not os.path.exists(job.output_path):
+        return jsonify({'error': 'No results written yet.'}), 404
+    return send_file(
+        os.path.abspath(job.output_path),
+        mimetype='application/x-ndjson',
+        as_attachment=True,
+        download_name=os.path.basename(job.output_path)
+    )
+
+
+@bp.route('/batch-ingest/<job_id>/stop', methods=['POST'])
+def stop_batch_ingest(job_id):
+    """Stop a batch job after the claims already in flight."""
+    from app.services.batch_service import get_batch_job
+    
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Batch job not found.'}), 404
+    job.stop()
+    return jsonify({'success': True, 'job_id': job_id}), 200
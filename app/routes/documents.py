@@ -1,27 +1,33 @@
 """
 Document processing routes.
 """
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, make_response, Response, send_file, stream_with_context
 from app.services.openai_service import get_openai_service
+from app.services import model_router
+from app.services.model_router import TASK_SUMMARY, TASK_EMAIL_DRAFT
 from app.prompts import get_summary_prompt, get_email_draft_prompt
+from app.services.analysis_cache_service import conditional_analysis
 from app.config import Config
+import os
 import uuid
 from datetime import datetime
-import requests
 import logging
 
+# Closing instruction sent after the summary prompt, ahead of the documents
+SUMMARY_REQUEST = "Please analyze the following auto insurance claim documents and provide a comprehensive summary based ONLY on the visible text:"
+
 bp = Blueprint('documents', __name__)
 logger = logging.getLogger(__name__)
 
-# Log all requests to this blueprint for debugging
+# Log a sample of requests to this blueprint
 @bp.before_request
 def log_request():
-    logger.info(f"[DOCUMENTS BLUEPRINT] {request.method} {request.path}")
-    logger.info(f"[DOCUMENTS BLUEPRINT] Request endpoint: {request.endpoint}")
-    logger.info(f"[DOCUMENTS BLUEPRINT] Request URL: {request.url}")
+    logger.info("[DOCUMENTS BLUEPRINT] %s %s -> %s", request.method, request.path, request.endpoint,
+                extra={'sample_every': Config.LOG_SAMPLE_EVERY})
 
 
 @bp.route('/generate-summary', methods=['POST'])
+@conditional_analysis(get_summary_prompt)
 def generate_summary():
     """Generate a summary of all uploaded files using OpenAI."""
     try:
@@ -35,8 +41,8 @@ def generate_summary():
         if not files_data:
             return jsonify({'error': 'No files provided'}), 400
         
-        # Build text summary content
-        text_content = "Please analyze the following auto insurance claim documents and provide a comprehensive summary based ONLY on the visible text:\n\n"
+        # Build text summary content (documents only; the instructions are the static system prefix)
+        text_content = ""
         
         for file_data in files_data:
             filename = file_data.get('filename', file_data.get('originalFilename', 'Unknown'))
@@ -50,10 +56,9 @@ def generate_summary():
                     if page_text:
                         text_content += f"\nPage {page.get('page_number', '?')}:\n{page_text}\n"
         
-        system_prompt = get_summary_prompt()
-        
-        summary = openai_service.call_with_text_response(
-            system_prompt=system_prompt,
+        summary = model_router.call_text(
+            TASK_SUMMARY,
+            system_prompt=(get_summary_prompt(), SUMMARY_REQUEST),
             user_content=text_content,
             max_tokens=2000
         )
@@ -72,263 +77,147 @@ def generate_summary():
 
 @bp.route('/download-claim-rationale-pdf', methods=['POST'])
 def download_claim_rationale_pdf():
-    """Generate and return a PDF of the claim rationale."""
+    """
+    Generate and return a PDF of the claim rationale.
+    
+    Rendered PDFs are cached by rationale content hash and streamed from disk,
+    so re-downloading an unchanged rationale skips layout entirely.
+    """
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-        from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
-        from io import BytesIO
-        import html2text
+        from app.services.rationale_pdf_service import compute_rationale_hash, get_rationale_pdf
         
         # Parse and validate request data
         request_data = request.json
         if not request_data:
-            print("download_claim_rationale_pdf: No request data provided.")
+            logger.warning("download_claim_rationale_pdf: No request data provided.")
             return jsonify({'error': 'No request data provided.'}), 400
             
         rationale = request_data.get('rationale', {})
         
         if not rationale:
-            print("download_claim_rationale_pdf: No rationale data provided.")
+            logger.warning("download_claim_rationale_pdf: No rationale data provided.")
             return jsonify({'error': 'No rationale data provided.'}), 400
         
         # Ensure rationale is a dictionary
         if not isinstance(rationale, dict):
-            print("download_claim_rationale_pdf: Rationale is not a dictionary.")
+            logger.warning("download_claim_rationale_pdf: Rationale is not a dictionary.")
             return jsonify({'error': 'Invalid rationale format. Expected a dictionary.'}), 400
         
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter,
-                                rightMargin=72, leftMargin=72,
-                                topMargin=72, bottomMargin=18)
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor='#333333',
-            spaceAfter=12,
-            alignment=TA_LEFT
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor='#333333',
-            spaceAfter=10,
-            spaceBefore=12,
-            alignment=TA_LEFT
-        )
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor='#333333',
-            spaceAfter=8,
-            alignment=TA_JUSTIFY,
-            leading=14
-        )
+        # send_file only revalidates GET/HEAD, so answer If-None-Match on this POST
+        # here, before anything is rendered
+        content_hash = compute_rationale_hash(rationale)
+        if request.if_none_match.contains(content_hash):
+            response = make_response('', 304)
+            response.set_etag(content_hash)
+            return response
         
-        # Convert HTML to plain text
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.body_width = 0
-        
-        # Helper function to safely convert text to PDF paragraph
-        def safe_paragraph(text, style):
-            """Safely convert text to Paragraph, handling empty strings and None."""
-            if not text:
-                return None
-            try:
-                # Convert to string and strip
-                text_str = str(text).strip()
-                if not text_str:
-                    return None
-                # Convert HTML to plain text if needed
-                if '<' in text_str or '>' in text_str:
-                    text_str = h.handle(text_str).strip()
-                # Escape XML special characters for ReportLab
-                text_str = text_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                return Paragraph(text_str, style)
-            except Exception as e:
-                print(f"Error creating paragraph: {e}")
-                return None
-        
-        # Title
-        elements.append(Paragraph("Claim File Rationale", title_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Incident Summary
-        if rationale.get('incident_summary'):
-            para = safe_paragraph(rationale['incident_summary'], normal_style)
-            if para:
-                elements.append(Paragraph("Incident Summary", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Evidence Overview
-        if rationale.get('evidence_overview'):
-            evidence = rationale['evidence_overview']
-            has_evidence = False
-            if isinstance(evidence, dict):
-                if evidence.get('narratives'):
-                    para = safe_paragraph(evidence['narratives'], normal_style)
-                    if para:
-                        if not has_evidence:
-                            elements.append(Paragraph("Evidence Overview", heading_style))
-                            has_evidence = True
-                        elements.append(Paragraph("<b>Narratives:</b>", normal_style))
-                        elements.append(para)
-                if evidence.get('photos'):
-                    para = safe_paragraph(evidence['photos'], normal_style)
-                    if para:
-                        if not has_evidence:
-                            elements.append(Paragraph("Evidence Overview", heading_style))
-                            has_evidence = True
-                        elements.append(Paragraph("<b>Photos:</b>", normal_style))
-                        elements.append(para)
-            if has_evidence:
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Liability Assessment Logic
-        if rationale.get('liability_assessment_logic'):
-            para = safe_paragraph(rationale['liability_assessment_logic'], normal_style)
-            if para:
-                elements.append(Paragraph("Liability Assessment Logic", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Key Evidence
-        if rationale.get('key_evidence') and isinstance(rationale['key_evidence'], list) and len(rationale['key_evidence']) > 0:
-            elements.append(Paragraph("Key Evidence Supporting Assessment", heading_style))
-            for item in rationale['key_evidence']:
-                if item:
-                    item_str = str(item).strip()
-                    if item_str:
-                        # Convert HTML to plain text if needed
-                        if '<' in item_str or '>' in item_str:
-                            item_str = h.handle(item_str).strip()
-                        # Escape XML special characters
-                        item_str = item_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                        elements.append(Paragraph(f"• {item_str}", normal_style))
-            elements.append(Spacer(1, 0.15*inch))
-        
-        # Open Questions
-        if rationale.get('open_questions') and isinstance(rationale['open_questions'], list) and len(rationale['open_questions']) > 0:
-            elements.append(Paragraph("Open Questions / Follow-Up", heading_style))
-            for item in rationale['open_questions']:
-                if item:
-                    item_str = str(item).strip()
-                    if item_str:
-                        # Convert HTML to plain text if needed
-                        if '<' in item_str or '>' in item_str:
-                            item_str = h.handle(item_str).strip()
-                        # Escape XML special characters
-                        item_str = item_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                        elements.append(Paragraph(f"• {item_str}", normal_style))
-            elements.append(Spacer(1, 0.15*inch))
-        
-        # Coverage Considerations
-        if rationale.get('coverage_considerations'):
-            para = safe_paragraph(rationale['coverage_considerations'], normal_style)
-            if para:
-                elements.append(Paragraph("Coverage Considerations", heading_style))
-                elements.append(para)
-                elements.append(Spacer(1, 0.15*inch))
-        
-        # Recommendation
-        if rationale.get('recommendation'):
-            para = safe_paragraph(rationale['recommendation'], normal_style)
-            if para:
-                elements.append(Paragraph("Recommendation", heading_style))
-                elements.append(para)
-        
-        # Check if we have any content
-        if len(elements) <= 2:  # Only title and spacer
-            return jsonify({'error': 'No content available to generate PDF.'}), 400
-        
-        # Build PDF
+        # Render (or reuse) the PDF
         try:
-            doc.build(elements)
+            pdf_path, content_hash = get_rationale_pdf(rationale)
+        except ValueError as content_error:
+            return jsonify({'error': str(content_error)}), 400
         except Exception as build_error:
-            print(f"download_claim_rationale_pdf: Error building PDF: {build_error}")
+            logger.error("download_claim_rationale_pdf: Error building PDF: %s", build_error, exc_info=True)
             return jsonify({'error': f'Error building PDF: {str(build_error)}'}), 500
         
-        # Get PDF data
-        pdf_data = buffer.getvalue()
-        buffer.close()
+        # Stream the PDF from disk; the content hash doubles as the ETag
+        response = send_file(
+            os.path.abspath(pdf_path),  # Relative paths resolve against the app package
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name='claim_rationale.pdf',
+            etag=content_hash,
+            max_age=0
+        )
+        response.headers['X-Render-Cache-Key'] = content_hash
+        return response
+    
+    except ImportError as imp_err:
+        # Fallback: return JSON if reportlab / html2text are not available
+        logger.error("download_claim_rationale_pdf: ImportError while generating PDF: %s", imp_err)
+        return jsonify({
+            'error': 'PDF generation is currently unavailable. Please contact support.'
+        }), 500
+    except Exception as e:
+        logger.error("download_claim_rationale_pdf: Unexpected error: %s", e, exc_info=True)
+        return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+
+
+@bp.route('/download-claim-rationales', methods=['POST'])
+def download_claim_rationales():
+    """
+    Export many claim rationales as a ZIP of PDFs.
+    
+    Expects {"rationales": [{"claim_id": "...", "rationale": {...}}, ...]}.
+    PDFs are rendered in a process pool and streamed into the ZIP as they
+    finish; entries that cannot be rendered are listed in errors.txt.
+    """
+    try:
+        from app.services.rationale_pdf_service import stream_rationale_export
+        
+        request_data = request.json or {}
+        items = request_data.get('rationales', [])
         
-        if not pdf_data or len(pdf_data) == 0:
-            return jsonify({'error': 'Generated PDF is empty.'}), 500
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'No rationales provided.'}), 400
+        
+        if len(items) > Config.PDF_EXPORT_MAX_RATIONALES:
+            return jsonify({
+                'error': f'Too many rationales ({len(items)}). Maximum allowed: {Config.PDF_EXPORT_MAX_RATIONALES}.'
+            }), 400
+        
+        if not all(isinstance(item, dict) and isinstance(item.get('rationale'), dict) for item in items):
+            return jsonify({'error': 'Invalid rationales format. Expected a list of {"claim_id", "rationale"} objects.'}), 400
         
-        # Return PDF as response
         return Response(
-            pdf_data,
-            mimetype='application/pdf',
+            stream_with_context(stream_rationale_export(items)),
+            mimetype='application/zip',
             headers={
-                'Content-Disposition': 'attachment; filename=claim_rationale.pdf'
+                'Content-Disposition': 'attachment; filename=claim_rationales.zip'
             }
         )
     
     except ImportError as imp_err:
-        # Fallback: return JSON if reportlab / html2text are not available
-        print(f"download_claim_rationale_pdf: ImportError while generating PDF: {imp_err}")
+        logger.error("download_claim_rationales: ImportError while generating PDFs: %s", imp_err)
         return jsonify({
             'error': 'PDF generation is currently unavailable. Please contact support.'
         }), 500
     except Exception as e:
-        print(f"download_claim_rationale_pdf: Unexpected error: {e}")
-        return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
+        logger.error("download_claim_rationales: Unexpected error: %s", e, exc_info=True)
+        return jsonify({'error': f'PDF export failed: {str(e)}'}), 500
 
 
 @bp.route('/generate-email-draft', methods=['POST'])
 def generate_email_draft():
     """Generate an email draft requesting missing evidence using OpenAI."""
     try:
-        logger.info("[EMAIL DRAFT] Request received at /generate-email-draft")
-        logger.info(f"[EMAIL DRAFT] Request method: {request.method}")
-        logger.info(f"[EMAIL DRAFT] Request headers: {dict(request.headers)}")
-        
         openai_service = get_openai_service()
         if not openai_service.is_available():
             error_msg = 'OpenAI API key not configured. Please set OPENAI_API_KEY in your environment.'
-            logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
+            logger.warning("[EMAIL DRAFT ERROR] %s", error_msg)
             return jsonify({'error': error_msg}), 500
         
         if not request.json:
             error_msg = 'Invalid request: JSON body required'
-            logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
-            logger.error(f"[EMAIL DRAFT ERROR] Request content type: {request.content_type}")
-            logger.error(f"[EMAIL DRAFT ERROR] Request data: {request.data}")
+            logger.warning("[EMAIL DRAFT ERROR] %s (content type: %s)", error_msg, request.content_type)
             return jsonify({'error': error_msg}), 400
         
         request_data = request.json
-        logger.info(f"[EMAIL DRAFT] Request data keys: {list(request_data.keys())}")
-        
         selected_evidence = request_data.get('selected_evidence', [])
         contact = request_data.get('contact', {})
         claim_context = request_data.get('claim_context', '')
         
-        logger.info(f"[EMAIL DRAFT] Selected evidence count: {len(selected_evidence)}")
-        logger.info(f"[EMAIL DRAFT] Contact: {contact.get('name', 'N/A')} ({contact.get('email', 'N/A')})")
+        logger.debug("[EMAIL DRAFT] Selected evidence count: %d", len(selected_evidence))
         
         if not selected_evidence:
             error_msg = 'No evidence items selected.'
-            logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
+            logger.warning("[EMAIL DRAFT ERROR] %s", error_msg)
             return jsonify({'error': error_msg}), 400
         
         if not contact or not contact.get('email'):
             error_msg = 'Contact information is required.'
-            logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
-            logger.error(f"[EMAIL DRAFT ERROR] Contact data: {contact}")
+            logger.warning("[EMAIL DRAFT ERROR] %s", error_msg)
+            logger.debug("[EMAIL DRAFT ERROR] Contact data: %s", contact)
             return jsonify({'error': error_msg}), 400
         
         # Build user content for OpenAI
@@ -358,8 +247,8 @@ Missing Evidence Items:
         
         system_prompt = get_email_draft_prompt()
         
-        logger.info("[EMAIL DRAFT] Calling OpenAI service to generate draft")
-        draft = openai_service.call_with_text_response(
+        draft = model_router.call_text(
+            TASK_EMAIL_DRAFT,
             system_prompt=system_prompt,
             user_content=user_content,
             max_tokens=2000
@@ -367,157 +256,92 @@ Missing Evidence Items:
         
         if not draft:
             error_msg = 'Failed to generate email draft. OpenAI API returned an empty response.'
-            logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
-            logger.error(f"[EMAIL DRAFT ERROR] OpenAI service response was None or empty")
+            logger.error("[EMAIL DRAFT ERROR] %s", error_msg)
             return jsonify({'error': error_msg}), 500
         
-        logger.info(f"[EMAIL DRAFT] Successfully generated draft (length: {len(draft)} characters)")
+        logger.debug("[EMAIL DRAFT] Generated draft (length: %d characters)", len(draft))
         return jsonify({
             'draft': draft,
             'success': True
         }), 200
     
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
         error_msg = f'Email draft generation failed: {str(e)}'
-        logger.error(f"[EMAIL DRAFT ERROR] {error_msg}")
-        logger.error(f"[EMAIL DRAFT ERROR] Traceback:\n{error_trace}")
-        print(f"[EMAIL DRAFT ERROR] Exception: {str(e)}")
-        print(f"[EMAIL DRAFT ERROR] Traceback:\n{error_trace}")
+        logger.error("[EMAIL DRAFT ERROR] %s", error_msg, exc_info=True)
         return jsonify({'error': error_msg}), 500
 
 
 @bp.route('/send-email-request', methods=['POST'])
 def send_email_request():
-    """Send an email request using SendGrid."""
+    """
+    Queue an evidence request email for one or more recipients.
+    
+    Messages are written to the durable outbox and sent by the background
+    sender, so this returns as soon as they are queued. Poll /email-status
+    with the returned IDs for delivery status.
+    """
     try:
         request_data = request.json
-        to_email = request_data.get('to')
+        to_field = request_data.get('to')
         subject = request_data.get('subject', 'Request for Additional Evidence')
         body = request_data.get('body', '')
         selected_evidence = request_data.get('selected_evidence', [])
         
-        if not to_email:
+        # Accept a single address or a list (e.g. claimant, other driver and police at once)
+        recipients = to_field if isinstance(to_field, list) else [to_field]
+        recipients = [email.strip() for email in recipients if isinstance(email, str) and email.strip()]
+        
+        if not recipients:
             return jsonify({'error': 'Recipient email is required.'}), 400
         
         if not body:
             return jsonify({'error': 'Email body is required.'}), 400
         
-        # Check if SendGrid is configured
-        if not Config.SENDGRID_API_KEY:
-            # Fallback to mock mode for development
-            print(f"[MOCK EMAIL SEND - SendGrid not configured]")
-            print(f"To: {to_email}")
-            print(f"Subject: {subject}")
-            print(f"Body: {body[:200]}...")  # Truncate for logging
-            print(f"Selected Evidence Items: {len(selected_evidence)}")
-            print(f"Timestamp: {datetime.now().isoformat()}")
-            print(f"Note: Set SENDGRID_API_KEY environment variable to enable actual email sending")
-            
-            message_id = str(uuid.uuid4())
-            return jsonify({
-                'success': True,
-                'message_id': message_id,
-                'sent_at': datetime.now().isoformat(),
-                'mock_mode': True,
-                'note': 'SendGrid not configured - email was logged but not sent'
-            }), 200
-        
-        # Validate SendGrid configuration
-        if not Config.SENDGRID_FROM_EMAIL:
+        # Validate SendGrid configuration (without an API key the sender logs instead of sending)
+        if Config.SENDGRID_API_KEY and not Config.SENDGRID_FROM_EMAIL:
             return jsonify({
                 'error': 'SENDGRID_FROM_EMAIL is required. Please set SENDGRID_FROM_EMAIL environment variable.'
             }), 500
         
-        # Send email using SendGrid REST API
-        try:
-            url = 'https://api.sendgrid.com/v3/mail/send'
-            headers = {
-                'Authorization': f'Bearer {Config.SENDGRID_API_KEY}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Format request body according to SendGrid v3 API
-            payload = {
-                'personalizations': [
-                    {
-                        'to': [{'email': to_email}]
-                    }
-                ],
-                'from': {
-                    'email': Config.SENDGRID_FROM_EMAIL,
-                    'name': Config.SENDGRID_FROM_NAME
-                },
-                'subject': subject,
-                'content': [
-                    {
-                        'type': 'text/plain',
-                        'value': body
-                    }
-                ]
-            }
-            
-            # Send request
-            response = requests.post(url, headers=headers, json=payload)
-            
-            # Check response status
-            if response.status_code == 202:
-                # Success - SendGrid returns 202 Accepted
-                # Get message ID from response headers
-                message_id = response.headers.get('X-Message-Id') or str(uuid.uuid4())
-                
-                # Log successful send
-                print(f"[SENDGRID EMAIL SENT]")
-                print(f"To: {to_email}")
-                print(f"Subject: {subject}")
-                print(f"Status Code: {response.status_code}")
-                print(f"Message ID: {message_id}")
-                print(f"Timestamp: {datetime.now().isoformat()}")
-                
-                return jsonify({
-                    'success': True,
-                    'message_id': message_id,
-                    'sent_at': datetime.now().isoformat(),
-                    'status_code': response.status_code
-                }), 200
-            else:
-                # Handle error responses
-                error_message = f"HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    if 'errors' in error_data and len(error_data['errors']) > 0:
-                        error_message = error_data['errors'][0].get('message', error_message)
-                    elif 'error' in error_data:
-                        error_message = error_data['error']
-                except:
-                    error_message = response.text or error_message
-                
-                print(f"[SENDGRID ERROR] Failed to send email: {error_message}")
-                print(f"Response Status: {response.status_code}")
-                print(f"Response Body: {response.text[:500]}")
-                
-                # Provide more helpful error messages
-                if response.status_code == 401:
-                    return jsonify({'error': 'SendGrid authentication failed. Please check your SENDGRID_API_KEY.'}), 500
-                elif response.status_code == 403:
-                    return jsonify({'error': 'SendGrid access forbidden. Please check your API key permissions.'}), 500
-                elif response.status_code == 400:
-                    return jsonify({'error': f'Invalid email request: {error_message}'}), 400
-                else:
-                    return jsonify({'error': f'SendGrid error: {error_message}'}), 500
+        from app.services.email_service import get_email_outbox
         
-        except requests.exceptions.RequestException as send_error:
-            # Handle network/request errors
-            error_message = str(send_error)
-            print(f"[SENDGRID ERROR] Request failed: {error_message}")
-            return jsonify({'error': f'Failed to connect to SendGrid: {error_message}'}), 500
+        outbox_ids = get_email_outbox().enqueue(recipients, subject, body)
+        queued_at = datetime.now().isoformat()
+        logger.info("[EMAIL QUEUED] %d message(s), %d evidence item(s), subject: %s",
+                    len(outbox_ids), len(selected_evidence), subject)
+        
+        return jsonify({
+            'success': True,
+            'status': 'queued',
+            'message_id': outbox_ids[0],
+            'message_ids': outbox_ids,
+            'queued_at': queued_at,
+            'mock_mode': not Config.SENDGRID_API_KEY
+        }), 202
     
     except Exception as e:
-        print(f"[EMAIL SEND ERROR] Unexpected error: {str(e)}")
+        logger.error("[EMAIL SEND ERROR] Unexpected error: %s", e, exc_info=True)
         return jsonify({'error': f'Email sending failed: {str(e)}'}), 500
 
 
+@bp.route('/email-status', methods=['GET'])
+def get_email_status():
+    """Get delivery status for queued emails (?ids=<id>,<id>...)."""
+    try:
+        outbox_ids = [outbox_id for outbox_id in request.args.get('ids', '').split(',') if outbox_id]
+        if not outbox_ids:
+            return jsonify({'error': 'Provide one or more message IDs in the ids query parameter.'}), 400
+        if len(outbox_ids) > Config.EMAIL_OUTBOX_BATCH_SIZE:
+            return jsonify({'error': f'At most {Config.EMAIL_OUTBOX_BATCH_SIZE} message IDs can be queried at once.'}), 400
+        
+        from app.services.email_service import get_email_outbox
+        
+        return jsonify({'messages': get_email_outbox().get_status(outbox_ids)}), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Email status lookup failed: {str(e)}'}), 500
+
+
 @bp.route('/send-test-email', methods=['POST'])
 def send_test_email():
     """Send a test email to verify SendGrid integration."""
@@ -561,36 +385,22 @@ Kavya
 Ema Automobile Insurance
 """
         
+        from app.services.http_service import get_http_client, RequestException
+        from app.services.email_service import build_sendgrid_payload, get_sendgrid_error
+        
         # Send email using SendGrid REST API
         try:
-            url = 'https://api.sendgrid.com/v3/mail/send'
+            url = f'{Config.SENDGRID_API_URL}/v3/mail/send'
             headers = {
                 'Authorization': f'Bearer {Config.SENDGRID_API_KEY}',
                 'Content-Type': 'application/json'
             }
             
             # Format request body according to SendGrid v3 API
-            payload = {
-                'personalizations': [
-                    {
-                        'to': [{'email': test_email}]
-                    }
-                ],
-                'from': {
-                    'email': Config.SENDGRID_FROM_EMAIL,
-                    'name': Config.SENDGRID_FROM_NAME
-                },
-                'subject': subject,
-                'content': [
-                    {
-                        'type': 'text/plain',
-                        'value': body
-                    }
-                ]
-            }
+            payload = build_sendgrid_payload([test_email], subject, body)
             
             # Send request
-            response = requests.post(url, headers=headers, json=payload)
+            response = get_http_client().post(url, headers=headers, json=payload)
             
             # Check response status
             if response.status_code == 202:
@@ -599,12 +409,8 @@ Ema Automobile Insurance
                 message_id = response.headers.get('X-Message-Id') or str(uuid.uuid4())
                 
                 # Log successful send
-                print(f"[SENDGRID TEST EMAIL SENT]")
-                print(f"To: {test_email}")
-                print(f"Subject: {subject}")
-                print(f"Status Code: {response.status_code}")
-                print(f"Message ID: {message_id}")
-                print(f"Timestamp: {datetime.now().isoformat()}")
+                logger.info("[SENDGRID TEST EMAIL SENT] to=%s subject=%s status=%s message_id=%s",
+                            test_email, subject, response.status_code, message_id)
                 
                 return jsonify({
                     'success': True,
@@ -616,19 +422,10 @@ Ema Automobile Insurance
                 }), 200
             else:
                 # Handle error responses
-                error_message = f"HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    if 'errors' in error_data and len(error_data['errors']) > 0:
-                        error_message = error_data['errors'][0].get('message', error_message)
-                    elif 'error' in error_data:
-                        error_message = error_data['error']
-                except:
-                    error_message = response.text or error_message
+                error_message = get_sendgrid_error(response)
                 
-                print(f"[SENDGRID TEST ERROR] Failed to send test email: {error_message}")
-                print(f"Response Status: {response.status_code}")
-                print(f"Response Body: {response.text[:500]}")
+                logger.error("[SENDGRID TEST ERROR] Failed to send test email: %s (status %s, body %.500s)",
+                             error_message, response.status_code, response.text)
                 
                 # Provide more helpful error messages
                 if response.status_code == 401:
@@ -640,12 +437,12 @@ Ema Automobile Insurance
                 else:
                     return jsonify({'error': f'SendGrid error: {error_message}'}), 500
         
-        except requests.exceptions.RequestException as send_error:
+        except RequestException as send_error:
             # Handle network/request errors
             error_message = str(send_error)
-            print(f"[SENDGRID TEST ERROR] Request failed: {error_message}")
+            logger.error("[SENDGRID TEST ERROR] Request failed: %s", error_message)
             return jsonify({'error': f'Failed to connect to SendGrid: {error_message}'}), 500
     
     except Exception as e:
-        print(f"[TEST EMAIL ERROR] Unexpected error: {str(e)}")
+        logger.error("[TEST EMAIL ERROR] Unexpected error: %s", e, exc_info=True)
         return jsonify({'error': f'Test email failed: {str(e)}'}), 500
@@ -2,12 +2,18 @@
 Fact extraction routes.
 """
 import sys
+import logging
 from flask import Blueprint, request, jsonify
 from app.services.openai_service import get_openai_service
 from app.services.document_service import extract_facts_from_documents
-from app.config import Config
+from app.services.fact_query_service import get_fact_store, query_facts
+from app.services.prefetch_service import schedule_prefetch
+from app.services.rationale_service import is_valid_claim_id
+from app.utils.fact_utils import build_conflict_links
+from app.utils.fact_model import FactValidationError, facts_from_dicts, facts_to_dicts
 
 bp = Blueprint('facts', __name__)
+logger = logging.getLogger(__name__)
 
 
 @bp.route('/extract-facts', methods=['POST'])
@@ -30,12 +36,11 @@ def extract_facts():
         # Memory limit validation: Count total images and check payload size
         total_images = 0
         total_payload_size = 0
+        seen_hashes = set()  # Repeated images (same perceptual hash) only use one slot
         
         try:
-            # Estimate payload size and count images
-            import json as json_module
-            payload_json = json_module.dumps(request.json)
-            total_payload_size = sys.getsizeof(payload_json)
+            # Estimate payload size (raw request body; no re-encoding) and count images
+            total_payload_size = len(request.get_data(cache=True))
             
             for file_data in files_data:
                 file_type = file_data.get('type', 'unknown')
@@ -44,26 +49,31 @@ def extract_facts():
                     pages = file_data.get('pages', [])
                     for page in pages:
                         images = page.get('images', [])
-                        total_images += len(images)
                         
                         # Estimate size of image data
                         for img in images:
+                            image_hash = img.get('phash')
+                            if not image_hash or image_hash not in seen_hashes:
+                                total_images += 1
+                                if image_hash:
+                                    seen_hashes.add(image_hash)
                             img_data = img.get('data', '')
                             if img_data:
                                 # Base64 data size estimation (rough)
                                 total_payload_size += sys.getsizeof(img_data)
                 
                 elif file_type == 'image':
-                    total_images += 1
+                    image_hash = file_data.get('phash')
+                    if not image_hash or image_hash not in seen_hashes:
+                        total_images += 1
+                        if image_hash:
+                            seen_hashes.add(image_hash)
                     img_data = file_data.get('data', '')
                     if img_data:
                         total_payload_size += sys.getsizeof(img_data)
             
-            # Check limits
-            if total_images > Config.MAX_TOTAL_IMAGES_PER_REQUEST:
-                return jsonify({
-                    'error': f'Too many images ({total_images}). Maximum allowed: {Config.MAX_TOTAL_IMAGES_PER_REQUEST}. Please reduce the number of images or split your request.'
-                }), 400
+            # Image count is not capped here: extraction fits images into
+            # the VISION_TOKEN_BUDGET, downgrading detail before dropping any
             
             # Check payload size (rough estimate: 50MB limit)
             MAX_PAYLOAD_SIZE_MB = 50
@@ -73,39 +83,105 @@ def extract_facts():
                     'error': f'Request payload too large (estimated {total_payload_size / (1024*1024):.1f}MB). Maximum allowed: {MAX_PAYLOAD_SIZE_MB}MB. Please reduce file sizes or number of files.'
                 }), 400
             
-            print(f"Processing request: {total_images} images, ~{total_payload_size / (1024*1024):.1f}MB payload")
+            logger.info("Processing request: %d images, ~%.1fMB payload", total_images, total_payload_size / (1024 * 1024))
         
         except Exception as validation_error:
-            print(f"Warning: Error during memory validation: {validation_error}")
+            logger.warning("Error during memory validation: %s", validation_error)
             # Continue processing but log the warning
         
         # Extract facts from documents
         try:
             result = extract_facts_from_documents(files_data)
+            result['conflict_links'] = build_conflict_links(result['facts'], result['conflicts'])
+            
+            # Index the facts so the fact matrix can page through them with /claims/<claim_id>/facts
+            claim_id = request.json.get('claim_id')
+            if is_valid_claim_id(claim_id):
+                get_fact_store().put(claim_id, result['facts'])
+                result['claim_id'] = claim_id
+            schedule_prefetch(claim_id if is_valid_claim_id(claim_id) else None, result['facts'], files_data)
             return jsonify(result), 200
         
         except MemoryError as mem_error:
             error_msg = 'Insufficient memory to process request. Please reduce the number of files or images and try again.'
-            print(f"Memory error in fact extraction: {mem_error}")
-            import traceback
-            print(f"ERROR: Fact extraction traceback: {traceback.format_exc()}")
+            logger.error("Memory error in fact extraction: %s", mem_error, exc_info=True)
             return jsonify({'error': error_msg}), 500
         except Exception as e:
             # The error message from extract_facts_from_documents already includes context
             error_msg = str(e)
-            print(f"ERROR: Fact extraction error: {error_msg}")  # Log for debugging
-            import traceback
-            print(f"ERROR: Fact extraction traceback: {traceback.format_exc()}")
+            logger.error("Fact extraction error: %s", error_msg, exc_info=True)
             # Return error message as-is (it already includes "Fact extraction failed:" prefix if needed)
             return jsonify({'error': error_msg}), 500
     
     except MemoryError as mem_error:
         error_msg = f'Insufficient memory to process request. Please reduce the number of files or images and try again.'
-        print(f"Memory error in request handling: {mem_error}")
+        logger.error("Memory error in request handling: %s", mem_error)
         return jsonify({'error': error_msg}), 500
     except Exception as e:
         error_msg = str(e)
-        print(f"Request error: {error_msg}")  # Log for debugging
+        logger.error("Request error: %s", error_msg, exc_info=True)
         return jsonify({'error': f'Request failed: {error_msg}'}), 500
 
 
+
+
+@bp.route('/claims/<claim_id>/facts', methods=['GET'])
+def get_claim_facts(claim_id):
+    """
+    Query a claim's extracted facts one page at a time.
+    
+    Query parameters: search (text in the fact, its source text or normalized
+    value), category, source, sort (confidence, confidence-asc, category,
+    source or index), limit, and cursor (next_cursor from the previous page).
+    """
+    try:
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id.'}), 400
+        
+        index = get_fact_store().get(claim_id)
+        if index is None:
+            return jsonify({'error': 'No facts indexed for this claim.'}), 404
+        
+        try:
+            limit = request.args.get('limit', type=int)
+            page = query_facts(
+                index,
+                search=request.args.get('search', ''),
+                category=request.args.get('category', ''),
+                source=request.args.get('source', ''),
+                sort=request.args.get('sort', 'confidence'),
+                cursor=request.args.get('cursor') or None,
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        page['claim_id'] = claim_id
+        return jsonify(page), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to query facts: {str(e)}'}), 500
+
+
+@bp.route('/claims/<claim_id>/facts', methods=['PUT'])
+def replace_claim_facts(claim_id):
+    """Re-index a claim's facts after they were edited (e.g. a conflict was resolved)."""
+    try:
+        if not is_valid_claim_id(claim_id):
+            return jsonify({'error': 'Invalid claim_id.'}), 400
+        
+        facts = (request.json or {}).get('facts')
+        if not isinstance(facts, list):
+            return jsonify({'error': 'Invalid facts format. Expected a list of fact objects.'}), 400
+        try:
+            normalized = facts_to_dicts(facts_from_dicts(facts, strict=True))
+        except FactValidationError as e:
+            return jsonify({'error': f'Invalid fact: {str(e)}'}), 400
+        
+        index = get_fact_store().put(claim_id, normalized)
+        # Prefetches for the old facts are stale; start over with the edited ones, as the UI will send them
+        schedule_prefetch(claim_id, facts)
+        return jsonify({'success': True, 'claim_id': claim_id, 'version': index.version, 'total': len(facts)}), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to index facts: {str(e)}'}), 500
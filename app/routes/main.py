@@ -3,12 +3,11 @@ Main routes (index, upload).
 """
 import os
 from functools import wraps
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file
 from app.config import Config
-from app.services.pdf_service import extract_pdf_content
-from app.services.image_service import extract_image_content
-from app.services.audio_service import transcribe_audio
-from app.utils.file_utils import identify_document_source
+from app.services.document_service import extract_file_content, get_file_kind, UNSUPPORTED_FILE_TYPE_ERROR
+from app.services.rendition_service import get_rendition_path, mark_used
+from app.services.metrics_service import span, STAGE_UPLOAD_SAVE
 
 bp = Blueprint('main', __name__)
 
@@ -91,58 +90,17 @@ def upload_file():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Get file extension
-        filename_lower = file.filename.lower()
-        is_pdf = filename_lower.endswith('.pdf')
-        is_image = any(filename_lower.endswith(ext) for ext in ['.jpg', '.jpeg', '.png'])
-        is_audio = any(filename_lower.endswith(ext) for ext in ['.mp3', '.wav', '.m4a', '.mp4', '.mpeg', '.mpga', '.webm', '.ogg'])
-        
-        if not (is_pdf or is_image or is_audio):
-            return jsonify({'error': 'Invalid file type. Only PDF, PNG, JPEG, JPG, and audio files (MP3, WAV, M4A, etc.) are supported.'}), 400
+        if get_file_kind(file.filename) is None:
+            return jsonify({'error': UNSUPPORTED_FILE_TYPE_ERROR}), 400
         
         # Save uploaded file
         file_path = os.path.join(Config.UPLOAD_FOLDER, file.filename)
-        file.save(file_path)
+        with span(STAGE_UPLOAD_SAVE):
+            file.save(file_path)
         
         try:
-            # Extract content
-            content_text = ''
-            if is_pdf:
-                # Extract PDF content
-                extracted_content = extract_pdf_content(file_path)
-                extracted_content['type'] = 'pdf'
-                extracted_content['filename'] = file.filename
-                
-                # Extract text content for type detection (first 2-3 pages)
-                pages = extracted_content.get('pages', [])
-                for page in pages[:3]:  # First 3 pages
-                    page_text = page.get('text', '').strip()
-                    if page_text:
-                        content_text += page_text + '\n'
-            elif is_audio:
-                # Transcribe audio file
-                transcription = transcribe_audio(file_path)
-                extracted_content = {
-                    'type': 'audio',
-                    'filename': file.filename,
-                    'transcription': transcription,
-                    'pages': [{
-                        'page_number': 1,
-                        'text': transcription
-                    }]
-                }
-                content_text = transcription
-            else:
-                # Extract image content
-                extracted_content = extract_image_content(file_path)
-                # For images, we'll use filename-based detection primarily
-                # Content-based detection for images would require OCR/vision API
-                content_text = ''  # Images don't have text content easily extractable
-            
-            # Detect document source type (for consistency, even though single upload is pre-matched)
-            detected_source, is_relevant = identify_document_source(file.filename, content_text if content_text else None)
-            extracted_content['detected_source'] = detected_source
-            extracted_content['is_relevant'] = is_relevant
+            # Extract content and detect document source type
+            extracted_content = extract_file_content(file_path, file.filename)
             
             # Clean up uploaded file
             os.remove(file_path)
@@ -182,64 +140,21 @@ def upload_multiple_files():
                 continue
             
             try:
-                # Get file extension
-                filename_lower = file.filename.lower()
-                is_pdf = filename_lower.endswith('.pdf')
-                is_image = any(filename_lower.endswith(ext) for ext in ['.jpg', '.jpeg', '.png'])
-                is_audio = any(filename_lower.endswith(ext) for ext in ['.mp3', '.wav', '.m4a', '.mp4', '.mpeg', '.mpga', '.webm', '.ogg'])
-                
-                if not (is_pdf or is_image or is_audio):
+                if get_file_kind(file.filename) is None:
                     results.append({
                         'filename': file.filename,
-                        'error': 'Invalid file type. Only PDF, PNG, JPEG, JPG, and audio files (MP3, WAV, M4A, etc.) are supported.'
+                        'error': UNSUPPORTED_FILE_TYPE_ERROR
                     })
                     continue
                 
                 # Save uploaded file
                 file_path = os.path.join(Config.UPLOAD_FOLDER, file.filename)
-                file.save(file_path)
+                with span(STAGE_UPLOAD_SAVE):
+                    file.save(file_path)
                 
                 try:
-                    # Extract content
-                    content_text = ''
-                    if is_pdf:
-                        # Extract PDF content
-                        extracted_content = extract_pdf_content(file_path)
-                        extracted_content['type'] = 'pdf'
-                        extracted_content['filename'] = file.filename
-                        
-                        # Extract text content for type detection (first 2-3 pages)
-                        pages = extracted_content.get('pages', [])
-                        for page in pages[:3]:  # First 3 pages
-                            page_text = page.get('text', '').strip()
-                            if page_text:
-                                content_text += page_text + '\n'
-                    elif is_audio:
-                        # Transcribe audio file
-                        transcription = transcribe_audio(file_path)
-                        extracted_content = {
-                            'type': 'audio',
-                            'filename': file.filename,
-                            'transcription': transcription,
-                            'pages': [{
-                                'page_number': 1,
-                                'text': transcription
-                            }]
-                        }
-                        content_text = transcription
-                    else:
-                        # Extract image content
-                        extracted_content = extract_image_content(file_path)
-                        # For images, we'll use filename-based detection primarily
-                        # Content-based detection for images would require OCR/vision API
-                        content_text = ''  # Images don't have text content easily extractable
-                    
-                    # Detect document source type
-                    detected_source, is_relevant = identify_document_source(file.filename, content_text if content_text else None)
-                    
-                    # Add detected source to response
-                    extracted_content['detected_source'] = detected_source
-                    extracted_content['is_relevant'] = is_relevant
+                    # Extract content and detect document source type
+                    extracted_content = extract_file_content(file_path, file.filename)
                     
                     results.append(extracted_content)
                     
@@ -265,6 +180,26 @@ def upload_multiple_files():
         return jsonify({'error': f'Bulk upload failed: {str(e)}'}), 500
 
 
+@bp.route('/images/<content_hash>/<tier>.jpg', methods=['GET'])
+def get_image_rendition(content_hash, tier):
+    """Serve a cached image rendition (thumbnail, viewer or model tier)."""
+    rendition_path = get_rendition_path(content_hash, tier)
+    if not rendition_path or not os.path.isfile(rendition_path):
+        return jsonify({'error': 'Image not found'}), 404
+    mark_used(rendition_path)  # Keeps images still on screen out of cache eviction
+    
+    # Renditions are keyed by content and rendition settings, so a URL never changes meaning
+    response = send_file(
+        os.path.abspath(rendition_path),
+        mimetype='image/jpeg',
+        conditional=True,
+        etag=content_hash + '-' + tier,
+        max_age=Config.IMAGE_CACHE_MAX_AGE
+    )
+    response.headers['Cache-Control'] = f'public, max-age={Config.IMAGE_CACHE_MAX_AGE}, immutable'
+    return response
+
+
 @bp.route('/list-sample-files', methods=['GET'])
 def list_sample_files():
     """List all files in the sample files folder."""
@@ -298,57 +233,12 @@ def load_sample_file(filename):
         if not os.path.isfile(file_path):
             return jsonify({'error': f'Not a file: {filename}'}), 400
         
-        # Get file extension
-        filename_lower = filename.lower()
-        is_pdf = filename_lower.endswith('.pdf')
-        is_image = any(filename_lower.endswith(ext) for ext in ['.jpg', '.jpeg', '.png'])
-        is_audio = any(filename_lower.endswith(ext) for ext in ['.mp3', '.wav', '.m4a', '.mp4', '.mpeg', '.mpga', '.webm', '.ogg'])
-        
-        if not (is_pdf or is_image or is_audio):
-            return jsonify({'error': 'Invalid file type. Only PDF, PNG, JPEG, JPG, and audio files (MP3, WAV, M4A, etc.) are supported.'}), 400
-        
-        # Extract content
-        content_text = ''
-        if is_pdf:
-            # Extract PDF content
-            extracted_content = extract_pdf_content(file_path)
-            extracted_content['type'] = 'pdf'
-            extracted_content['filename'] = filename
-            extracted_content['originalFilename'] = filename
-            
-            # Extract text content for type detection (first 2-3 pages)
-            pages = extracted_content.get('pages', [])
-            for page in pages[:3]:  # First 3 pages
-                page_text = page.get('text', '').strip()
-                if page_text:
-                    content_text += page_text + '\n'
-        elif is_audio:
-            # Transcribe audio file
-            transcription = transcribe_audio(file_path)
-            extracted_content = {
-                'type': 'audio',
-                'filename': filename,
-                'originalFilename': filename,
-                'transcription': transcription,
-                'pages': [{
-                    'page_number': 1,
-                    'text': transcription
-                }]
-            }
-            content_text = transcription
-        else:
-            # Extract image content
-            extracted_content = extract_image_content(file_path)
-            extracted_content['filename'] = filename
-            extracted_content['originalFilename'] = filename
-            # For images, we'll use filename-based detection primarily
-            # Content-based detection for images would require OCR/vision API
-            content_text = ''  # Images don't have text content easily extractable
+        if get_file_kind(filename) is None:
+            return jsonify({'error': UNSUPPORTED_FILE_TYPE_ERROR}), 400
         
-        # Detect document source type
-        detected_source, is_relevant = identify_document_source(filename, content_text if content_text else None)
-        extracted_content['detected_source'] = detected_source
-        extracted_content['is_relevant'] = is_relevant
+        # Extract content and detect document source type
+        extracted_content = extract_file_content(file_path, filename)
+        extracted_content['originalFilename'] = filename
         
         return jsonify(extracted_content), 200
     
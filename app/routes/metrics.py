@@ -0,0 +1,66 @@
+"""
+Metrics routes (Prometheus scrape endpoint) and per-request timing hooks.
+"""
+import time
+from flask import Blueprint, Response, request
+from app.config import Config
+from app.utils.json_provider import FastJSONProvider
+from app.services.metrics_service import (
+    get_metrics_registry, begin_request, end_request, span, STAGE_JSON_SERIALIZE
+)
+
+bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that reports serialization time as a stage."""
+    
+    def dumps(self, obj, **kwargs):
+        with span(STAGE_JSON_SERIALIZE):
+            return super().dumps(obj, **kwargs)
+    
+    def encode_parts(self, obj, depth=None):
+        # Nested calls pass a depth; only the outermost one is timed
+        if depth is not None:
+            return super().encode_parts(obj, depth)
+        with span(STAGE_JSON_SERIALIZE):
+            return super().encode_parts(obj)
+
+
+@bp.record_once
+def _install_json_provider(state):
+    """Time jsonify() on the app the blueprint is registered on."""
+    if Config.METRICS_ENABLED:
+        state.app.json = TimedJSONProvider(state.app)
+
+
+@bp.before_app_request
+def start_request_timing():
+    """Start collecting stage spans for this request."""
+    if Config.METRICS_ENABLED:
+        begin_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+
+@bp.after_app_request
+def finish_request_timing(response):
+    """Record the request duration and report its stage spans in a Server-Timing header."""
+    timings = end_request()
+    if timings is None:
+        return response
+    
+    get_metrics_registry().observe_request(
+        timings.route, request.method, response.status_code, time.perf_counter() - timings.start
+    )
+    if Config.SERVER_TIMING_HEADER:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose request and stage latency histograms in Prometheus format."""
+    if not Config.METRICS_ENABLED:
+        return Response('Metrics are disabled.\n', status=404, mimetype='text/plain')
+    return Response(get_metrics_registry().render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,153 @@
+"""
+Conditional requests for analysis endpoints.
+
+Analysis results depend only on the request body and the prompts that
+produced them. Each response carries an ETag hashed from both; a client
+that sends it back in If-None-Match gets 304 Not Modified, and an identical
+request from any client is answered from the stored result instead of
+calling the model again. With PREFETCH_ENABLED, a result computed in the
+background after fact extraction (see prefetch_service) is served the same
+way.
+"""
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+from flask import jsonify, make_response, request
+from app.config import Config
+
+
+def canonical_hash(payload: Any) -> str:
+    """Return the SHA-256 hex digest of a JSON value with sorted keys and no whitespace."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def compute_prompt_version(view: Callable, prompt_getters: tuple) -> str:
+    """
+    Fingerprint the prompts behind an analysis endpoint.
+    
+    Covers the text of the given prompt getters, prompts written inline in
+    the view (its string constants) and ANALYSIS_CACHE_VERSION, so editing
+    any of them invalidates old ETags.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{Config.ANALYSIS_CACHE_VERSION}\0".encode('utf-8'))
+    for getter in prompt_getters:
+        digest.update(getter().encode('utf-8'))
+        digest.update(b'\0')
+    for constant in view.__code__.co_consts:
+        if isinstance(constant, str):
+            digest.update(constant.encode('utf-8'))
+            digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class AnalysisResultCache:
+    """Stored analysis results by ETag, least recently used dropped first."""
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or Config.ANALYSIS_CACHE_MAX_ENTRIES
+        self._results: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, etag: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._results.get(etag)
+            if result is not None:
+                self._results.move_to_end(etag)
+            return result
+    
+    def put(self, etag: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[etag] = result
+            self._results.move_to_end(etag)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+
+def conditional_analysis(*prompt_getters: Callable[[], str]) -> Callable:
+    """
+    Decorate an analysis view with ETag / If-None-Match handling.
+    
+    Args:
+        prompt_getters: Functions returning the prompts the view uses (from app.prompts)
+    
+    Send ``Cache-Control: no-cache`` to force a fresh model call; the new
+    result replaces the stored one. Only successful JSON responses are stored.
+    """
+    def decorator(view: Callable) -> Callable:
+        prompt_version = None
+        
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            nonlocal prompt_version
+            payload = request.get_json(silent=True)
+            if payload is None:
+                return view(*args, **kwargs)
+            if not Config.ANALYSIS_CACHE_ENABLED:
+                result = _prefetched(payload)
+                if result is None:
+                    return view(*args, **kwargs)
+                response = jsonify(result)
+                response.headers['X-Analysis-Cache'] = 'prefetch'
+                return response
+            
+            if prompt_version is None:
+                prompt_version = compute_prompt_version(view, prompt_getters)
+            etag = canonical_hash([request.path, prompt_version, payload])[:32]
+            
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+            
+            fresh = request.cache_control.no_cache
+            result = None if fresh else get_analysis_cache().get(etag)
+            prefetched = None if result is not None else _prefetched(payload)
+            if result is not None:
+                response = jsonify(result)
+                response.headers['X-Analysis-Cache'] = 'hit'
+            elif prefetched is not None:
+                get_analysis_cache().put(etag, prefetched)
+                response = jsonify(prefetched)
+                response.headers['X-Analysis-Cache'] = 'prefetch'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json:
+                    return response
+                get_analysis_cache().put(etag, response.get_json())
+                response.headers['X-Analysis-Cache'] = 'miss'
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        
+        return wrapper
+    
+    return decorator
+
+
+def _prefetched(payload: Any) -> Optional[Dict[str, Any]]:
+    """Result prefetched in the background for this request, if prefetching is on and it is ready."""
+    if not Config.PREFETCH_ENABLED or request.cache_control.no_cache:
+        return None
+    from app.services.prefetch_service import get_prefetch_service
+    return get_prefetch_service().lookup(request.path, payload)
+
+
+# Global cache instance
+_analysis_cache: Optional[AnalysisResultCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisResultCache:
+    """Get global analysis result cache instance."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisResultCache()
+    return _analysis_cache
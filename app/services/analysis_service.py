@@ -0,0 +1,132 @@
+"""
+Claim analysis service: liability signals, timeline, recommendation and rationale.
+
+Each function takes plain fact/signal lists so it can be called from the
+analysis routes and from batch ingestion alike.
+"""
+from typing import Any, Dict, List, Optional
+from app.services import model_router
+from app.services.model_router import TASK_LIABILITY_SIGNALS, TASK_TIMELINE, TASK_RECOMMENDATION, TASK_RATIONALE
+from app.utils.prompt_format import format_fact_matrix, format_fact_list
+from app.prompts import (
+    get_liability_signals_prompt,
+    get_timeline_prompt,
+    get_liability_recommendation_prompt,
+    get_claim_rationale_prompt,
+)
+
+
+def _format_signal_lines(signals: List[Dict[str, Any]]) -> List[str]:
+    """Format liability signals as bullet lines."""
+    return [f"- {signal.get('signal_type', 'N/A')}: {signal.get('impact_on_liability', 'N/A')}" for signal in signals]
+
+
+def analyze_liability_signals(facts: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Identify liability signals in a fact matrix.
+    
+    Returns:
+        List of signals, or None if OpenAI returned no usable response
+    """
+    facts_text = format_fact_matrix(facts)
+    
+    # Call OpenAI API with JSON mode using system prompt for instructions
+    result = model_router.call_json(
+        TASK_LIABILITY_SIGNALS,
+        system_prompt=get_liability_signals_prompt(),
+        user_content=facts_text,
+        max_tokens=4000
+    )
+    
+    if not result:
+        return None
+    return result.get('signals', [])
+
+
+def generate_timeline(facts: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Reconstruct the incident timeline from facts.
+    
+    Returns:
+        Timeline dictionary, or None if OpenAI returned no usable response
+    """
+    facts_text = format_fact_list(facts, numbered=True)
+    
+    return model_router.call_json(
+        TASK_TIMELINE,
+        system_prompt=get_timeline_prompt(),
+        user_content=facts_text,
+        accept=model_router.accept_timeline,
+        max_tokens=4000
+    )
+
+
+def get_liability_recommendation(facts: List[Dict[str, Any]], signals: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Recommend a liability split between the claimant and the other driver.
+    
+    Percentages are clamped to 0-100 and normalized to sum to 100.
+    
+    Returns:
+        Recommendation dictionary, or None if OpenAI returned no usable response
+    """
+    # Format facts and signals for the user content
+    facts_text = format_fact_list(facts)
+    
+    signals_text = "\n\nSignals:\n" + "".join(f"{line}\n" for line in _format_signal_lines(signals))
+    
+    result = model_router.call_json(
+        TASK_RECOMMENDATION,
+        system_prompt=get_liability_recommendation_prompt(),
+        user_content=facts_text + signals_text,
+        max_tokens=4000
+    )
+    
+    if not result:
+        return None
+    
+    # Validate percentages
+    claimant_percent = result.get('claimant_liability_percent', 50)
+    other_driver_percent = result.get('other_driver_liability_percent', 50)
+    
+    claimant_percent = max(0, min(100, int(round(claimant_percent))))
+    other_driver_percent = max(0, min(100, int(round(other_driver_percent))))
+    
+    # Normalize to sum to 100
+    total = claimant_percent + other_driver_percent
+    if total > 0:
+        claimant_percent = int(round(claimant_percent * 100 / total))
+        other_driver_percent = 100 - claimant_percent
+    
+    result['claimant_liability_percent'] = claimant_percent
+    result['other_driver_liability_percent'] = other_driver_percent
+    return result
+
+
+def generate_claim_rationale(
+    facts: List[Dict[str, Any]],
+    signals: List[Dict[str, Any]],
+    recommendation: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Draft the claim file rationale.
+    
+    Returns:
+        Rationale dictionary, or None if OpenAI returned no usable response
+    """
+    content_parts = [
+        format_fact_list(facts).strip(),
+        "",
+        "Signals:",
+        *_format_signal_lines(signals),
+        "",
+        "Recommendation:",
+        str(recommendation or {})
+    ]
+    
+    return model_router.call_json(
+        TASK_RATIONALE,
+        system_prompt=get_claim_rationale_prompt(),
+        user_content="\n".join(content_parts),
+        max_tokens=4000
+    )
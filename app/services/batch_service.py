@@ -0,0 +1,516 @@
+"""
+Batch claim ingestion: run folders of claim documents through the full pipeline headlessly.
+
+Each subdirectory of the batch root is one claim. Claims flow through three
+stages, each with its own bounded worker pool:
+    
+    extract   per file: text/image extraction and document source classification
+    facts     per claim: fact extraction and conflict detection
+    analysis  per claim: liability signals, recommendation, timeline and rationale
+
+Finished claims are appended to a JSONL file, which doubles as the checkpoint:
+a rerun skips claims already written with status 'ok' (unless their folder
+changed) and reuses saved fact-stage results, so an interrupted batch resumes
+without repeating completed model calls.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.config import Config
+
+# Pipeline stages, in order
+STAGE_EXTRACT = 'extract'
+STAGE_FACTS = 'facts'
+STAGE_ANALYSIS = 'analysis'
+
+# Result statuses
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+
+# Job states
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_STOPPED = 'stopped'
+JOB_FAILED = 'failed'
+
+_UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def _claim_id_for(name: str) -> str:
+    """Derive a store-safe claim ID from a folder name."""
+    return _UNSAFE_ID_CHARS.sub('_', name).strip('._')[:128] or 'claim'
+
+
+def discover_claims(root: str, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    List the claim folders under a batch root.
+    
+    Every immediate subdirectory is a claim; its supported files are collected
+    recursively. The fingerprint changes whenever a file is added, removed or
+    modified, which invalidates that claim's checkpoint.
+    
+    Args:
+        root: Batch root directory
+        exclude: Paths that are not claims (the batch's own output and checkpoint)
+        
+    Returns:
+        Claims as dictionaries with 'claim_id', 'path', 'files' and 'fingerprint', sorted by name
+    """
+    from app.services.document_service import get_file_kind
+    
+    excluded = {os.path.realpath(path) for path in exclude}
+    claims = []
+    used_ids = set()
+    for entry in sorted(os.scandir(root), key=lambda item: item.name):
+        if not entry.is_dir() or entry.name.startswith('.') or os.path.realpath(entry.path) in excluded:
+            continue
+        
+        files = []
+        for dirpath, dirnames, filenames in os.walk(entry.path):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+            for filename in sorted(filenames):
+                if get_file_kind(filename) is not None:
+                    files.append(os.path.join(dirpath, filename))
+        
+        digest = hashlib.sha256()
+        for file_path in files:
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, entry.path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+        
+        claim_id = _claim_id_for(entry.name)
+        suffix = 2
+        while claim_id in used_ids:
+            claim_id = f"{_claim_id_for(entry.name)}_{suffix}"
+            suffix += 1
+        used_ids.add(claim_id)
+        
+        claims.append({
+            'claim_id': claim_id,
+            'path': entry.path,
+            'files': files,
+            'fingerprint': digest.hexdigest(),
+        })
+    return claims
+
+
+class BatchCheckpoint:
+    """Resumable batch progress: results in the JSONL output, fact-stage results beside it."""
+    
+    def __init__(self, output_path: str):
+        """Prepare the output file and its checkpoint directory."""
+        self.output_path = output_path
+        self.stage_dir = f"{output_path}.checkpoint"
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        os.makedirs(self.stage_dir, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def completed(self) -> Dict[str, str]:
+        """
+        Read claims already finished successfully.
+        
+        A partial last line (from a crash mid-write) is ignored.
+        
+        Returns:
+            Mapping of claim_id to the folder fingerprint it was processed with
+        """
+        done = {}
+        if not os.path.exists(self.output_path):
+            return done
+        with open(self.output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('status') == STATUS_OK:
+                    done[record['claim_id']] = record.get('fingerprint')
+                else:
+                    done.pop(record.get('claim_id'), None)
+        return done
+    
+    def _stage_path(self, claim_id: str, stage: str) -> str:
+        return os.path.join(self.stage_dir, f"{claim_id}.{stage}.json")
+    
+    def load_stage(self, claim: Dict[str, Any], stage: str) -> Optional[Dict[str, Any]]:
+        """Load a saved stage result, or None if missing or saved for a different folder state."""
+        try:
+            with open(self._stage_path(claim['claim_id'], stage), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get('fingerprint') != claim['fingerprint']:
+            return None
+        return saved.get('result')
+    
+    def save_stage(self, claim: Dict[str, Any], stage: str, result: Dict[str, Any]) -> None:
+        """Atomically save a stage result for the claim's current folder state."""
+        path = self._stage_path(claim['claim_id'], stage)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': claim['fingerprint'], 'result': result}, f)
+        os.replace(tmp_path, path)
+    
+    def write_result(self, record: Dict[str, Any]) -> None:
+        """Append one claim result and sync it to disk before moving on."""
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            with open(self.output_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _extract_file(file_path: str) -> Dict[str, Any]:
+    """Extract and classify one claim file (runs in the extract pool)."""
+    from app.services.document_service import extract_file_content
+    return extract_file_content(file_path, os.path.basename(file_path))
+
+
+def _extract_claim_facts(files_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Extract facts and conflicts for one claim (runs in the facts pool)."""
+    from app.services.document_service import extract_facts_from_documents
+    return extract_facts_from_documents(files_data)
+
+
+def _analyze_claim(facts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run the analysis steps for one claim (runs in the analysis pool).
+    
+    Raises:
+        Exception: Naming the first step that got no usable response
+    """
+    from app.services import analysis_service
+    
+    timings = {}
+    
+    def timed(step, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[step] = round(time.perf_counter() - start, 3)
+        if result is None:
+            raise Exception(f'{step}: Failed to get response from OpenAI')
+        return result
+    
+    # The timeline only needs facts, so it runs alongside the signals -> recommendation -> rationale chain
+    # (in the same context, so it uses the same OpenAI backend)
+    with ThreadPoolExecutor(1, thread_name_prefix='batch-timeline') as timeline_pool:
+        timeline_future = timeline_pool.submit(contextvars.copy_context().run, timed, 'timeline', analysis_service.generate_timeline, facts)
+        signals = timed('signals', analysis_service.analyze_liability_signals, facts)
+        recommendation = timed('recommendation', analysis_service.get_liability_recommendation, facts, signals)
+        rationale = timed('rationale', analysis_service.generate_claim_rationale, facts, signals, recommendation)
+        timeline = timeline_future.result()
+    
+    return {
+        'signals': signals,
+        'recommendation': recommendation,
+        'timeline': timeline,
+        'rationale': rationale,
+        'step_seconds': timings,
+    }
+
+
+def _timed_call(openai_service, func: Callable, *args) -> Any:
+    """Run func with the job's OpenAI backend (None for the interactive one) and return (result, seconds)."""
+    from app.services.openai_service import use_openai_service
+    
+    start = time.perf_counter()
+    if openai_service is None:
+        result = func(*args)
+    else:
+        with use_openai_service(openai_service):
+            result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _file_summary(file_path: str, root: str, content: Optional[Dict[str, Any]], error: Optional[str]) -> Dict[str, Any]:
+    """Describe an extracted file for the results file (without page text or image data)."""
+    summary = {'file': os.path.relpath(file_path, root)}
+    if error:
+        summary['error'] = error
+        return summary
+    summary.update({
+        'type': content.get('type'),
+        'detected_source': content.get('detected_source'),
+        'is_relevant': content.get('is_relevant'),
+        'pages': len(content.get('pages', [])) or None,
+    })
+    return summary
+
+
+class BatchIngestJob:
+    """One batch run over a directory of claim folders."""
+    
+    def __init__(
+        self,
+        root: str,
+        output_path: str,
+        extract_workers: Optional[int] = None,
+        fact_workers: Optional[int] = None,
+        analysis_workers: Optional[int] = None,
+        store_rationales: bool = True,
+        openai_batch: bool = False,
+        on_claim_done: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """
+        Configure a batch run; worker counts default to Config values.
+        
+        Args:
+            root: Directory whose subdirectories are claim folders
+            output_path: JSONL results file (also the resume checkpoint)
+            store_rationales: Also append generated rationales to the rationale store
+            openai_batch: Send model calls through the OpenAI Batch API (cheaper, hours of latency)
+            on_claim_done: Called with each result record as it is written
+        """
+        self.job_id = uuid.uuid4().hex
+        self.root = root
+        self.output_path = output_path
+        self.openai_service = None
+        self.max_claims_in_flight = Config.BATCH_MAX_CLAIMS_IN_FLIGHT
+        model_workers = None
+        if openai_batch:
+            from app.services.openai_batch_service import BatchOpenAIService
+            self.openai_service = BatchOpenAIService()
+            # Calls wait on batch jobs rather than doing work, so many claims must be in flight to fill a batch
+            model_workers = self.max_claims_in_flight = Config.OPENAI_BATCH_CONCURRENCY
+        self.extract_workers = extract_workers or Config.BATCH_EXTRACT_WORKERS
+        self.fact_workers = fact_workers or model_workers or Config.BATCH_FACT_WORKERS
+        self.analysis_workers = analysis_workers or model_workers or Config.BATCH_ANALYSIS_WORKERS
+        self.store_rationales = store_rationales
+        self.on_claim_done = on_claim_done
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            'job_id': self.job_id,
+            'root': root,
+            'output_path': output_path,
+            'status': JOB_RUNNING,
+            'openai_backend': 'batch' if openai_batch else 'interactive',
+            'claims_total': 0,
+            'claims_skipped': 0,
+            'claims_ok': 0,
+            'claims_failed': 0,
+            'files_extracted': 0,
+            'started_at': None,
+            'finished_at': None,
+            'elapsed_seconds': 0.0,
+            'claims_per_hour': 0.0,
+            'error': None,
+        }
+        self._start_time: Optional[float] = None
+    
+    def stop(self) -> None:
+        """Stop admitting claims; claims already in flight are finished and written."""
+        self._stop.set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return a snapshot of progress and throughput."""
+        with self._lock:
+            stats = dict(self.stats)
+        if self.openai_service is not None and self.openai_service.collector is not None:
+            stats['openai_batches'] = dict(self.openai_service.collector.stats)
+        if stats['status'] == JOB_RUNNING and self._start_time is not None:
+            stats.update(self._throughput(time.perf_counter() - self._start_time, stats))
+        return stats
+    
+    @staticmethod
+    def _throughput(elapsed: float, stats: Dict[str, Any]) -> Dict[str, float]:
+        processed = stats['claims_ok'] + stats['claims_failed']
+        return {
+            'elapsed_seconds': round(elapsed, 1),
+            'claims_per_hour': round(processed * 3600 / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+    
+    def _finish_claim(self, checkpoint: BatchCheckpoint, state: Dict[str, Any], stage: Optional[str] = None,
+                      error: Optional[str] = None, analysis: Optional[Dict[str, Any]] = None) -> None:
+        """Write a claim's result record and update counters."""
+        claim = state['claim']
+        record = {
+            'claim_id': claim['claim_id'],
+            'folder': os.path.relpath(claim['path'], self.root),
+            'fingerprint': claim['fingerprint'],
+            'status': STATUS_FAILED if error else STATUS_OK,
+            'failed_stage': stage,
+            'error': error,
+            'files': state['file_summaries'],
+            'facts': state['facts'].get('facts') if state['facts'] else None,
+            'conflicts': state['facts'].get('conflicts') if state['facts'] else None,
+            'stage_seconds': {name: round(seconds, 3) for name, seconds in state['stage_seconds'].items()},
+            'completed_at': datetime.now().isoformat(),
+        }
+        if analysis:
+            record['stage_seconds'].update({f"{STAGE_ANALYSIS}.{step}": seconds for step, seconds in analysis.pop('step_seconds').items()})
+            record.update(analysis)
+            if self.store_rationales:
+                try:
+                    from app.services.rationale_service import get_rationale_store, SOURCE_GENERATED
+                    stored = get_rationale_store().append(claim['claim_id'], analysis['rationale'], source=SOURCE_GENERATED)
+                    record['rationale_version'] = stored['version']
+                except Exception as store_error:
+                    print(f"Warning: Could not store rationale for claim {claim['claim_id']}: {str(store_error)}")
+        
+        checkpoint.write_result(record)
+        with self._lock:
+            self.stats['claims_failed' if error else 'claims_ok'] += 1
+        if self.on_claim_done:
+            self.on_claim_done(record)
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Process every pending claim and return the final stats.
+        
+        At most BATCH_MAX_CLAIMS_IN_FLIGHT claims are held in memory at once
+        (extracted page images are large); the rest wait their turn.
+        """
+        self._start_time = time.perf_counter()
+        with self._lock:
+            self.stats['started_at'] = datetime.now().isoformat()
+        
+        try:
+            checkpoint = BatchCheckpoint(self.output_path)
+            claims = discover_claims(self.root, exclude=(self.output_path, checkpoint.stage_dir))
+            completed = checkpoint.completed()
+            queue = deque(claim for claim in claims if completed.get(claim['claim_id']) != claim['fingerprint'])
+            with self._lock:
+                self.stats['claims_total'] = len(claims)
+                self.stats['claims_skipped'] = len(claims) - len(queue)
+            
+            with ThreadPoolExecutor(self.extract_workers, thread_name_prefix='batch-extract') as extract_pool, \
+                    ThreadPoolExecutor(self.fact_workers, thread_name_prefix='batch-facts') as fact_pool, \
+                    ThreadPoolExecutor(self.analysis_workers, thread_name_prefix='batch-analysis') as analysis_pool:
+                self._pump(checkpoint, queue, extract_pool, fact_pool, analysis_pool)
+            
+            status = JOB_STOPPED if self._stop.is_set() else JOB_COMPLETED
+        except Exception as e:
+            status = JOB_FAILED
+            with self._lock:
+                self.stats['error'] = str(e)
+            print(f"Batch ingestion failed: {str(e)}")
+        
+        elapsed = time.perf_counter() - self._start_time
+        with self._lock:
+            self.stats['status'] = status
+            self.stats['finished_at'] = datetime.now().isoformat()
+            self.stats.update(self._throughput(elapsed, self.stats))
+        return self.get_stats()
+    
+    def _pump(self, checkpoint, queue, extract_pool, fact_pool, analysis_pool) -> None:
+        """Drive claims through the stage pools until the queue and all stages are drained."""
+        pending: Dict[Any, tuple] = {}  # future -> (stage, claim state, file index)
+        
+        def submit_analysis(state):
+            pending[analysis_pool.submit(_timed_call, self.openai_service, _analyze_claim, state['facts']['facts'])] = (STAGE_ANALYSIS, state, None)
+        
+        def submit_facts(state):
+            files_data = [content for content in state['contents'] if content is not None]
+            state['contents'] = None  # Release page images once they are handed to the fact stage
+            if not files_data:
+                self._finish_claim(checkpoint, state, STAGE_EXTRACT, 'No files could be extracted')
+                return
+            pending[fact_pool.submit(_timed_call, self.openai_service, _extract_claim_facts, files_data)] = (STAGE_FACTS, state, None)
+        
+        def admit(claim):
+            state = {
+                'claim': claim,
+                'contents': [None] * len(claim['files']),
+                'file_summaries': [None] * len(claim['files']),
+                'files_left': len(claim['files']),
+                'facts': None,
+                'stage_seconds': {},
+            }
+            saved_facts = checkpoint.load_stage(claim, STAGE_FACTS)
+            if saved_facts is not None:
+                state['facts'] = saved_facts['facts']
+                state['file_summaries'] = saved_facts['file_summaries']
+                submit_analysis(state)
+            elif not claim['files']:
+                self._finish_claim(checkpoint, state, STAGE_EXTRACT, 'No supported files in claim folder')
+            else:
+                for index, file_path in enumerate(claim['files']):
+                    pending[extract_pool.submit(_timed_call, self.openai_service, _extract_file, file_path)] = (STAGE_EXTRACT, state, index)
+        
+        def claims_in_flight():
+            return len({id(state) for _, state, _ in pending.values()})
+        
+        while pending or (queue and not self._stop.is_set()):
+            while queue and not self._stop.is_set() and claims_in_flight() < self.max_claims_in_flight:
+                admit(queue.popleft())
+            if not pending:
+                continue
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, state, index = pending.pop(future)
+                claim = state['claim']
+                try:
+                    result, seconds = future.result()
+                    error = None
+                except Exception as e:
+                    result, seconds, error = None, 0.0, str(e)
+                state['stage_seconds'][stage] = state['stage_seconds'].get(stage, 0.0) + seconds
+                
+                if stage == STAGE_EXTRACT:
+                    state['file_summaries'][index] = _file_summary(claim['files'][index], claim['path'], result, error)
+                    if result is not None:
+                        state['contents'][index] = result
+                        with self._lock:
+                            self.stats['files_extracted'] += 1
+                    state['files_left'] -= 1
+                    if state['files_left'] == 0:
+                        submit_facts(state)
+                
+                elif stage == STAGE_FACTS:
+                    if error:
+                        self._finish_claim(checkpoint, state, STAGE_FACTS, error)
+                    elif not result.get('facts'):
+                        state['facts'] = result
+                        self._finish_claim(checkpoint, state, STAGE_FACTS, 'No facts extracted')
+                    else:
+                        state['facts'] = result
+                        checkpoint.save_stage(claim, STAGE_FACTS, {
+                            'facts': result,
+                            'file_summaries': state['file_summaries'],
+                        })
+                        submit_analysis(state)
+                
+                else:
+                    if error:
+                        self._finish_claim(checkpoint, state, STAGE_ANALYSIS, error)
+                    else:
+                        self._finish_claim(checkpoint, state, analysis=result)
+
+
+# Batch jobs started through the API, by job ID
+_jobs: Dict[str, BatchIngestJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def start_batch_job(root: str, output_path: str, **options) -> BatchIngestJob:
+    """
+    Start a batch job in a background thread.
+    
+    Raises:
+        ValueError: If a job writing to the same output is still running
+    """
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.output_path == output_path and job.get_stats()['status'] == JOB_RUNNING:
+                raise ValueError(f'A batch job for this directory is already running ({job.job_id}).')
+        job = BatchIngestJob(root, output_path, **options)
+        _jobs[job.job_id] = job
+    threading.Thread(target=job.run, name=f'batch-ingest-{job.job_id[:8]}', daemon=True).start()
+    return job
+
+
+def get_batch_job(job_id: str) -> Optional[BatchIngestJob]:
+    """Get a batch job started through the API."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
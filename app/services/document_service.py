@@ -1,18 +1,132 @@
 """
 Document processing service for fact extraction.
 """
-import sys
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import Config
 from app.services.openai_service import get_openai_service
+from app.services import model_router
+from app.services.model_router import TASK_FACT_EXTRACTION
+from app.services.image_service import ImageDeduplicator
+from app.services.vision_service import VisionDetailPlanner, get_image_role
+from app.services.metrics_service import span, STAGE_PDF_PARSE, STAGE_CONFLICT_DETECTION
 from app.prompts import get_fact_extraction_prompt
 from app.utils.file_utils import identify_document_source
 from app.utils.fact_utils import normalize_facts, detect_conflicts
+from app.utils.fact_model import FactSource, facts_from_dicts, facts_to_dicts
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Supported upload types by extension
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.mp4', '.mpeg', '.mpga', '.webm', '.ogg')
+
+UNSUPPORTED_FILE_TYPE_ERROR = 'Invalid file type. Only PDF, PNG, JPEG, JPG, and audio files (MP3, WAV, M4A, etc.) are supported.'
+
+
+def get_file_kind(filename: str) -> Optional[str]:
+    """Return 'pdf', 'image' or 'audio' for a supported filename, else None."""
+    filename_lower = filename.lower()
+    if filename_lower.endswith(PDF_EXTENSIONS):
+        return 'pdf'
+    if filename_lower.endswith(IMAGE_EXTENSIONS):
+        return 'image'
+    if filename_lower.endswith(AUDIO_EXTENSIONS):
+        return 'audio'
+    return None
+
+
+def extract_file_content(file_path: str, filename: str) -> Dict[str, Any]:
+    """
+    Extract one uploaded file and classify its document source.
+    
+    Args:
+        file_path: Path to the file on disk
+        filename: Name the source type is detected from
+        
+    Returns:
+        Extracted content with 'type', 'filename', 'detected_source' and 'is_relevant'
+        
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    from app.services.pdf_service import extract_pdf_content
+    from app.services.image_service import extract_image_content
+    from app.services.audio_service import transcribe_audio
+    
+    file_kind = get_file_kind(filename)
+    if file_kind is None:
+        raise ValueError(UNSUPPORTED_FILE_TYPE_ERROR)
+    
+    # Extract content
+    content_text = ''
+    if file_kind == 'pdf':
+        # Extract PDF content
+        with span(STAGE_PDF_PARSE):
+            extracted_content = extract_pdf_content(file_path)
+        extracted_content['type'] = 'pdf'
+        extracted_content['filename'] = filename
+        
+        # Extract text content for type detection (first 2-3 pages)
+        pages = extracted_content.get('pages', [])
+        for page in pages[:3]:  # First 3 pages
+            page_text = page.get('text', '').strip()
+            if page_text:
+                content_text += page_text + '\n'
+    elif file_kind == 'audio':
+        # Transcribe audio file
+        transcription = transcribe_audio(file_path)
+        extracted_content = {
+            'type': 'audio',
+            'filename': filename,
+            'transcription': transcription,
+            'pages': [{
+                'page_number': 1,
+                'text': transcription
+            }]
+        }
+        content_text = transcription
+    else:
+        # Extract image content
+        extracted_content = extract_image_content(file_path)
+        extracted_content['filename'] = filename
+        # For images, we'll use filename-based detection primarily
+        # Content-based detection for images would require OCR/vision API
+        content_text = ''  # Images don't have text content easily extractable
+    
+    # Detect document source type
+    detected_source, is_relevant = identify_document_source(filename, content_text if content_text else None)
+    extracted_content['detected_source'] = detected_source
+    extracted_content['is_relevant'] = is_relevant
+    
+    return extracted_content
+
+
+def _split_image_data(img_data: str, default_ext: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Split an image data URL (or bare base64 string) into its payload and subtype.
+    
+    Args:
+        img_data: Data URL or raw base64 string
+        default_ext: Subtype to use when the data URL does not declare one
+        
+    Returns:
+        Tuple of (base64_data, mime_subtype) or (None, None) if malformed
+    """
+    if not img_data:
+        return None, None
+    if not img_data.startswith('data:'):
+        return img_data, default_ext
+    parts = img_data.split(',')
+    if len(parts) != 2:
+        return None, None
+    mime_part = parts[0]
+    if 'image/' in mime_part:
+        return parts[1], mime_part.split('image/')[1].split(';')[0]
+    return parts[1], default_ext
+
 
 def extract_facts_from_documents(files_data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
@@ -30,9 +144,11 @@ def extract_facts_from_documents(files_data: List[Dict[str, Any]]) -> Dict[str,
     
     # Prepare content for OpenAI
     content_parts = []
-    images_added_count = 0  # Track number of images being sent to OpenAI
+    planner = VisionDetailPlanner()  # Assigns detail levels within the vision-token budget
+    deduplicator = ImageDeduplicator()  # Collapses the same image across pages and documents
     
-    text_content = get_fact_extraction_prompt()
+    # Instructions go in the system message; only the documents vary per call
+    text_content = ""
     
     for file_data in files_data:
         filename = file_data.get('filename', file_data.get('originalFilename', 'Unknown'))
@@ -61,156 +177,128 @@ def extract_facts_from_documents(files_data: List[Dict[str, Any]]) -> Dict[str,
                     page_text = page.get('text', '').strip()
                     if page_text:
                         text_content += f"\nAudio Transcription:\n{page_text}\n"
-            
-            # Add images from PDF (with limits)
-            for page in pages:
-                images = page.get('images', [])
-                for img in images:
-                    # Limit total images sent to OpenAI API
-                    if images_added_count >= Config.MAX_TOTAL_IMAGES_PER_REQUEST:
-                        print(f"Warning: Reached image limit ({Config.MAX_TOTAL_IMAGES_PER_REQUEST}), skipping remaining images")
-                        break
-                    
-                    img_data = img.get('data', '')
-                    if img_data:
-                        if img_data.startswith('data:'):
-                            parts = img_data.split(',')
-                            if len(parts) == 2:
-                                base64_data = parts[1]
-                                mime_part = parts[0]
-                                if 'image/' in mime_part:
-                                    mime_type = mime_part.split('image/')[1].split(';')[0]
-                                else:
-                                    mime_type = img.get('ext', 'png')
-                            else:
-                                continue
-                        else:
-                            base64_data = img_data
-                            mime_type = img.get('ext', 'png')
-                        
-                        # Check individual image size before adding
-                        if len(base64_data) > Config.MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
-                            print(f"Warning: Skipping large image ({len(base64_data)} bytes) from {filename}")
-                            continue
-                        
-                        content_parts.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{mime_type};base64,{base64_data}"
-                            }
-                        })
-                        images_added_count += 1
-                
-                if images_added_count >= Config.MAX_TOTAL_IMAGES_PER_REQUEST:
-                    break
         
-        elif file_type == 'image':
-            # Limit total images sent to OpenAI API
-            if images_added_count >= Config.MAX_TOTAL_IMAGES_PER_REQUEST:
-                print(f"Warning: Reached image limit ({Config.MAX_TOTAL_IMAGES_PER_REQUEST}), skipping image {filename}")
-                text_content += f"\nThis is an image file: {filename} (skipped due to image limit)\n"
-            else:
-                img_data = file_data.get('data', '')
-                if img_data:
-                    if img_data.startswith('data:'):
-                        parts = img_data.split(',')
-                        if len(parts) == 2:
-                            base64_data = parts[1]
-                            mime_part = parts[0]
-                            if 'image/' in mime_part:
-                                mime_type = mime_part.split('image/')[1].split(';')[0]
-                            else:
-                                mime_type = file_data.get('format', 'png').lower()
-                        else:
-                            continue
-                    else:
-                        base64_data = img_data
-                        mime_type = file_data.get('format', 'png').lower()
+        if file_type in ('pdf', 'audio'):
+            # Queue images from PDF pages; detail and budget are planned once all are known
+            for page in file_data.get('pages', []):
+                role = get_image_role(file_type, page.get('text', ''))
+                for img in page.get('images', []):
+                    base64_data, mime_type = _split_image_data(img.get('data', ''), img.get('ext', 'png'))
+                    if not base64_data:
+                        continue
                     
                     # Check individual image size before adding
                     if len(base64_data) > Config.MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
-                        print(f"Warning: Skipping large image ({len(base64_data)} bytes): {filename}")
-                        text_content += f"\nThis is an image file: {filename} (skipped due to size limit)\n"
-                    else:
-                        content_parts.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{mime_type};base64,{base64_data}"
-                            }
-                        })
-                        images_added_count += 1
-                        text_content += f"\nThis is an image file: {filename}\n"
+                        logger.warning("Skipping large image (%d bytes) from %s", len(base64_data), filename)
+                        continue
+                    
+                    # Skip copies of images already sent from this or another document
+                    if deduplicator.should_skip_encoded(base64_data, img.get('phash')):
+                        continue
+                    
+                    planner.add(
+                        f"data:image/{mime_type};base64,{base64_data}",
+                        base64_data,
+                        role,
+                        width=img.get('width'),
+                        height=img.get('height')
+                    )
+        
+        elif file_type == 'image':
+            base64_data, mime_type = _split_image_data(file_data.get('data', ''), file_data.get('format', 'png').lower())
+            if base64_data:
+                # Check individual image size before adding
+                if len(base64_data) > Config.MAX_IMAGE_SIZE_BYTES * 2:  # Allow 2x for base64 overhead
+                    logger.warning("Skipping large image (%d bytes): %s", len(base64_data), filename)
+                    text_content += f"\nThis is an image file: {filename} (skipped due to size limit)\n"
+                elif deduplicator.should_skip_encoded(base64_data, file_data.get('phash')):
+                    text_content += f"\nThis is an image file: {filename} (duplicate of an image already included)\n"
+                else:
+                    dimensions = file_data.get('optimized_dimensions') or {}
+                    planner.add(
+                        f"data:image/{mime_type};base64,{base64_data}",
+                        base64_data,
+                        get_image_role(file_type),
+                        width=dimensions.get('width'),
+                        height=dimensions.get('height'),
+                        label=filename
+                    )
+                    text_content += f"\nThis is an image file: {filename}\n"
+    
+    if deduplicator.duplicates_skipped or deduplicator.low_information_skipped:
+        logger.info("Image dedupe: skipped %d duplicate and %d low-information images",
+                    deduplicator.duplicates_skipped, deduplicator.low_information_skipped)
+    
+    # Choose low/high detail per image within the vision-token budget
+    planned_images, skipped_images = planner.plan()
+    for image in planned_images:
+        content_parts.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image['url'],
+                "detail": image['detail']
+            }
+        })
+    for image in skipped_images:
+        if image['label']:
+            text_content += f"\nImage file {image['label']} was not included (image budget reached)\n"
+    logger.info("Vision plan: %d images, ~%d of %d tokens (%d downgraded to low detail, %d skipped)",
+                len(planned_images), planner.tokens_planned, planner.token_budget, planner.downgraded, planner.skipped)
     
-    # Add text content
-    content_parts.insert(0, {
-        "type": "text",
-        "text": text_content
-    })
+    # Add text content (documents may be images only)
+    if text_content:
+        content_parts.insert(0, {
+            "type": "text",
+            "text": text_content
+        })
     
     # Call OpenAI API with JSON mode
     try:
-        # Estimate content size before API call
-        try:
-            content_size = sys.getsizeof(str(content_parts))
-            if content_size > 20 * 1024 * 1024:  # 20MB warning
-                warning_msg = f"Large content payload ({content_size / (1024*1024):.1f}MB) being sent to OpenAI API"
-                logger.warning(warning_msg)
-                print(f"Warning: {warning_msg}")
-        except Exception as size_error:
-            logger.debug(f"Could not estimate content size: {str(size_error)}")
-            pass  # Ignore size estimation errors
+        # Estimate content size before API call (sum of part lengths; no copy of the payload)
+        content_size = sum(
+            len(part.get('text') or part.get('image_url', {}).get('url', '')) for part in content_parts
+        )
+        if content_size > 20 * 1024 * 1024:  # 20MB warning
+            logger.warning("Large content payload (%.1fMB) being sent to OpenAI API", content_size / (1024 * 1024))
         
-        logger.info(f"Calling OpenAI API with {len(content_parts)} content parts")
-        print(f"DEBUG: extract_facts_from_documents: Calling OpenAI API with {len(content_parts)} content parts")
+        logger.debug("Calling OpenAI API with %d content parts", len(content_parts))
         
         try:
             # Use longer timeout for fact extraction (180 seconds) due to potentially large payloads
-            result = openai_service.call_with_json_response(
-                system_prompt=None,
+            result = model_router.call_json(
+                TASK_FACT_EXTRACTION,
+                system_prompt=get_fact_extraction_prompt(),
                 user_content=content_parts,
                 max_tokens=4000,
                 timeout=180.0
             )
-            logger.debug(f"OpenAI API call completed, result type: {type(result).__name__}")
+            logger.debug("OpenAI API call completed, result type: %s", type(result).__name__)
         except ValueError as ve:
             # ValueError from OpenAI service indicates API errors (timeout, rate limit, etc.)
             error_msg = str(ve)
-            logger.error(f"OpenAI API error: {error_msg}", exc_info=True)
-            print(f"ERROR: OpenAI API error: {error_msg}")
-            import traceback
-            print(f"ERROR: Traceback: {traceback.format_exc()}")
+            logger.error("OpenAI API error: %s", error_msg, exc_info=True)
             raise Exception(error_msg)
         except TypeError as te:
             # TypeError indicates unexpected response type
             error_msg = f"OpenAI API returned unexpected type: {str(te)}"
             logger.error(error_msg, exc_info=True)
-            print(f"ERROR: {error_msg}")
-            import traceback
-            print(f"ERROR: Traceback: {traceback.format_exc()}")
             raise Exception(error_msg)
         except Exception as api_error:
             # Catch any other unexpected errors
             error_msg = f"OpenAI API call failed: {str(api_error)}"
             logger.error(error_msg, exc_info=True)
-            print(f"ERROR: {error_msg}")
-            import traceback
-            print(f"ERROR: Traceback: {traceback.format_exc()}")
             raise Exception(error_msg)
         
         # Clean up content_parts to free memory
         del content_parts
         
-        logger.debug(f"OpenAI API returned result type: {type(result).__name__}")
-        print(f"DEBUG: extract_facts_from_documents: OpenAI API returned result type: {type(result).__name__}")
-        
         # Validate result structure
         if not isinstance(result, dict):
             error_msg = f"Expected dict response from OpenAI API, but got {type(result).__name__}"
             logger.error(error_msg)
-            print(f"ERROR: {error_msg}")
             raise Exception(error_msg)
         
-        facts = result.get('facts', [])
+        facts = facts_from_dicts(result.get('facts', []))
         
         # Create a mapping of document identifiers to sources
         doc_source_map = {}
@@ -240,15 +328,15 @@ def extract_facts_from_documents(files_data: List[Dict[str, Any]]) -> Dict[str,
         
         # Ensure all facts have source properly set
         for fact in facts:
-            if not fact.get('source') or fact.get('source') == 'unknown':
-                fact_source_text = fact.get('source_text', '').lower()
+            if not fact.source or fact.source == FactSource.UNKNOWN:
+                fact_source_text = fact.source_text.lower()
                 
                 # Try to match by document name keywords
                 matched = False
                 for doc_name, source in doc_source_map.items():
                     doc_keywords = doc_name.replace('_', ' ').replace('-', ' ').split()
                     if any(keyword in fact_source_text for keyword in doc_keywords if len(keyword) > 3):
-                        fact['source'] = source
+                        fact.set_source(source)
                         matched = True
                         break
                 
@@ -259,32 +347,27 @@ def extract_facts_from_documents(files_data: List[Dict[str, Any]]) -> Dict[str,
                         fact_words = set([w for w in fact_source_text.split() if len(w) > 4])
                         doc_words = set([w for w in text_sample.split() if len(w) > 4])
                         if fact_words and len(fact_words.intersection(doc_words)) >= 2:
-                            fact['source'] = source
+                            fact.set_source(source)
                             break
         
         # Normalize facts
         normalized_facts = normalize_facts(facts)
         
         # Detect conflicts
-        conflicts = detect_conflicts(normalized_facts)
+        with span(STAGE_CONFLICT_DETECTION):
+            conflicts = detect_conflicts(normalized_facts)
         
         return {
-            'facts': normalized_facts,
+            'facts': facts_to_dicts(normalized_facts),
             'conflicts': conflicts
         }
     
     except MemoryError as mem_error:
         error_msg = f"Insufficient memory during OpenAI API call. Try reducing the number of images or files."
         logger.error(error_msg, exc_info=True)
-        print(f"Memory error in extract_facts_from_documents: {mem_error}")
-        import traceback
-        print(f"ERROR: Traceback: {traceback.format_exc()}")
         raise Exception(error_msg)
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"Error in extract_facts_from_documents: {error_msg}", exc_info=True)
-        print(f"Error in extract_facts_from_documents: {error_msg}")
-        import traceback
-        print(f"ERROR: Traceback: {traceback.format_exc()}")
+        logger.error("Error in extract_facts_from_documents: %s", error_msg, exc_info=True)
         raise Exception(f"Fact extraction failed: {error_msg}")
 
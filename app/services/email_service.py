@@ -0,0 +1,342 @@
+"""
+Email service: SendGrid payloads and a durable outbox drained by a background sender.
+"""
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import Config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Delivery states
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+# Back off failed batches before the next attempt (seconds, doubled per attempt)
+RETRY_BASE_DELAY = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    batch_id TEXT,
+    message_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (status, next_attempt_at);
+"""
+
+
+def build_sendgrid_payload(recipients: List[str], subject: str, body: str) -> Dict[str, Any]:
+    """
+    Build a SendGrid v3 mail/send payload.
+    
+    Each recipient gets its own personalization, so recipients do not see
+    each other and SendGrid delivers one message per address.
+    
+    Args:
+        recipients: Recipient email addresses
+        subject: Email subject
+        body: Plain-text email body
+        
+    Returns:
+        Request body for POST /v3/mail/send
+    """
+    return {
+        'personalizations': [{'to': [{'email': email}]} for email in recipients],
+        'from': {
+            'email': Config.SENDGRID_FROM_EMAIL,
+            'name': Config.SENDGRID_FROM_NAME
+        },
+        'subject': subject,
+        'content': [
+            {
+                'type': 'text/plain',
+                'value': body
+            }
+        ]
+    }
+
+
+def get_sendgrid_error(response) -> str:
+    """Extract a readable error message from a SendGrid error response."""
+    error_message = f"HTTP {response.status_code}"
+    try:
+        error_data = response.json()
+        if 'errors' in error_data and len(error_data['errors']) > 0:
+            error_message = error_data['errors'][0].get('message', error_message)
+        elif 'error' in error_data:
+            error_message = error_data['error']
+    except Exception:
+        error_message = response.text or error_message
+    return error_message
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    """Format a stored epoch timestamp for API responses."""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class EmailOutbox:
+    """SQLite-backed queue of outgoing emails with a background batching sender."""
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """Initialize the outbox database (created on first use)."""
+        self.db_path = db_path or Config.get_email_outbox_path()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(outbox)')}
+            if 'batch_id' not in columns:
+                # Outboxes created before messages were grouped by enqueue call
+                conn.execute('ALTER TABLE outbox ADD COLUMN batch_id TEXT')
+            if 'claim_id' in columns:
+                # Earlier name of lease_token, easily confused with an insurance claim ID
+                conn.execute('ALTER TABLE outbox RENAME COLUMN claim_id TO lease_token')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; WAL lets web workers enqueue while the sender writes."""
+        conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def enqueue(self, recipients: List[str], subject: str, body: str) -> List[str]:
+        """
+        Durably queue one message per recipient and wake the sender.
+        
+        The messages share a batch ID, so the sender can deliver them in one
+        SendGrid call; messages from different calls are never sent together.
+        
+        Returns:
+            Outbox IDs, in recipient order
+        """
+        now = time.time()
+        batch_id = uuid.uuid4().hex
+        rows = [
+            (uuid.uuid4().hex, email, subject, body, STATUS_QUEUED, batch_id, now, now, now)
+            for email in recipients
+        ]
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO outbox (id, to_email, subject, body, status, batch_id, created_at, updated_at, next_attempt_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+        self.start()
+        self._wake.set()
+        return [row[0] for row in rows]
+    
+    def get_status(self, outbox_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get delivery status for the given outbox IDs (unknown IDs are omitted)."""
+        if not outbox_ids:
+            return []
+        placeholders = ','.join('?' * len(outbox_ids))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT id, to_email, status, attempts, message_id, error, created_at, sent_at '
+                f'FROM outbox WHERE id IN ({placeholders})',
+                outbox_ids
+            ).fetchall()
+        return [
+            {
+                'id': row['id'],
+                'to': row['to_email'],
+                'status': row['status'],
+                'attempts': row['attempts'],
+                'message_id': row['message_id'],
+                'error': row['error'],
+                'queued_at': _isoformat(row['created_at']),
+                'sent_at': _isoformat(row['sent_at']),
+            }
+            for row in rows
+        ]
+    
+    def claim_batch(self) -> Tuple[str, List[sqlite3.Row]]:
+        """
+        Atomically claim due messages for this sender.
+        
+        Messages left in 'sending' by a worker that died are reclaimed after
+        EMAIL_OUTBOX_STALE_SECONDS, so several processes can share one outbox.
+        
+        Returns:
+            Tuple of (lease token, claimed rows ordered by creation time)
+        """
+        lease_token = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'UPDATE outbox SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?',
+                    (STATUS_QUEUED, now, STATUS_SENDING, now - Config.EMAIL_OUTBOX_STALE_SECONDS)
+                )
+                conn.execute(
+                    'UPDATE outbox SET status = ?, lease_token = ?, updated_at = ? WHERE id IN ('
+                    '  SELECT id FROM outbox WHERE status = ? AND next_attempt_at <= ? '
+                    '  ORDER BY created_at LIMIT ?'
+                    ')',
+                    (STATUS_SENDING, lease_token, now, STATUS_QUEUED, now, Config.EMAIL_OUTBOX_BATCH_SIZE)
+                )
+            rows = conn.execute(
+                'SELECT * FROM outbox WHERE lease_token = ? AND status = ? ORDER BY created_at',
+                (lease_token, STATUS_SENDING)
+            ).fetchall()
+        return lease_token, rows
+    
+    def _finish(self, ids: List[str], status: str, message_id: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Mark claimed messages as sent or permanently failed."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'UPDATE outbox SET status = ?, message_id = ?, error = ?, attempts = attempts + 1, '
+                    'updated_at = ?, sent_at = ? WHERE id = ?',
+                    [(status, message_id, error, now, now if status == STATUS_SENT else None, outbox_id) for outbox_id in ids]
+                )
+    
+    def _retry_later(self, rows: List[sqlite3.Row], error: str) -> None:
+        """Requeue messages after a transient failure, or fail them once out of attempts."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for row in rows:
+                    attempts = row['attempts'] + 1
+                    if attempts >= Config.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                        status, next_attempt_at = STATUS_FAILED, now
+                    else:
+                        status, next_attempt_at = STATUS_QUEUED, now + RETRY_BASE_DELAY * (2 ** (attempts - 1))
+                    conn.execute(
+                        'UPDATE outbox SET status = ?, attempts = ?, error = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?',
+                        (status, attempts, error, now, next_attempt_at, row['id'])
+                    )
+    
+    def _send_group(self, rows: List[sqlite3.Row]) -> None:
+        """Send messages queued by one enqueue call as one SendGrid call."""
+        ids = [row['id'] for row in rows]
+        recipients = [row['to_email'] for row in rows]
+        subject, body = rows[0]['subject'], rows[0]['body']
+        
+        if not Config.SENDGRID_API_KEY:
+            # Mock mode for development: log and mark as delivered
+            logger.info("[MOCK EMAIL SEND - SendGrid not configured] To: %s, Subject: %s, Body: %s... "
+                        "(set SENDGRID_API_KEY to enable actual email sending)",
+                        ', '.join(recipients), subject, body[:200])  # Body truncated for logging
+            self._finish(ids, STATUS_SENT, message_id=f"mock-{uuid.uuid4().hex}")
+            return
+        
+        from app.services.http_service import get_http_client, RequestException
+        
+        try:
+            response = get_http_client().post(
+                f'{Config.SENDGRID_API_URL}/v3/mail/send',
+                headers={
+                    'Authorization': f'Bearer {Config.SENDGRID_API_KEY}',
+                    'Content-Type': 'application/json'
+                },
+                json=build_sendgrid_payload(recipients, subject, body)
+            )
+        except RequestException as send_error:
+            logger.error("[SENDGRID ERROR] Request failed: %s", send_error)
+            self._retry_later(rows, f'Failed to connect to SendGrid: {str(send_error)}')
+            return
+        
+        if response.status_code == 202:
+            message_id = response.headers.get('X-Message-Id') or uuid.uuid4().hex
+            logger.info("[SENDGRID EMAIL SENT] %d recipient(s), Message ID: %s", len(ids), message_id)
+            self._finish(ids, STATUS_SENT, message_id=message_id)
+            return
+        
+        if response.status_code == 400 and len(rows) > 1:
+            # SendGrid rejects the whole call for one invalid address; find out which by sending separately
+            logger.warning("SendGrid rejected a batch of %d email(s); retrying each recipient separately", len(rows))
+            for row in rows:
+                self._send_group([row])
+            return
+        
+        error_message = get_sendgrid_error(response)
+        logger.error("[SENDGRID ERROR] Failed to send %d email(s): %s", len(ids), error_message)
+        if response.status_code == 429 or response.status_code >= 500:
+            # The HTTP client already retried; leave the rest to the next pass
+            self._retry_later(rows, f'SendGrid error: {error_message}')
+        else:
+            self._finish(ids, STATUS_FAILED, error=f'SendGrid error: {error_message}')
+    
+    def process_once(self) -> int:
+        """
+        Claim and send one batch.
+        
+        Returns:
+            Number of messages claimed
+        """
+        _, rows = self.claim_batch()
+        groups: Dict[str, List[sqlite3.Row]] = {}
+        for row in rows:
+            # Rows queued before batch IDs existed are sent on their own
+            groups.setdefault(row['batch_id'] or row['id'], []).append(row)
+        for group in groups.values():
+            try:
+                self._send_group(group)
+            except Exception as e:
+                logger.error(f"Email outbox send failed: {str(e)}", exc_info=True)
+                self._retry_later(group, str(e))
+        return len(rows)
+    
+    def _run(self) -> None:
+        """Sender loop: drain the outbox, then sleep until woken or the poll interval passes."""
+        while True:
+            # Cleared before draining, so a wake-up that arrives mid-drain is not lost
+            self._wake.clear()
+            try:
+                if self.process_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Email outbox sender error: {str(e)}", exc_info=True)
+            self._wake.wait(Config.EMAIL_OUTBOX_POLL_INTERVAL)
+    
+    def start(self) -> None:
+        """Start the background sender thread if it is not already running."""
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox-sender', daemon=True)
+                self._thread.start()
+
+
+# Global email outbox instance
+_email_outbox: Optional[EmailOutbox] = None
+_email_outbox_lock = threading.Lock()
+
+
+def get_email_outbox() -> EmailOutbox:
+    """Get global email outbox instance (starts the sender, which also picks up messages left from a previous run)."""
+    global _email_outbox
+    if _email_outbox is None:
+        with _email_outbox_lock:
+            if _email_outbox is None:
+                _email_outbox = EmailOutbox()
+                _email_outbox.start()
+    return _email_outbox
@@ -0,0 +1,244 @@
+"""
+Fact query service: per-claim search index over extracted facts with
+filtering, sorting and cursor pagination.
+"""
+import re
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from app.config import Config
+
+# Fact fields matched by the free-text search
+SEARCH_FIELDS = ('extracted_fact', 'source_text', 'normalized_value')
+
+# Sort keys accepted by the query API (same options as the fact matrix "Sort by" menu)
+SORT_KEYS = ('confidence', 'confidence-asc', 'category', 'source', 'index')
+DEFAULT_SORT = 'confidence'
+
+_TERM = re.compile(r'\w+')
+
+
+def _confidence(fact: Dict[str, Any]) -> float:
+    try:
+        return float(fact.get('confidence') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else ('' if value is None else str(value))
+
+
+class FactIndex:
+    """
+    Search index over one claim's facts.
+    
+    Free text is matched the way the fact matrix always matched it: the whole
+    query must appear, case-insensitively, in extracted_fact, source_text or
+    normalized_value. Each query word must occur inside some indexed word, so
+    an inverted index of words narrows the facts to check down to those
+    containing every query word before the substring test runs.
+    """
+    
+    def __init__(self, facts: List[Dict[str, Any]]):
+        self.facts = facts
+        self.version = hashlib.sha256(
+            json.dumps(facts, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:16]
+        
+        self._search_text: List[str] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._by_category: Dict[str, Set[int]] = {}
+        self._by_source: Dict[str, Set[int]] = {}
+        for index, fact in enumerate(facts):
+            # Fields joined with a separator no query can span
+            text = '\n'.join(_text(fact.get(field)).lower() for field in SEARCH_FIELDS)
+            self._search_text.append(text)
+            for term in set(_TERM.findall(text)):
+                self._postings.setdefault(term, set()).add(index)
+            self._by_category.setdefault(_text(fact.get('category')), set()).add(index)
+            self._by_source.setdefault(_text(fact.get('source')), set()).add(index)
+        
+        # Sort orders are fixed for the life of the index, so compute them once
+        indices = range(len(facts))
+        self._orders = {
+            'index': list(indices),
+            'confidence': sorted(indices, key=lambda i: (-_confidence(facts[i]), i)),
+            'confidence-asc': sorted(indices, key=lambda i: (_confidence(facts[i]), i)),
+            'category': sorted(indices, key=lambda i: (_text(facts[i].get('category')).casefold(), i)),
+            'source': sorted(indices, key=lambda i: (_text(facts[i].get('source')).casefold(), i)),
+        }
+        self._term_cache: Dict[str, Set[int]] = {}
+    
+    def _facts_with_word(self, word: str) -> Set[int]:
+        """Facts containing an indexed word that contains ``word``."""
+        matches = self._term_cache.get(word)
+        if matches is None:
+            matches = set(self._postings.get(word, ()))
+            for term, postings in self._postings.items():
+                if word in term and term != word:
+                    matches |= postings
+            self._term_cache[word] = matches
+        return matches
+    
+    def match(self, search: str = '', category: str = '', source: str = '') -> Optional[Set[int]]:
+        """
+        Find the facts matching every given filter.
+        
+        Returns:
+            Set of fact indices, or None when no filter is given (all facts match)
+        """
+        candidates: Optional[Set[int]] = None
+        if category:
+            candidates = set(self._by_category.get(category, ()))
+        if source:
+            by_source = self._by_source.get(source, set())
+            candidates = set(by_source) if candidates is None else candidates & by_source
+        
+        search = search.lower()
+        if search:
+            for word in sorted(set(_TERM.findall(search)), key=len, reverse=True):
+                with_word = self._facts_with_word(word)
+                candidates = set(with_word) if candidates is None else candidates & with_word
+                if not candidates:
+                    return set()
+            pool = range(len(self.facts)) if candidates is None else candidates
+            candidates = {index for index in pool if search in self._search_text[index]}
+        return candidates
+    
+    def query(self, search: str = '', category: str = '', source: str = '',
+              sort: str = DEFAULT_SORT, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """
+        Filter, sort and slice the facts.
+        
+        Returns:
+            Dictionary with 'total' (matching facts), 'indices' (original fact
+            indices on this page, in order) and 'next_offset' (None on the last page)
+        """
+        matched = self.match(search, category, source)
+        order = self._orders[sort]
+        if matched is not None:
+            order = [index for index in order if index in matched]
+        page = order[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(order) else None
+        return {'total': len(order), 'indices': page, 'next_offset': next_offset}
+
+
+def _query_fingerprint(version: str, search: str, category: str, source: str, sort: str) -> str:
+    key = json.dumps([version, search.lower(), category, source, sort])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(fingerprint: str, offset: int) -> str:
+    """Encode a page position as an opaque cursor."""
+    raw = json.dumps({'q': fingerprint, 'o': offset}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """
+    Decode a cursor issued for the same facts and query.
+    
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another query or fact set
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        offset = int(data['o'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor.')
+    if data.get('q') != fingerprint or offset < 0:
+        raise ValueError('Cursor does not match this query or the facts have changed; start from the first page.')
+    return offset
+
+
+class FactStore:
+    """
+    In-memory fact indexes by claim ID, least recently used dropped first.
+    
+    Indexes live in the worker process that built them; a claim stored by
+    another worker (or before a restart) is simply not found.
+    """
+    
+    def __init__(self, max_claims: Optional[int] = None):
+        self.max_claims = max_claims or Config.FACT_STORE_MAX_CLAIMS
+        self._indexes: 'OrderedDict[str, FactIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def put(self, claim_id: str, facts: List[Dict[str, Any]]) -> FactIndex:
+        """Index a claim's facts, replacing any earlier set."""
+        index = FactIndex(facts)
+        with self._lock:
+            self._indexes[claim_id] = index
+            self._indexes.move_to_end(claim_id)
+            while len(self._indexes) > self.max_claims:
+                self._indexes.popitem(last=False)
+        return index
+    
+    def get(self, claim_id: str) -> Optional[FactIndex]:
+        """Get a claim's fact index, or None if it is not held by this worker."""
+        with self._lock:
+            index = self._indexes.get(claim_id)
+            if index is not None:
+                self._indexes.move_to_end(claim_id)
+            return index
+
+
+def query_facts(index: FactIndex, search: str = '', category: str = '', source: str = '',
+                sort: str = DEFAULT_SORT, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run a paged fact query.
+    
+    Args:
+        index: The claim's fact index
+        search: Case-insensitive text to find in extracted_fact, source_text or normalized_value
+        category: Only facts in this category
+        source: Only facts from this source
+        sort: One of SORT_KEYS
+        cursor: next_cursor from the previous page, or None for the first page
+        limit: Page size (defaults to FACT_QUERY_PAGE_SIZE, capped at FACT_QUERY_MAX_PAGE_SIZE)
+        
+    Returns:
+        Dictionary with 'version', 'total', 'items' ({'index', 'fact'} in page order)
+        and 'next_cursor' (None on the last page)
+        
+    Raises:
+        ValueError: On an unknown sort key, bad limit or invalid cursor
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}'. Expected one of: {', '.join(SORT_KEYS)}.")
+    limit = Config.FACT_QUERY_PAGE_SIZE if limit is None else limit
+    if limit < 1:
+        raise ValueError('limit must be at least 1.')
+    limit = min(limit, Config.FACT_QUERY_MAX_PAGE_SIZE)
+    
+    fingerprint = _query_fingerprint(index.version, search, category, source, sort)
+    offset = decode_cursor(cursor, fingerprint) if cursor else 0
+    result = index.query(search, category, source, sort, offset, limit)
+    
+    next_offset = result['next_offset']
+    return {
+        'version': index.version,
+        'total': result['total'],
+        'items': [{'index': i, 'fact': index.facts[i]} for i in result['indices']],
+        'next_cursor': encode_cursor(fingerprint, next_offset) if next_offset is not None else None,
+    }
+
+
+# Global store instance
+_fact_store: Optional[FactStore] = None
+_fact_store_lock = threading.Lock()
+
+
+def get_fact_store() -> FactStore:
+    """Get global fact store instance."""
+    global _fact_store
+    if _fact_store is None:
+        with _fact_store_lock:
+            if _fact_store is None:
+                _fact_store = FactStore()
+    return _fact_store
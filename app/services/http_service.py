@@ -0,0 +1,138 @@
+"""
+Shared outbound HTTP client with connection pooling, timeouts, retries and metrics.
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+from app.config import Config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HTTPClient:
+    """Pooled requests.Session shared by every outbound call from a worker."""
+    
+    def __init__(
+        self,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        pool_size: Optional[int] = None
+    ):
+        """Initialize the session; arguments default to Config values."""
+        self.timeout = (
+            Config.HTTP_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            Config.HTTP_READ_TIMEOUT if read_timeout is None else read_timeout,
+        )
+        retries = Retry(
+            total=Config.HTTP_MAX_RETRIES if max_retries is None else max_retries,
+            backoff_factor=Config.HTTP_RETRY_BACKOFF,
+            read=0,  # A read timeout or dropped response may come after the request was accepted
+            other=0,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # Retry POST too, but only on connect errors and RETRY_STATUSES
+            respect_retry_after_header=True,
+            raise_on_status=False,  # Hand the final response back to the caller
+        )
+        pool_size = Config.HTTP_POOL_SIZE if pool_size is None else pool_size
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+    
+    def _record(self, url: str, elapsed: float, status_code: Optional[int], retries: int) -> None:
+        """Update per-host counters."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            stats = self._metrics.setdefault(host, {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'status_codes': {},
+            })
+            stats['requests'] += 1
+            stats['retries'] += retries
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+            if status_code is None or status_code >= 400:
+                stats['errors'] += 1
+            key = str(status_code) if status_code is not None else 'exception'
+            stats['status_codes'][key] = stats['status_codes'].get(key, 0) + 1
+    
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session.
+        
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            **kwargs: Passed to requests.Session.request; timeout defaults to
+                (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+                
+        Returns:
+            Response (after any retries)
+            
+        Raises:
+            RequestException: On connection failures or timeouts once retries are exhausted
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except RequestException:
+            self._record(url, time.perf_counter() - start, None, 0)
+            raise
+        
+        elapsed = time.perf_counter() - start
+        retry_state = getattr(response.raw, 'retries', None)
+        retries = len(retry_state.history) if retry_state is not None else 0
+        self._record(url, elapsed, response.status_code, retries)
+        logger.info("%s %s -> %d in %.0fms (%d retries)", method, url, response.status_code, elapsed * 1000, retries)
+        return response
+    
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request through the pooled session."""
+        return self.request('POST', url, **kwargs)
+    
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot of per-host request counts, errors, retries and latency."""
+        with self._lock:
+            snapshot = {}
+            for host, stats in self._metrics.items():
+                snapshot[host] = {
+                    **stats,
+                    'status_codes': dict(stats['status_codes']),
+                    'avg_seconds': stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0,
+                }
+            return snapshot
+
+
+# Global HTTP client instance
+_http_client: Optional[HTTPClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Get global HTTP client instance."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HTTPClient()
+    return _http_client
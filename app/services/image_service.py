@@ -3,9 +3,207 @@ Image processing service.
 """
 import base64
 from io import BytesIO
-from typing import Optional, Tuple
-from PIL import Image
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
 from app.config import Config
+from app.services.rendition_service import (
+    compute_content_hash,
+    compute_file_hash,
+    get_rendition_urls,
+    load_image_record,
+    save_image_record,
+    store_renditions,
+)
+from app.services.metrics_service import span, STAGE_IMAGE_OPTIMIZE
+
+# Perceptual hash grid size (8x8 -> 64-bit difference hash)
+HASH_SIZE = 8
+
+# Grayscale probe size used for entropy measurement
+ENTROPY_PROBE_SIZE = 64
+
+# JPEG qualities tried, in order, when an image exceeds the size budget
+QUALITY_LADDER = (75, 65, 55, 45)
+
+# Linear reduction of the probe image used to predict encoded size
+PROBE_REDUCTION = 4
+
+# Aim slightly under the byte budget so predictions rarely overshoot
+SIZE_SAFETY_MARGIN = 0.95
+
+# Resize with integer reduce() down to this multiple of the target, then LANCZOS
+RESIZE_REDUCING_GAP = 3.0
+
+# Downscaled photos keep more detail per pixel: encoded size tracks area ** 0.7
+AREA_SIZE_EXPONENT = 0.7
+
+# EXIF tag holding camera orientation (1 = upright)
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Accept a JPEG draft decode whose long side is within this fraction of
+# MAX_IMAGE_DIMENSION (e.g. 4000px phone photos decode at 1/2 scale to 2000px)
+DRAFT_DIMENSION_TOLERANCE = 0.95
+
+
+def compute_image_fingerprint(pil_image: Image.Image) -> Tuple[str, float]:
+    """
+    Compute a perceptual (difference) hash and grayscale entropy for an image.
+    
+    Both values come from one small grayscale probe, so the cost does not
+    depend on the source resolution beyond a single downscale.
+    
+    Args:
+        pil_image: PIL Image object
+        
+    Returns:
+        Tuple of (hex_hash, entropy_bits)
+    """
+    gray = pil_image.convert('L')
+    gray.thumbnail((ENTROPY_PROBE_SIZE, ENTROPY_PROBE_SIZE), Image.Resampling.BILINEAR)
+    entropy = gray.entropy()
+    
+    # Difference hash: compare each pixel with its right-hand neighbour
+    small = gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    
+    return f"{bits:016x}", entropy
+
+
+def hash_distance(hash_a: str, hash_b: str) -> int:
+    """Return the Hamming distance between two hex perceptual hashes."""
+    return (int(hash_a, 16) ^ int(hash_b, 16)).bit_count()
+
+
+def is_low_information_image(width: int, height: int, entropy: float) -> bool:
+    """
+    Check whether an image is too small or too flat to be worth sending to the model.
+    
+    Catches horizontal rules, bullets, signatures and blank regions.
+    """
+    if min(width, height) < Config.MIN_IMAGE_DIMENSION:
+        return True
+    return entropy < Config.MIN_IMAGE_ENTROPY
+
+
+class ImageDeduplicator:
+    """Tracks perceptual hashes seen so far and flags near-duplicates."""
+    
+    def __init__(self, max_distance: Optional[int] = None):
+        """Initialize with an optional Hamming distance threshold."""
+        self.max_distance = Config.IMAGE_DEDUPE_MAX_DISTANCE if max_distance is None else max_distance
+        self.seen_hashes: List[str] = []
+        self.duplicates_skipped = 0
+        self.low_information_skipped = 0
+    
+    def is_duplicate(self, image_hash: str) -> bool:
+        """Return True if the hash is near a previously seen hash; otherwise remember it."""
+        for seen_hash in self.seen_hashes:
+            if hash_distance(image_hash, seen_hash) <= self.max_distance:
+                self.duplicates_skipped += 1
+                return True
+        self.seen_hashes.append(image_hash)
+        return False
+    
+    def should_skip(
+        self,
+        pil_image: Image.Image,
+        original_size: Optional[Tuple[int, int]] = None
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Fingerprint an image and decide whether it should be dropped.
+        
+        Args:
+            pil_image: PIL Image object
+            original_size: Source dimensions if pil_image was decoded at reduced scale
+            
+        Returns:
+            Tuple of (skip, hex_hash)
+        """
+        image_hash, entropy = compute_image_fingerprint(pil_image)
+        width, height = original_size or pil_image.size
+        if is_low_information_image(width, height, entropy):
+            self.low_information_skipped += 1
+            return True, image_hash
+        return self.is_duplicate(image_hash), image_hash
+    
+    def should_skip_encoded(self, base64_data: str, image_hash: Optional[str] = None) -> bool:
+        """
+        Decide whether a base64-encoded image should be dropped.
+        
+        Uses a precomputed hash when the extraction step already supplied one,
+        otherwise decodes the image to fingerprint it.
+        """
+        if image_hash:
+            return self.is_duplicate(image_hash)
+        try:
+            with Image.open(BytesIO(base64.b64decode(base64_data))) as img:
+                original_size = img.size
+                img.draft('L', (ENTROPY_PROBE_SIZE * 2, ENTROPY_PROBE_SIZE * 2))
+                skip, _ = self.should_skip(img, original_size=original_size)
+                return skip
+        except Exception as e:
+            # Undecodable images are left for the model to reject
+            print(f"Warning: Could not fingerprint image for deduplication: {str(e)}")
+            return False
+
+
+def _encode_jpeg(pil_image: Image.Image, quality: int, optimize: bool = True) -> bytes:
+    """Encode an RGB image as JPEG and return the bytes."""
+    img_buffer = BytesIO()
+    pil_image.save(img_buffer, format='JPEG', quality=quality, optimize=optimize)
+    return img_buffer.getvalue()
+
+
+def _size_scale(current_size: float, target_size: float) -> float:
+    """Linear scale factor expected to bring an encoded size down to the target."""
+    return (target_size / current_size) ** (1 / (2 * AREA_SIZE_EXPONENT))
+
+
+def _resize(pil_image: Image.Image, scale: float, min_dimension: int = 1) -> Image.Image:
+    """Downscale by a factor, using integer reduce() before the final LANCZOS pass."""
+    width, height = pil_image.size
+    new_width = max(min_dimension, int(width * scale))
+    new_height = max(min_dimension, int(height * scale))
+    return pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+
+
+def _predict_quality(pil_image: Image.Image, full_size: int) -> Tuple[int, float]:
+    """
+    Predict the highest ladder quality that fits the size budget.
+    
+    Encodes a reduced-size probe once per ladder step instead of re-encoding
+    the full image; the probe's size ratio against Config.JPEG_QUALITY is
+    applied to the measured full-size encode.
+    
+    Args:
+        pil_image: RGB image already resized to its output dimensions
+        full_size: Size in bytes of the full image encoded at Config.JPEG_QUALITY
+        
+    Returns:
+        Tuple of (quality, predicted_size_bytes)
+    """
+    width, height = pil_image.size
+    if min(width, height) >= PROBE_REDUCTION * 16:
+        probe = pil_image.reduce(PROBE_REDUCTION)
+    else:
+        probe = pil_image
+    
+    base_size = len(_encode_jpeg(probe, Config.JPEG_QUALITY, optimize=False))
+    target_size = Config.MAX_IMAGE_SIZE_BYTES * SIZE_SAFETY_MARGIN
+    
+    predicted_size = float(full_size)
+    for quality in QUALITY_LADDER:
+        probe_size = len(_encode_jpeg(probe, quality, optimize=False))
+        predicted_size = full_size * probe_size / base_size
+        if predicted_size <= target_size:
+            return quality, predicted_size
+    
+    return QUALITY_LADDER[-1], predicted_size
 
 
 def optimize_image(pil_image: Image.Image) -> Tuple[Optional[bytes], Optional[str]]:
@@ -18,64 +216,146 @@ def optimize_image(pil_image: Image.Image) -> Tuple[Optional[bytes], Optional[st
     Returns:
         Tuple of (optimized_image_bytes, mime_type) or (None, None) if optimization fails
     """
+    img_bytes, mime_type, _ = optimize_image_with_size(pil_image)
+    return img_bytes, mime_type
+
+
+def optimize_image_with_size(pil_image: Image.Image) -> Tuple[Optional[bytes], Optional[str], Optional[Tuple[int, int]]]:
+    """
+    Optimize image and also report the output dimensions, so callers do not
+    have to decode the result again to learn its size.
+    
+    The image may be modified in place (JPEG draft mode), so pass a freshly
+    opened image rather than a defensive copy.
+    
+    Args:
+        pil_image: PIL Image object
+        
+    Returns:
+        Tuple of (optimized_image_bytes, mime_type, (width, height)) or (None, None, None) if optimization fails
+    """
     try:
-        # Convert RGBA to RGB if needed (JPEG doesn't support transparency)
-        if pil_image.mode in ('RGBA', 'LA', 'P'):
-            # Create white background
-            rgb_image = Image.new('RGB', pil_image.size, (255, 255, 255))
-            if pil_image.mode == 'P':
-                pil_image = pil_image.convert('RGBA')
-            rgb_image.paste(pil_image, mask=pil_image.split()[-1] if pil_image.mode in ('RGBA', 'LA') else None)
-            pil_image = rgb_image
-        elif pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
-        
-        # Resize if dimensions exceed maximum
-        width, height = pil_image.size
-        if width > Config.MAX_IMAGE_DIMENSION or height > Config.MAX_IMAGE_DIMENSION:
-            # Calculate new dimensions maintaining aspect ratio
-            ratio = min(Config.MAX_IMAGE_DIMENSION / width, Config.MAX_IMAGE_DIMENSION / height)
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Compress to JPEG with quality setting
-        img_buffer = BytesIO()
-        pil_image.save(img_buffer, format='JPEG', quality=Config.JPEG_QUALITY, optimize=True)
-        img_bytes = img_buffer.getvalue()
-        
-        # Check if image size exceeds limit
-        if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
-            # Try reducing quality progressively
-            for quality in [75, 65, 55, 45]:
-                img_buffer = BytesIO()
-                pil_image.save(img_buffer, format='JPEG', quality=quality, optimize=True)
-                img_bytes = img_buffer.getvalue()
-                if len(img_bytes) <= Config.MAX_IMAGE_SIZE_BYTES:
-                    break
-            
-            # If still too large, resize further
-            if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
-                current_width, current_height = pil_image.size
-                scale_factor = (Config.MAX_IMAGE_SIZE_BYTES / len(img_bytes)) ** 0.5
-                new_width = max(100, int(current_width * scale_factor))
-                new_height = max(100, int(current_height * scale_factor))
-                pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                img_buffer = BytesIO()
-                pil_image.save(img_buffer, format='JPEG', quality=Config.JPEG_QUALITY, optimize=True)
-                img_bytes = img_buffer.getvalue()
-        
-        return img_bytes, 'image/jpeg'
+        with span(STAGE_IMAGE_OPTIMIZE):
+            img_bytes, pil_image = _compress(prepare_image(pil_image))
+        return img_bytes, 'image/jpeg', pil_image.size
+    
+    except Exception as e:
+        print(f"Error optimizing image: {str(e)}")
+        return None, None, None
+
+
+def optimize_image_with_renditions(
+    pil_image: Image.Image,
+    content_hash: Optional[str] = None
+) -> Tuple[Optional[bytes], Optional[str], Optional[Tuple[int, int]], Dict[str, str]]:
+    """
+    Optimize image and write its thumbnail/viewer/model renditions from the same decode.
     
+    Args:
+        pil_image: PIL Image object
+        content_hash: Cache key for the source; defaults to the hash of the optimized bytes
+        
+    Returns:
+        Tuple of (optimized_image_bytes, mime_type, (width, height), rendition_urls)
+        or (None, None, None, {}) if optimization fails
+    """
+    try:
+        with span(STAGE_IMAGE_OPTIMIZE):
+            img_bytes, pil_image = _compress(prepare_image(pil_image))
     except Exception as e:
         print(f"Error optimizing image: {str(e)}")
-        return None, None
+        return None, None, None, {}
+    
+    rendition_urls = store_renditions(pil_image, img_bytes, content_hash or compute_content_hash(img_bytes))
+    return img_bytes, 'image/jpeg', pil_image.size, rendition_urls
+
+
+def prepare_image(pil_image: Image.Image) -> Image.Image:
+    """
+    Decode, orient and normalize an image for encoding.
+    
+    Applies JPEG draft decoding, EXIF orientation, RGB conversion and the
+    MAX_IMAGE_DIMENSION cap.
+    
+    Args:
+        pil_image: PIL Image object
+        
+    Returns:
+        RGB image no larger than MAX_IMAGE_DIMENSION
+    """
+    # For JPEG sources that have not been decoded yet, let libjpeg decode
+    # at 1/2, 1/4 or 1/8 scale straight to about MAX_IMAGE_DIMENSION
+    width, height = pil_image.size
+    if pil_image.format == 'JPEG' and (width > Config.MAX_IMAGE_DIMENSION or height > Config.MAX_IMAGE_DIMENSION):
+        ratio = min(Config.MAX_IMAGE_DIMENSION / width, Config.MAX_IMAGE_DIMENSION / height) * DRAFT_DIMENSION_TOLERANCE
+        pil_image.draft('RGB', (int(width * ratio), int(height * ratio)))
+    
+    # Phone cameras store rotation in EXIF; the JPEG re-encode drops it, so bake it in
+    if pil_image.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1:
+        pil_image = ImageOps.exif_transpose(pil_image)
+    
+    # Convert RGBA to RGB if needed (JPEG doesn't support transparency)
+    if pil_image.mode in ('RGBA', 'LA', 'P'):
+        # Create white background
+        rgb_image = Image.new('RGB', pil_image.size, (255, 255, 255))
+        if pil_image.mode == 'P':
+            pil_image = pil_image.convert('RGBA')
+        rgb_image.paste(pil_image, mask=pil_image.split()[-1] if pil_image.mode in ('RGBA', 'LA') else None)
+        pil_image = rgb_image
+    elif pil_image.mode != 'RGB':
+        pil_image = pil_image.convert('RGB')
+    
+    # Resize if dimensions exceed maximum
+    width, height = pil_image.size
+    if width > Config.MAX_IMAGE_DIMENSION or height > Config.MAX_IMAGE_DIMENSION:
+        # Calculate new dimensions maintaining aspect ratio
+        ratio = min(Config.MAX_IMAGE_DIMENSION / width, Config.MAX_IMAGE_DIMENSION / height)
+        pil_image = _resize(pil_image, ratio)
+    
+    return pil_image
+
+
+def _compress(pil_image: Image.Image) -> Tuple[bytes, Image.Image]:
+    """
+    Encode a prepared RGB image as JPEG within MAX_IMAGE_SIZE_BYTES.
+    
+    Images that fit the byte budget at Config.JPEG_QUALITY are encoded once.
+    Otherwise the quality (and, if needed, the dimensions) are predicted from a
+    reduced-size probe, so at most two more full-size encodes are needed.
+    
+    Returns:
+        Tuple of (jpeg_bytes, encoded_image)
+    """
+    # Compress to JPEG with quality setting
+    img_bytes = _encode_jpeg(pil_image, Config.JPEG_QUALITY)
+    
+    # Check if image size exceeds limit
+    if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
+        quality, predicted_size = _predict_quality(pil_image, len(img_bytes))
+        
+        # Even the lowest ladder quality is predicted to be too large: shrink as well
+        target_size = Config.MAX_IMAGE_SIZE_BYTES * SIZE_SAFETY_MARGIN
+        if predicted_size > target_size:
+            pil_image = _resize(pil_image, _size_scale(predicted_size, target_size), min_dimension=100)
+        
+        img_bytes = _encode_jpeg(pil_image, quality)
+        
+        # Prediction undershot: scale down by the measured overshoot and re-encode once
+        if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
+            pil_image = _resize(pil_image, _size_scale(len(img_bytes), target_size), min_dimension=100)
+            img_bytes = _encode_jpeg(pil_image, quality)
+    
+    return img_bytes, pil_image
 
 
 def extract_image_content(image_path: str) -> dict:
     """
     Extract content from an image file with memory optimization.
     
+    The source is decoded once to produce the model image (returned inline)
+    plus cached thumbnail and viewer renditions. Re-uploads of identical
+    content are served from the rendition cache without decoding.
+    
     Args:
         image_path: Path to image file
         
@@ -83,43 +363,63 @@ def extract_image_content(image_path: str) -> dict:
         Dictionary with image data
     """
     try:
-        with Image.open(image_path) as img:
-            # Get original image dimensions
-            original_width, original_height = img.size
-            
-            # Optimize image (resize if needed, compress, convert to JPEG)
-            img_bytes, mime_type = optimize_image(img.copy())
-            
-            if not img_bytes or not mime_type:
-                raise Exception('Failed to optimize image')
-            
-            # Get final dimensions after optimization
-            optimized_img = Image.open(BytesIO(img_bytes))
-            final_width, final_height = optimized_img.size
-            optimized_img.close()
-            
-            # Convert to base64
-            image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-            
-            # Check size limit
-            if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
-                print(f"Warning: Image {image_path} size ({len(img_bytes)} bytes) exceeds limit ({Config.MAX_IMAGE_SIZE_BYTES} bytes)")
+        content_hash = compute_file_hash(image_path)
+        record = load_image_record(content_hash)
+        rendition_urls = get_rendition_urls(content_hash)
+        
+        if record is None:
+            with Image.open(image_path) as img:
+                # Get original image dimensions
+                original_width, original_height = img.size
+                
+                # Draft decode, EXIF orientation, RGB conversion and resize.
+                # No defensive copy: the file handle is owned here and closed on exit.
+                prepared = prepare_image(img)
+                
+                # Perceptual hash lets fact extraction collapse the same photo across documents
+                image_hash, _ = compute_image_fingerprint(prepared)
+                
+                img_bytes, mime_type, final_size, rendition_urls = optimize_image_with_renditions(prepared, content_hash)
+                
+                if not img_bytes or not mime_type:
+                    raise Exception('Failed to optimize image')
             
-            return {
-                'type': 'image',
-                'filename': image_path.split('/')[-1],
-                'data': f"data:{mime_type};base64,{image_base64}",
-                'format': 'jpg',
+            record = {
                 'original_dimensions': {
                     'width': original_width,
                     'height': original_height
                 },
                 'optimized_dimensions': {
-                    'width': final_width,
-                    'height': final_height
+                    'width': final_size[0],
+                    'height': final_size[1]
                 },
-                'size_bytes': len(img_bytes)
+                'phash': image_hash
             }
+            if rendition_urls:
+                save_image_record(content_hash, record)
+            record['model_bytes'] = img_bytes
+        
+        img_bytes = record.pop('model_bytes')
+        
+        # Convert to base64
+        image_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        
+        # Check size limit
+        if len(img_bytes) > Config.MAX_IMAGE_SIZE_BYTES:
+            print(f"Warning: Image {image_path} size ({len(img_bytes)} bytes) exceeds limit ({Config.MAX_IMAGE_SIZE_BYTES} bytes)")
+        
+        return {
+            'type': 'image',
+            'filename': image_path.split('/')[-1],
+            'data': f"data:image/jpeg;base64,{image_base64}",
+            'format': 'jpg',
+            'original_dimensions': record['original_dimensions'],
+            'optimized_dimensions': record['optimized_dimensions'],
+            'size_bytes': len(img_bytes),
+            'phash': record['phash'],
+            'content_hash': content_hash,
+            **rendition_urls
+        }
     
     except Exception as e:
         print(f"Error extracting image content: {str(e)}")
@@ -128,5 +428,3 @@ def extract_image_content(image_path: str) -> dict:
             'filename': image_path.split('/')[-1],
             'error': str(e)
         }
-
-
@@ -0,0 +1,303 @@
+"""
+Request and pipeline-stage timing: spans, Prometheus metrics and Server-Timing headers.
+
+Code that does measurable work wraps it in ``span(stage)``. Each span is
+observed in a process-wide histogram labelled with the route it ran under,
+and, while a request is being handled, added to that request's timings so
+the response can report them in a ``Server-Timing`` header. Spans may nest
+(a classification call contains a model call), so stage times are not
+meant to add up to the request time.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages reported as spans
+STAGE_UPLOAD_SAVE = 'upload_save'
+STAGE_PDF_PARSE = 'pdf_parse'
+STAGE_IMAGE_OPTIMIZE = 'image_optimize'
+STAGE_CLASSIFICATION = 'classification_call'
+STAGE_MODEL_CALL = 'model_call'
+STAGE_CONFLICT_DETECTION = 'conflict_detection'
+STAGE_JSON_SERIALIZE = 'json_serialize'
+
+# Histogram bucket upper bounds in seconds; model calls range from under a second to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Route label for spans that run outside a request (batch ingestion, background threads)
+BACKGROUND_ROUTE = 'background'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by a tuple of label values."""
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> [bucket counts..., sum, count]
+    
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        """Record one value; callers hold the registry lock."""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = _format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        """Add to a series; callers hold the registry lock."""
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.label_names, labels)}}} {value:g}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+
+
+class RequestTimings:
+    """Spans and token usage collected while one request is handled."""
+    
+    def __init__(self, route: str):
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # stage -> [total seconds, count]
+        self.tokens: Dict[str, int] = {'prompt': 0, 'completion': 0, 'cached': 0}
+        self._lock = threading.Lock()  # Spans can finish on helper threads
+    
+    def add_span(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+    
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> None:
+        with self._lock:
+            self.tokens['prompt'] += prompt_tokens
+            self.tokens['completion'] += completion_tokens
+            self.tokens['cached'] += cached_tokens
+    
+    def server_timing(self) -> str:
+        """
+        Format the collected spans as a Server-Timing header value.
+        
+        Example: ``total;dur=2140.3, model_call;dur=1980.6;desc="2 calls, 5120 tokens, 3072 cached"``
+        """
+        entries = [f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}"]
+        with self._lock:
+            for stage, (seconds, count) in self.stages.items():
+                entry = f"{stage};dur={seconds * 1000:.1f}"
+                description = f"{count} calls" if count > 1 else ''
+                if stage == STAGE_MODEL_CALL and (self.tokens['prompt'] or self.tokens['completion']):
+                    token_text = f"{self.tokens['prompt'] + self.tokens['completion']} tokens"
+                    if self.tokens['cached']:
+                        token_text += f", {self.tokens['cached']} cached"
+                    description = f"{description}, {token_text}" if description else token_text
+                if description:
+                    entry += f';desc="{description}"'
+                entries.append(entry)
+        return ', '.join(entries)
+
+
+class MetricsRegistry:
+    """Process-wide request, stage and model usage metrics."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'claims_http_request_duration_seconds',
+            'Time spent handling HTTP requests.',
+            ('route', 'method', 'status')
+        )
+        self.stage_seconds = Histogram(
+            'claims_stage_duration_seconds',
+            'Time spent in each processing stage.',
+            ('route', 'stage')
+        )
+        self.stage_errors = Counter(
+            'claims_stage_errors_total',
+            'Stage spans that ended with an exception.',
+            ('route', 'stage')
+        )
+        self.model_tokens = Counter(
+            'claims_openai_tokens_total',
+            'Tokens reported in OpenAI responses.',
+            ('model', 'type')
+        )
+        self.route_prompt_tokens = Counter(
+            'claims_openai_prompt_tokens_total',
+            'Prompt tokens sent to OpenAI by route; type="cached" counts those served from the prompt prefix cache.',
+            ('route', 'type')
+        )
+        self.model_escalations = Counter(
+            'claims_model_escalations_total',
+            'Small-model calls redone on the large model, by task and reason (error or rejected output).',
+            ('task', 'reason')
+        )
+    
+    def observe_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.request_seconds.observe((route, method, str(status)), seconds)
+    
+    def observe_stage(self, route: str, stage: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.stage_seconds.observe((route, stage), seconds)
+            if failed:
+                self.stage_errors.inc((route, stage))
+    
+    def add_tokens(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0,
+                   route: str = BACKGROUND_ROUTE) -> None:
+        with self._lock:
+            self.model_tokens.inc((model, 'prompt'), prompt_tokens)
+            self.model_tokens.inc((model, 'completion'), completion_tokens)
+            self.route_prompt_tokens.inc((route, 'prompt'), prompt_tokens)
+            if cached_tokens:
+                self.model_tokens.inc((model, 'cached'), cached_tokens)
+                self.route_prompt_tokens.inc((route, 'cached'), cached_tokens)
+    
+    def add_escalation(self, task: str, reason: str) -> None:
+        with self._lock:
+            self.model_escalations.inc((task, reason))
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for metric in (self.request_seconds, self.stage_seconds, self.stage_errors, self.model_tokens,
+                           self.route_prompt_tokens, self.model_escalations):
+                lines.extend(metric.render())
+        lines.extend(_render_http_client_metrics())
+        return '\n'.join(lines) + '\n'
+
+
+def _render_http_client_metrics() -> List[str]:
+    """Outbound HTTP client counters, if the client has been used in this process."""
+    import sys
+    
+    http_service = sys.modules.get('app.services.http_service')
+    client = getattr(http_service, '_http_client', None)
+    if client is None:
+        return []
+    
+    snapshot = client.get_metrics()
+    requests_total = Counter('claims_outbound_http_requests_total', 'Outbound HTTP requests by host and status.', ('host', 'status'))
+    retries_total = Counter('claims_outbound_http_retries_total', 'Outbound HTTP retries by host.', ('host',))
+    seconds_total = Counter('claims_outbound_http_seconds_total', 'Time spent in outbound HTTP requests by host.', ('host',))
+    for host, stats in snapshot.items():
+        for status, count in stats['status_codes'].items():
+            requests_total.inc((host, status), count)
+        retries_total.inc((host,), stats['retries'])
+        seconds_total.inc((host,), stats['total_seconds'])
+    return requests_total.render() + retries_total.render() + seconds_total.render()
+
+
+# Global registry instance
+_registry = MetricsRegistry()
+
+# Timings of the request being handled in the current context
+_current_request: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get global metrics registry instance."""
+    return _registry
+
+
+def begin_request(route: str) -> RequestTimings:
+    """Start collecting spans for a request handled in the current context."""
+    timings = RequestTimings(route)
+    _current_request.set(timings)
+    return timings
+
+
+def end_request() -> Optional[RequestTimings]:
+    """Stop collecting spans for the current request and return what was collected."""
+    timings = _current_request.get()
+    _current_request.set(None)
+    return timings
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a block of work as one stage.
+    
+    Args:
+        stage: Stage name (one of the STAGE_* constants)
+    """
+    timings = _current_request.get()
+    route = timings.route if timings is not None else BACKGROUND_ROUTE
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _registry.observe_stage(route, stage, elapsed, failed)
+        if timings is not None:
+            timings.add_span(stage, elapsed)
+
+
+def record_token_usage(model: str, usage: Any) -> None:
+    """
+    Record the token usage reported in a chat completion response.
+    
+    Args:
+        model: Model the request was sent to
+        usage: The response's ``usage`` object (may be None)
+    """
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+    timings = _current_request.get()
+    route = timings.route if timings is not None else BACKGROUND_ROUTE
+    _registry.add_tokens(model, prompt_tokens, completion_tokens, cached_tokens, route)
+    if timings is not None:
+        timings.add_tokens(prompt_tokens, completion_tokens, cached_tokens)
+    if cached_tokens:
+        logger.debug("Prompt cache: %d of %d prompt tokens cached (%s)", cached_tokens, prompt_tokens, route)
@@ -0,0 +1,186 @@
+"""
+Model routing: send each task to a small or large model, escalating when
+the small model's answer is not good enough.
+
+Short, well-constrained tasks (classifying a document, drafting an email,
+summarizing, ordering a timeline) go to the small model by default. If it
+fails, returns output that does not match the task's schema, or reports
+low confidence, the call is repeated on the large model. Everything else
+goes straight to the large model.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+from app.config import Config
+from app.services.metrics_service import get_metrics_registry
+from app.services.openai_service import get_openai_service
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+TIER_SMALL = 'small'
+TIER_LARGE = 'large'
+TIERS = (TIER_SMALL, TIER_LARGE)
+
+# Task types (names used in MODEL_TIER_OVERRIDES)
+TASK_CLASSIFICATION = 'classification'
+TASK_EMAIL_DRAFT = 'email_draft'
+TASK_SUMMARY = 'summary'
+TASK_TIMELINE = 'timeline'
+TASK_FACT_EXTRACTION = 'fact_extraction'
+TASK_CONFLICT_DETECTION = 'conflict_detection'
+TASK_LIABILITY_SIGNALS = 'liability_signals'
+TASK_EVIDENCE_COMPLETENESS = 'evidence_completeness'
+TASK_RECOMMENDATION = 'recommendation'
+TASK_RATIONALE = 'rationale'
+TASK_ESCALATION = 'escalation'
+
+DEFAULT_TIERS = {
+    TASK_CLASSIFICATION: TIER_SMALL,
+    TASK_EMAIL_DRAFT: TIER_SMALL,
+    TASK_SUMMARY: TIER_SMALL,
+    TASK_TIMELINE: TIER_SMALL,
+    TASK_FACT_EXTRACTION: TIER_LARGE,
+    TASK_CONFLICT_DETECTION: TIER_LARGE,
+    TASK_LIABILITY_SIGNALS: TIER_LARGE,
+    TASK_EVIDENCE_COMPLETENESS: TIER_LARGE,
+    TASK_RECOMMENDATION: TIER_LARGE,
+    TASK_RATIONALE: TIER_LARGE,
+    TASK_ESCALATION: TIER_LARGE,
+}
+
+# Document types the classification prompt allows
+DOCUMENT_TYPES = frozenset({'fnol', 'claimant', 'other_driver', 'police', 'repair_estimate', 'policy', 'unknown'})
+
+_overrides_source: Optional[str] = None
+_overrides: Dict[str, str] = {}
+
+
+def _tier_overrides() -> Dict[str, str]:
+    """Parse MODEL_TIER_OVERRIDES ("summary=large,timeline=small"), re-reading it if it changed."""
+    global _overrides_source, _overrides
+    source = Config.MODEL_TIER_OVERRIDES
+    if source != _overrides_source:
+        overrides = {}
+        for item in filter(None, (part.strip() for part in source.split(','))):
+            task, _, tier = item.partition('=')
+            task, tier = task.strip(), tier.strip().lower()
+            if tier in TIERS:
+                overrides[task] = tier
+            else:
+                logger.warning("Ignoring MODEL_TIER_OVERRIDES entry %r: tier must be one of %s", item, ', '.join(TIERS))
+        _overrides, _overrides_source = overrides, source
+    return _overrides
+
+
+def tier_for(task: str) -> str:
+    """Tier a task runs on first (large for unknown tasks, and for every task when routing is off)."""
+    if not Config.MODEL_ROUTING_ENABLED:
+        return TIER_LARGE
+    return _tier_overrides().get(task) or DEFAULT_TIERS.get(task, TIER_LARGE)
+
+
+def model_for(task: str) -> str:
+    """Model a task is sent to first."""
+    return Config.OPENAI_SMALL_MODEL if tier_for(task) == TIER_SMALL else Config.OPENAI_MODEL
+
+
+def run_with_escalation(task: str, call: Callable[[str], T], accept: Optional[Callable[[T], bool]] = None) -> T:
+    """
+    Run a model call on the task's tier, retrying on the large model if needed.
+    
+    Args:
+        task: Task type (one of the TASK_* constants)
+        call: Makes the request given a model name and returns its result
+        accept: Returns False for a result that should be redone on the large model
+        
+    Returns:
+        The small model's result if it was accepted, otherwise the large model's
+        
+    Raises:
+        Whatever ``call`` raises on the large model
+    """
+    model = model_for(task)
+    if model == Config.OPENAI_MODEL:
+        return call(model)
+    
+    try:
+        result = call(model)
+    except Exception as e:
+        # Unparseable output, refusals and API errors (e.g. the small model is unavailable) alike
+        reason = 'error'
+        logger.info("Escalating %s from %s to %s after error: %s", task, model, Config.OPENAI_MODEL, e)
+    else:
+        if accept is None or accept(result):
+            return result
+        reason = 'rejected'
+        logger.info("Escalating %s from %s to %s: output failed validation", task, model, Config.OPENAI_MODEL)
+    
+    get_metrics_registry().add_escalation(task, reason)
+    return call(Config.OPENAI_MODEL)
+
+
+def call_json(task: str, system_prompt: Any, user_content: Union[str, List[Dict[str, Any]]],
+              accept: Optional[Callable[[Dict[str, Any]], bool]] = None, **kwargs: Any) -> Dict[str, Any]:
+    """OpenAIService.call_with_json_response, routed by task."""
+    service = get_openai_service()
+    return run_with_escalation(
+        task,
+        lambda model: service.call_with_json_response(system_prompt, user_content, model=model, **kwargs),
+        accept
+    )
+
+
+def call_text(task: str, system_prompt: Any, user_content: Union[str, List[Dict[str, Any]]],
+              accept: Optional[Callable[[str], bool]] = None, **kwargs: Any) -> str:
+    """OpenAIService.call_with_text_response, routed by task (empty replies are escalated)."""
+    service = get_openai_service()
+    return run_with_escalation(
+        task,
+        lambda model: service.call_with_text_response(system_prompt, user_content, model=model, **kwargs),
+        accept or accept_text
+    )
+
+
+def _confident(value: Any) -> bool:
+    try:
+        return float(value) >= Config.MODEL_ESCALATION_CONFIDENCE
+    except (TypeError, ValueError):
+        return False
+
+
+def accept_text(text: Any) -> bool:
+    """Accept any non-blank text reply."""
+    return isinstance(text, str) and bool(text.strip())
+
+
+def accept_classification(result: Any) -> bool:
+    """
+    Accept a classification with a known document type and enough confidence.
+    
+    The threshold applies to every answer: a low-confidence "unknown" or
+    not-relevant answer may be a real claim document the small model
+    misread, so it is escalated like any other uncertain classification.
+    """
+    return (isinstance(result, dict) and result.get('document_type') in DOCUMENT_TYPES
+            and isinstance(result.get('is_relevant'), bool) and _confident(result.get('confidence')))
+
+
+def accept_timeline(result: Any) -> bool:
+    """
+    Accept a timeline with at least one described event.
+    
+    Both timeline schemas are recognised ("events" with per-event confidence,
+    or "timeline"); if events carry a confidence, their average must reach
+    MODEL_ESCALATION_CONFIDENCE.
+    """
+    if not isinstance(result, dict):
+        return False
+    events = result.get('events', result.get('timeline'))
+    if not isinstance(events, list) or not events:
+        return False
+    if not all(isinstance(event, dict) and isinstance(event.get('description'), str) and event['description'].strip()
+               for event in events):
+        return False
+    confidences = [event['confidence'] for event in events if isinstance(event.get('confidence'), (int, float))]
+    return not confidences or _confident(sum(confidences) / len(confidences))
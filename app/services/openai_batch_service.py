@@ -0,0 +1,206 @@
+"""
+OpenAI Batch API backend: the OpenAIService interface, executed through batch jobs.
+
+Callers use BatchOpenAIService exactly like the interactive service; each
+call blocks its worker thread while the request waits in a shared collector.
+The collector packs requests from all workers into one JSONL file, submits
+it as a batch job, polls until it finishes and hands each result back to the
+thread that asked for it. Batch jobs cost half as much as synchronous calls
+and do not count against the interactive rate limits.
+"""
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from app.config import Config
+from app.services.openai_service import OpenAIService
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# Terminal batch states; an expired batch still has results for the requests it finished
+BATCH_DONE_STATES = ('completed', 'failed', 'expired', 'cancelled')
+
+# Request parameters that are client options, not part of the request body
+_CLIENT_ONLY_PARAMS = ('timeout',)
+
+
+class _PendingRequest:
+    """One chat completion request waiting for its batch."""
+    
+    __slots__ = ('custom_id', 'line', 'done', 'response', 'error')
+    
+    def __init__(self, body: Dict[str, Any]):
+        self.custom_id = uuid.uuid4().hex
+        self.line = json.dumps({
+            'custom_id': self.custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': body,
+        }, ensure_ascii=False) + '\n'
+        self.done = threading.Event()
+        self.response: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+    
+    def resolve(self, response: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        self.response, self.error = response, error
+        self.done.set()
+
+
+class OpenAIBatchCollector:
+    """Packs concurrent chat completion requests into Batch API jobs."""
+    
+    def __init__(
+        self,
+        client,
+        window_seconds: Optional[float] = None,
+        max_requests: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        """Initialize the collector; limits default to Config values."""
+        self.client = client
+        self.window_seconds = Config.OPENAI_BATCH_WINDOW_SECONDS if window_seconds is None else window_seconds
+        self.max_requests = max_requests or Config.OPENAI_BATCH_MAX_REQUESTS
+        self.max_bytes = max_bytes or Config.OPENAI_BATCH_MAX_BYTES
+        self.poll_interval = Config.OPENAI_BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        
+        self._lock = threading.Lock()
+        self._buffer: List[_PendingRequest] = []
+        self._buffer_bytes = 0
+        self._window_timer: Optional[threading.Timer] = None
+        self.stats = {'batches_submitted': 0, 'requests_submitted': 0, 'requests_failed': 0}
+    
+    def submit(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a chat completion request and wait for its result.
+        
+        Args:
+            body: Chat completion request body
+            
+        Returns:
+            Chat completion response body
+            
+        Raises:
+            ValueError: If the request or its batch failed
+        """
+        request = _PendingRequest(body)
+        size = len(request.line.encode('utf-8'))
+        if size > self.max_bytes:
+            raise ValueError(f'Request is too large for a batch file ({size} bytes)')
+        
+        with self._lock:
+            if self._buffer and self._buffer_bytes + size > self.max_bytes:
+                self._flush_locked()
+            self._buffer.append(request)
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.max_requests:
+                self._flush_locked()
+            elif self._window_timer is None:
+                # The window starts with the first request of a batch
+                self._window_timer = threading.Timer(self.window_seconds, self.flush)
+                self._window_timer.daemon = True
+                self._window_timer.start()
+        
+        request.done.wait()
+        if request.error:
+            raise ValueError(f'OpenAI batch request failed: {request.error}')
+        return request.response
+    
+    def flush(self) -> None:
+        """Submit whatever is buffered now instead of waiting for the window to close."""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self) -> None:
+        if self._window_timer is not None:
+            self._window_timer.cancel()
+            self._window_timer = None
+        if not self._buffer:
+            return
+        requests, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        threading.Thread(target=self._run_batch, args=(requests,), name='openai-batch', daemon=True).start()
+    
+    def _run_batch(self, requests: List[_PendingRequest]) -> None:
+        """Upload, submit and poll one batch, then resolve every request in it."""
+        by_id = {request.custom_id: request for request in requests}
+        try:
+            input_file = self.client.files.create(
+                file=('batch_input.jsonl', ''.join(request.line for request in requests).encode('utf-8')),
+                purpose='batch'
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=Config.OPENAI_BATCH_COMPLETION_WINDOW
+            )
+            with self._lock:
+                self.stats['batches_submitted'] += 1
+                self.stats['requests_submitted'] += len(requests)
+            logger.info(f"OpenAI batch {batch.id} submitted with {len(requests)} requests")
+            
+            while batch.status not in BATCH_DONE_STATES:
+                time.sleep(self.poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+            
+            logger.info(f"OpenAI batch {batch.id} finished: {batch.status}")
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    self._dispatch(self.client.files.content(file_id).text, by_id)
+            
+            reason = f'batch {batch.id} {batch.status}'
+            if batch.errors and batch.errors.data:
+                reason += f": {batch.errors.data[0].message}"
+            self._fail_remaining(by_id, reason)
+        except Exception as e:
+            logger.error(f"OpenAI batch submission failed: {str(e)}", exc_info=True)
+            self._fail_remaining(by_id, str(e))
+    
+    def _dispatch(self, content: str, by_id: Dict[str, _PendingRequest]) -> None:
+        """Resolve requests from an output or error file."""
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            request = by_id.pop(result.get('custom_id'), None)
+            if request is None:
+                continue
+            response = result.get('response') or {}
+            error = result.get('error')
+            if error or response.get('status_code') != 200:
+                body_error = (response.get('body') or {}).get('error') or {}
+                message = (error or body_error).get('message') or f"HTTP {response.get('status_code')}"
+                with self._lock:
+                    self.stats['requests_failed'] += 1
+                request.resolve(error=message)
+            else:
+                request.resolve(response=response['body'])
+    
+    def _fail_remaining(self, by_id: Dict[str, _PendingRequest], reason: str) -> None:
+        """Fail requests the batch returned no result for."""
+        if by_id:
+            with self._lock:
+                self.stats['requests_failed'] += len(by_id)
+        for request in by_id.values():
+            request.resolve(error=f'No result returned ({reason})')
+        by_id.clear()
+
+
+class BatchOpenAIService(OpenAIService):
+    """OpenAIService whose chat completions run through the Batch API."""
+    
+    def __init__(self, collector: Optional[OpenAIBatchCollector] = None):
+        """Initialize the client and the shared request collector."""
+        super().__init__()
+        self.collector = collector or (OpenAIBatchCollector(self.client) if self.client else None)
+    
+    def _create_completion(self, params: Dict[str, Any]):
+        """Submit one chat completion through the collector and wait for its batch."""
+        from openai.types.chat import ChatCompletion
+        
+        body = {key: value for key, value in params.items() if key not in _CLIENT_ONLY_PARAMS}
+        return ChatCompletion.model_validate(self.collector.submit(body))
@@ -4,11 +4,9 @@ PDF extraction service.
 import base64
 from io import BytesIO
 from typing import Dict, List
-import pdfplumber
-import PyPDF2
 from PIL import Image
 from app.config import Config
-from app.services.image_service import optimize_image
+from app.services.image_service import optimize_image_with_renditions, ImageDeduplicator
 
 
 def extract_pdf_content(pdf_path: str) -> Dict:
@@ -31,6 +29,14 @@ def extract_pdf_content(pdf_path: str) -> Dict:
         }
     }
     
+    # Parsers are imported on first use so registering routes stays cheap
+    import pdfplumber
+    import PyPDF2
+    
+    # Collapse repeated images (letterhead logos, the same photo on several pages)
+    # and drop rules/signatures so they do not use up the per-PDF image budget
+    deduplicator = ImageDeduplicator()
+    
     # Extract text and metadata using pdfplumber
     with pdfplumber.open(pdf_path) as pdf:
         result['metadata']['page_count'] = len(pdf.pages)
@@ -69,10 +75,15 @@ def extract_pdf_content(pdf_path: str) -> Dict:
                             # Try to get image as PIL Image using pdfplumber's to_image
                             try:
                                 # Use reduced DPI for memory efficiency
-                                pil_image = cropped.to_image(resolution=Config.IMAGE_DPI)
+                                pil_image = cropped.to_image(resolution=Config.IMAGE_DPI).original
                                 
-                                # Optimize image (resize, compress, convert to JPEG)
-                                img_bytes, mime_type = optimize_image(pil_image)
+                                skip, image_hash = deduplicator.should_skip(pil_image)
+                                if skip:
+                                    continue
+                                
+                                # Optimize image (resize, compress, convert to JPEG) and cache
+                                # thumbnail/viewer renditions from the same decode
+                                img_bytes, mime_type, final_size, rendition_urls = optimize_image_with_renditions(pil_image)
                                 
                                 if img_bytes and mime_type:
                                     # Convert to base64
@@ -80,7 +91,11 @@ def extract_pdf_content(pdf_path: str) -> Dict:
                                     images.append({
                                         'index': img_index,
                                         'data': f"data:{mime_type};base64,{image_base64}",
-                                        'ext': 'jpg'
+                                        'ext': 'jpg',
+                                        'phash': image_hash,
+                                        'width': final_size[0],
+                                        'height': final_size[1],
+                                        **rendition_urls
                                     })
                                     total_images_extracted += 1
                                     
@@ -152,7 +167,10 @@ def extract_pdf_content(pdf_path: str) -> Dict:
                                     try:
                                         img_buffer = BytesIO(data)
                                         pil_image = Image.open(img_buffer)
-                                        img_bytes, mime_type = optimize_image(pil_image)
+                                        skip, image_hash = deduplicator.should_skip(pil_image)
+                                        if skip:
+                                            continue
+                                        img_bytes, mime_type, final_size, rendition_urls = optimize_image_with_renditions(pil_image)
                                         
                                         if img_bytes and mime_type:
                                             # Convert to base64
@@ -164,7 +182,11 @@ def extract_pdf_content(pdf_path: str) -> Dict:
                                                 result['pages'][page_num]['images'].append({
                                                     'index': new_index,
                                                     'data': f"data:{mime_type};base64,{image_base64}",
-                                                    'ext': 'jpg'
+                                                    'ext': 'jpg',
+                                                    'phash': image_hash,
+                                                    'width': final_size[0],
+                                                    'height': final_size[1],
+                                                    **rendition_urls
                                                 })
                                                 total_images_extracted += 1
                                                 
@@ -211,6 +233,10 @@ def extract_pdf_content(pdf_path: str) -> Dict:
     except Exception as e:
         print(f"Error in PyPDF2 image extraction: {e}")
     
+    if deduplicator.duplicates_skipped or deduplicator.low_information_skipped:
+        print(f"Skipped {deduplicator.duplicates_skipped} duplicate and "
+              f"{deduplicator.low_information_skipped} low-information images in {pdf_path}")
+    
     return result
 
 
@@ -0,0 +1,301 @@
+"""
+Speculative precomputation of claim analyses.
+
+Once fact extraction and conflict detection have finished, the analyses
+the reviewer opens next (liability signals, evidence completeness, the
+timeline and the recommendation) only depend on the fact set. With
+PREFETCH_ENABLED, they are run in the background on a small low-priority
+pool and stored under a key derived from the request each endpoint will
+receive, which includes the fact-set hash. The analysis endpoints check
+this store before calling the model: a finished result is returned
+immediately, and one still running is waited for rather than started twice.
+
+Prefetches are scheduled per claim. Editing a claim's facts cancels the
+work queued for the old fact set and schedules it again for the new one.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import Config
+from app.services.analysis_cache_service import canonical_hash
+
+logger = logging.getLogger(__name__)
+
+SIGNALS_PATH = '/analyze-liability-signals'
+EVIDENCE_PATH = '/check-evidence-completeness'
+TIMELINE_PATH = '/generate-timeline'
+RECOMMENDATION_PATH = '/get-liability-recommendation'
+
+# Fact fields the analysis prompts read; display-only fields sent back by the UI are ignored
+_FACT_HASH_FIELDS = ('extracted_fact', 'source_text', 'category', 'source', 'confidence',
+                     'normalized_value', 'is_implied')
+
+
+def fact_set_hash(facts: Any) -> str:
+    """
+    Hash the prompt-relevant fields of a fact list, in order.
+    
+    Args:
+        facts: Fact dictionaries as returned by /extract-facts
+        
+    Returns:
+        SHA-256 hex digest
+    """
+    if not isinstance(facts, list):
+        return canonical_hash(facts)
+    return canonical_hash([
+        [fact.get(key) for key in _FACT_HASH_FIELDS] if isinstance(fact, dict) else fact
+        for fact in facts
+    ])
+
+
+def prefetch_key(path: str, payload: Any) -> str:
+    """Key a prefetched result by endpoint, fact-set hash and the rest of the request body."""
+    if not isinstance(payload, dict):
+        return canonical_hash([path, payload])
+    rest = {key: value for key, value in payload.items() if key != 'facts'}
+    return canonical_hash([path, fact_set_hash(payload.get('facts')), rest])
+
+
+class _Entry:
+    """One prefetched result, pending until its job gets to it."""
+    
+    __slots__ = ('future', 'created')
+    
+    def __init__(self):
+        self.future: Future = Future()
+        self.created = time.monotonic()
+    
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > Config.PREFETCH_TTL_SECONDS
+
+
+def _succeeded(future: Future) -> bool:
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+class _Job:
+    """The prefetches scheduled for one fact set of one claim."""
+    
+    def __init__(self, app, job_id: str, facts: List[Dict[str, Any]], files: Optional[List[Dict[str, Any]]]):
+        self.app = app
+        self.job_id = job_id
+        self.facts = facts
+        self.files = files
+        self.cancelled = threading.Event()
+        self.entries: Dict[str, Tuple[str, _Entry]] = {}  # path -> (key, entry)
+
+
+class PrefetchService:
+    """Background analysis runs and their results, keyed by request."""
+    
+    def __init__(self, workers: Optional[int] = None, max_entries: Optional[int] = None):
+        self.workers = workers or Config.PREFETCH_WORKERS
+        self.max_entries = max_entries or Config.PREFETCH_MAX_ENTRIES
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='prefetch')
+        return self._executor
+    
+    def schedule(self, app, job_id: str, facts: List[Dict[str, Any]],
+                 files: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Prefetch the analyses for a fact set, replacing any job for the same claim.
+        
+        Args:
+            app: Flask application whose analysis views are run
+            job_id: Claim ID (or any stable ID for the fact set)
+            facts: Finalized facts, as sent back by the UI
+            files: Uploaded files for the evidence check; if omitted, the
+                previous job's files are reused (facts edits do not resend them)
+        """
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            if files is None and previous is not None:
+                files = previous.files
+            job = _Job(app, job_id, facts, files)
+            self._jobs[job_id] = job
+        if previous is not None:
+            self._cancel_job(previous)
+        
+        self._add_entry(job, SIGNALS_PATH, {'facts': facts})
+        if files:
+            self._add_entry(job, EVIDENCE_PATH, {'files': files})
+        self._add_entry(job, TIMELINE_PATH, {'facts': facts})
+        # Its key depends on the signals, so the recommendation entry is added once they are known
+        
+        logger.info("Scheduled prefetch for %s (%d facts)", job_id, len(facts))
+        self._get_executor().submit(self._run_job, job)
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel the prefetches for a claim.
+        
+        Analyses not yet started are skipped and their entries dropped; a
+        model call already in flight runs to completion but its result is
+        discarded. Returns True if there was a job to cancel.
+        """
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return False
+        self._cancel_job(job)
+        return True
+    
+    def lookup(self, path: str, payload: Any) -> Optional[Dict[str, Any]]:
+        """
+        Return the prefetched result for a request, if there is a valid one.
+        
+        A result still being computed is waited for up to
+        PREFETCH_WAIT_SECONDS; one whose job has not reached it yet is
+        cancelled so the request computes it instead.
+        """
+        key = prefetch_key(path, payload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expired():
+                del self._entries[key]
+                entry = None
+        if entry is None:
+            return None
+        
+        future = entry.future
+        if not future.done() and not future.running():
+            if future.cancel():
+                self._drop(key, entry)
+                return None
+        try:
+            result = future.result(timeout=Config.PREFETCH_WAIT_SECONDS)
+        except (CancelledError, FutureTimeoutError):
+            return None
+        except Exception:
+            # The analysis failed in the background; let the request retry it
+            self._drop(key, entry)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return result
+    
+    def _add_entry(self, job: _Job, path: str, payload: Dict[str, Any]) -> None:
+        key = prefetch_key(path, payload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.expired() and _succeeded(entry.future):
+                # Same request already prefetched (e.g. the evidence check after a facts edit)
+                self._entries.move_to_end(key)
+            else:
+                entry = self._entries[key] = _Entry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        job.entries[path] = (key, entry)
+    
+    def _drop(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+    
+    def _cancel_job(self, job: _Job) -> None:
+        job.cancelled.set()
+        for key, entry in list(job.entries.values()):
+            if entry.future.cancel() or not entry.future.done():
+                self._drop(key, entry)
+        logger.info("Cancelled prefetch for %s", job.job_id)
+    
+    def _run_job(self, job: _Job) -> None:
+        if job.cancelled.is_set():
+            return
+        
+        signals = self._run_entry(job, SIGNALS_PATH, {'facts': job.facts})
+        if job.files:
+            self._run_entry(job, EVIDENCE_PATH, {'files': job.files})
+        self._run_entry(job, TIMELINE_PATH, {'facts': job.facts})
+        
+        if signals is not None and not job.cancelled.is_set():
+            payload = {'facts': job.facts, 'signals': signals.get('signals', [])}
+            self._add_entry(job, RECOMMENDATION_PATH, payload)
+            self._run_entry(job, RECOMMENDATION_PATH, payload)
+    
+    def _run_entry(self, job: _Job, path: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if path not in job.entries or job.cancelled.is_set():
+            return None
+        _, entry = job.entries[path]
+        if _succeeded(entry.future):
+            # Reused from an earlier job for the same request
+            return entry.future.result()
+        if not entry.future.set_running_or_notify_cancel():
+            # Cancelled, or taken over by a request that arrived first
+            return None
+        try:
+            result = _run_view(job.app, path, payload)
+        except Exception as e:
+            logger.warning("Prefetch of %s for %s failed: %s", path, job.job_id, e)
+            entry.future.set_exception(e)
+            return None
+        if job.cancelled.is_set():
+            # Facts changed while the model was running; the result is for the old fact set
+            entry.future.set_exception(CancelledError())
+            return None
+        entry.future.set_result(result)
+        return result
+
+
+def _run_view(app, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run an analysis view for a request body outside of any request.
+    
+    The view's conditional_analysis wrapper is skipped, so it neither waits
+    on its own prefetch entry nor stores the result in the analysis cache.
+    
+    Raises:
+        ValueError: If the view does not return a successful JSON response
+    """
+    endpoint, view_args = app.url_map.bind('localhost').match(path, method='POST')
+    view = app.view_functions[endpoint]
+    view = getattr(view, '__wrapped__', view)
+    with app.test_request_context(path, method='POST', json=payload):
+        response = app.make_response(view(**view_args))
+        if response.status_code != 200 or not response.is_json:
+            raise ValueError(f"{path} returned {response.status_code}")
+        return response.get_json()
+
+
+def schedule_prefetch(job_id: Optional[str], facts: Any, files: Optional[List[Dict[str, Any]]] = None) -> None:
+    """
+    Prefetch the analyses for finalized facts, if PREFETCH_ENABLED.
+    
+    Call from a request handler; without a claim ID the fact-set hash
+    identifies the job, so it cannot be cancelled by a later facts edit.
+    """
+    if not Config.PREFETCH_ENABLED or not isinstance(facts, list) or not facts:
+        return
+    from flask import current_app
+    try:
+        get_prefetch_service().schedule(current_app._get_current_object(), job_id or fact_set_hash(facts), facts, files)
+    except Exception as e:
+        # Prefetching is an optimization; never fail the request over it
+        logger.warning("Could not schedule prefetch: %s", e)
+
+
+# Global service instance
+_prefetch_service: Optional[PrefetchService] = None
+_prefetch_service_lock = threading.Lock()
+
+
+def get_prefetch_service() -> PrefetchService:
+    """Get global prefetch service instance."""
+    global _prefetch_service
+    if _prefetch_service is None:
+        with _prefetch_service_lock:
+            if _prefetch_service is None:
+                _prefetch_service = PrefetchService()
+    return _prefetch_service
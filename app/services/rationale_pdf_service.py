@@ -0,0 +1,454 @@
+"""
+Claim rationale PDF rendering with cached styles, a content-addressed render cache and bulk export.
+
+Rendered PDFs hold claim details, so the render cache is kept small: PDFs
+unused for PDF_CACHE_MAX_AGE seconds are deleted, and the least recently used
+are evicted once the cache grows past PDF_CACHE_MAX_MB.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import Config
+
+# Bump when the layout changes so cached PDFs are re-rendered
+RENDER_VERSION = 1
+
+# Document layout: (rationale key, heading, kind, space after section)
+SECTION_LAYOUT = (
+    ('incident_summary', 'Incident Summary', 'text', True),
+    ('evidence_overview', 'Evidence Overview', 'evidence', True),
+    ('liability_assessment_logic', 'Liability Assessment Logic', 'text', True),
+    ('key_evidence', 'Key Evidence Supporting Assessment', 'list', True),
+    ('open_questions', 'Open Questions / Follow-Up', 'list', True),
+    ('coverage_considerations', 'Coverage Considerations', 'text', True),
+    ('recommendation', 'Recommendation', 'text', False),
+)
+
+# Sub-fields of evidence_overview, in display order
+EVIDENCE_FIELDS = (
+    ('narratives', 'Narratives'),
+    ('photos', 'Photos'),
+)
+
+# Page setup in points (72 per inch)
+PAGE_MARGINS = {'rightMargin': 72, 'leftMargin': 72, 'topMargin': 72, 'bottomMargin': 18}
+
+# Files this service writes to the PDF cache folder (which may fall back to /tmp)
+_CACHE_FILE_PATTERN = re.compile(r'^[0-9a-f]{64}\.pdf$')
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def compute_rationale_hash(rationale: Dict[str, Any]) -> str:
+    """Return the render cache key: SHA-256 of the canonical rationale JSON and layout version."""
+    canonical = json.dumps(rationale, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{RENDER_VERSION}:{canonical}".encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _get_styles() -> Dict[str, Any]:
+    """
+    Build the paragraph styles once per process.
+    
+    reportlab is imported here rather than at module load so the app starts
+    without it.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
+    
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor='#333333',
+            spaceAfter=12,
+            alignment=TA_LEFT
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor='#333333',
+            spaceAfter=10,
+            spaceBefore=12,
+            alignment=TA_LEFT
+        ),
+        'normal': ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor='#333333',
+            spaceAfter=8,
+            alignment=TA_JUSTIFY,
+            leading=14
+        ),
+    }
+
+
+def _to_markup(text: Any) -> Optional[str]:
+    """
+    Convert a rationale value to escaped Paragraph markup.
+    
+    HTML is converted to plain text (html2text is only loaded when a value
+    actually contains markup).
+    
+    Returns:
+        Escaped text, or None if the value is empty
+    """
+    if not text:
+        return None
+    text_str = str(text).strip()
+    if not text_str:
+        return None
+    if '<' in text_str or '>' in text_str:
+        import html2text
+        converter = html2text.HTML2Text()
+        converter.ignore_links = True
+        converter.body_width = 0
+        text_str = converter.handle(text_str).strip()
+    # Escape XML special characters for ReportLab
+    return text_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def build_rationale_flowables(rationale: Dict[str, Any]) -> Optional[List[Any]]:
+    """
+    Lay out a rationale as reportlab flowables.
+    
+    Args:
+        rationale: Rationale dictionary from /generate-claim-rationale
+        
+    Returns:
+        List of flowables, or None if the rationale has no printable content
+    """
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer
+    
+    styles = _get_styles()
+    section_gap = 0.15 * inch
+    
+    def paragraph(text, style):
+        markup = _to_markup(text)
+        if not markup:
+            return None
+        try:
+            return Paragraph(markup, styles[style])
+        except Exception as e:
+            print(f"Error creating paragraph: {e}")
+            return None
+    
+    elements = [Paragraph("Claim File Rationale", styles['title']), Spacer(1, 0.2 * inch)]
+    has_content = False
+    
+    for key, heading, kind, space_after in SECTION_LAYOUT:
+        value = rationale.get(key)
+        if not value:
+            continue
+        
+        section = []
+        if kind == 'text':
+            para = paragraph(value, 'normal')
+            if para:
+                section.append(para)
+        elif kind == 'evidence' and isinstance(value, dict):
+            for field, label in EVIDENCE_FIELDS:
+                para = paragraph(value.get(field), 'normal')
+                if para:
+                    section.append(Paragraph(f"<b>{label}:</b>", styles['normal']))
+                    section.append(para)
+        elif kind == 'list' and isinstance(value, list):
+            for item in value:
+                markup = _to_markup(item)
+                if markup:
+                    section.append(Paragraph(f"• {markup}", styles['normal']))
+        
+        # List sections keep their heading even if every item was blank, as before
+        if not section and kind != 'list':
+            continue
+        elements.append(Paragraph(heading, styles['heading']))
+        elements.extend(section)
+        if space_after:
+            elements.append(Spacer(1, section_gap))
+        has_content = True
+    
+    return elements if has_content else None
+
+
+def render_rationale_pdf(rationale: Dict[str, Any], output) -> None:
+    """
+    Render a rationale PDF.
+    
+    Args:
+        rationale: Rationale dictionary
+        output: File path or binary file object to write the PDF to
+        
+    Raises:
+        ValueError: If the rationale has no printable content
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+    
+    elements = build_rationale_flowables(rationale)
+    if not elements:
+        raise ValueError('No content available to generate PDF.')
+    
+    doc = SimpleDocTemplate(output, pagesize=letter, **PAGE_MARGINS)
+    doc.build(elements)
+
+
+def get_rationale_pdf(rationale: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Get a rendered rationale PDF, rendering it only if this content has not been rendered before.
+    
+    The PDF is written straight to the cache folder, so callers can stream it
+    from disk instead of holding it in memory.
+    
+    Args:
+        rationale: Rationale dictionary
+        
+    Returns:
+        Tuple of (pdf_path, content_hash)
+        
+    Raises:
+        ValueError: If the rationale has no printable content
+    """
+    content_hash = compute_rationale_hash(rationale)
+    pdf_path = os.path.join(Config.get_pdf_cache_folder(), f"{content_hash}.pdf")
+    if os.path.exists(pdf_path):
+        try:
+            # The modification time doubles as the last use for eviction
+            os.utime(pdf_path)
+            _maybe_prune()
+            return pdf_path, content_hash
+        except OSError:
+            pass  # Evicted in the meantime; render it again
+    
+    tmp_path = f"{pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        render_rationale_pdf(rationale, tmp_path)
+        os.replace(tmp_path, pdf_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _maybe_prune()
+    return pdf_path, content_hash
+
+
+def prune_pdf_cache(max_bytes: Optional[int] = None, max_age: Optional[float] = None) -> int:
+    """
+    Delete expired PDFs, then evict least recently used ones until the cache fits its size limit.
+    
+    Only files written by this service are counted or removed.
+    
+    Args:
+        max_bytes: Size limit; defaults to PDF_CACHE_MAX_MB
+        max_age: Seconds a PDF may go unused; defaults to PDF_CACHE_MAX_AGE
+        
+    Returns:
+        Number of PDFs removed
+    """
+    if max_bytes is None:
+        max_bytes = int(Config.PDF_CACHE_MAX_MB * 1024 * 1024)
+    if max_age is None:
+        max_age = Config.PDF_CACHE_MAX_AGE
+    cutoff = time.time() - max_age
+    
+    entries = []
+    try:
+        with os.scandir(Config.get_pdf_cache_folder()) as scan:
+            for item in scan:
+                if _CACHE_FILE_PATTERN.match(item.name) and item.is_file():
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+    except OSError as e:
+        print(f"Warning: Could not scan PDF cache: {str(e)}")
+        return 0
+    
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for used, size, path in sorted(entries):
+        if used >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def _maybe_prune() -> None:
+    """Prune after renders, at most once per PDF_CACHE_PRUNE_INTERVAL seconds per process."""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < Config.PDF_CACHE_PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        prune_pdf_cache()
+    finally:
+        _prune_lock.release()
+
+
+# Bulk export: rendering runs in worker processes (reportlab layout is CPU-bound)
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _render_export_item(rationale: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Render one rationale for a bulk export (runs in a worker process).
+    
+    Returns:
+        Tuple of (pdf_path, error); exactly one is set
+    """
+    try:
+        pdf_path, _ = get_rationale_pdf(rationale)
+        return pdf_path, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _get_export_pool():
+    """Get the shared render process pool, or None to render in this process."""
+    global _export_pool
+    if Config.PDF_EXPORT_WORKERS <= 0:
+        return None
+    if _export_pool is None:
+        with _export_pool_lock:
+            if _export_pool is None:
+                try:
+                    # spawn: forking a threaded web worker (outbox sender, HTTP pool) is unsafe
+                    context = multiprocessing.get_context('spawn')
+                    _export_pool = ProcessPoolExecutor(max_workers=Config.PDF_EXPORT_WORKERS, mp_context=context)
+                except (OSError, NotImplementedError) as e:
+                    # Some serverless runtimes do not allow worker processes
+                    print(f"Warning: Could not start PDF export pool, rendering in-process: {str(e)}")
+                    return None
+    return _export_pool
+
+
+def _reset_export_pool(pool) -> None:
+    """Discard a broken export pool."""
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is pool:
+            _export_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _export_filename(item: Dict[str, Any], index: int, used: set) -> str:
+    """Build a unique, filesystem-safe PDF name for an export entry."""
+    claim_id = _UNSAFE_FILENAME_CHARS.sub('_', str(item.get('claim_id') or '')).strip('._')
+    base = f"claim_rationale_{claim_id}" if claim_id else f"claim_rationale_{index + 1}"
+    name = f"{base}.pdf"
+    suffix = 2
+    while name in used:
+        name = f"{base}_{suffix}.pdf"
+        suffix += 1
+    used.add(name)
+    return name
+
+
+class _ZipStream:
+    """Write-only file object that collects zip output until it is drained."""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_rationale_export(items: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Render many rationales and stream them back as a ZIP of PDFs.
+    
+    PDFs are added in the order they finish. At most
+    PDF_EXPORT_MAX_IN_FLIGHT renders are outstanding at once and each PDF is
+    copied from the render cache in chunks, so memory stays flat however large
+    the batch is. Failed entries are listed in errors.txt at the end.
+    
+    Args:
+        items: Dictionaries with 'rationale' and optional 'claim_id'
+        
+    Yields:
+        ZIP file bytes
+    """
+    pool = _get_export_pool()
+    stream = _ZipStream()
+    used_names: set = set()
+    errors: List[str] = []
+    
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        
+        def add_result(index, pdf_path, error):
+            name = _export_filename(items[index], index, used_names)
+            if error:
+                errors.append(f"{name}: {error}")
+                return
+            with open(pdf_path, 'rb') as source, archive.open(name, mode='w') as dest:
+                for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    yield stream.drain()
+            yield stream.drain()
+        
+        remaining = set(range(len(items)))
+        if pool is not None:
+            pending = {}
+            next_index = 0
+            try:
+                while next_index < len(items) or pending:
+                    while next_index < len(items) and len(pending) < Config.PDF_EXPORT_MAX_IN_FLIGHT:
+                        future = pool.submit(_render_export_item, items[next_index].get('rationale') or {})
+                        pending[future] = next_index
+                        next_index += 1
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = pending.pop(future)
+                        pdf_path, error = future.result()
+                        remaining.discard(index)
+                        yield from add_result(index, pdf_path, error)
+            except BrokenProcessPool as e:
+                # A worker died; drop the pool so the next export starts a fresh one
+                print(f"Warning: PDF export pool failed, finishing in-process: {str(e)}")
+                _reset_export_pool(pool)
+        
+        # In-process rendering (no pool, or whatever the pool did not finish)
+        for index in sorted(remaining):
+            pdf_path, error = _render_export_item(items[index].get('rationale') or {})
+            yield from add_result(index, pdf_path, error)
+        
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield stream.drain()
@@ -0,0 +1,216 @@
+"""
+Rationale store: versioned, append-only claim rationales in SQLite.
+"""
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import Config
+
+# Claim IDs are client-generated; keep them to URL- and filename-safe characters
+CLAIM_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+# Where a version came from
+SOURCE_GENERATED = 'generated'
+SOURCE_EDITED = 'edited'
+
+# Display-only fields rebuilt from the uploaded files on every generation; not versioned
+TRANSIENT_FIELDS = ('images',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rationale_versions (
+    claim_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    rationale_json TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (claim_id, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS claims (
+    claim_id TEXT PRIMARY KEY,
+    latest_version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS rationale_versions_no_update
+BEFORE UPDATE ON rationale_versions
+BEGIN
+    SELECT RAISE(ABORT, 'rationale versions are append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS rationale_versions_no_delete
+BEFORE DELETE ON rationale_versions
+BEGIN
+    SELECT RAISE(ABORT, 'rationale versions are append-only');
+END;
+"""
+
+
+def is_valid_claim_id(claim_id: Any) -> bool:
+    """Check that a claim ID is a short, URL-safe string."""
+    return isinstance(claim_id, str) and bool(CLAIM_ID_PATTERN.match(claim_id))
+
+
+def serialize_rationale(rationale: Dict[str, Any]) -> str:
+    """
+    Serialize a rationale canonically.
+    
+    Sorted keys and one field per line make consecutive versions diff cleanly
+    with any line-based diff tool. TRANSIENT_FIELDS are dropped.
+    """
+    rationale = {key: value for key, value in rationale.items() if key not in TRANSIENT_FIELDS}
+    return json.dumps(rationale, sort_keys=True, indent=2, ensure_ascii=False, default=str)
+
+
+def _changed_fields(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> List[str]:
+    """List top-level fields that differ between two versions."""
+    if previous is None:
+        return sorted(current.keys())
+    keys = set(previous.keys()) | set(current.keys())
+    return sorted(key for key in keys if previous.get(key) != current.get(key))
+
+
+def _version_record(row: sqlite3.Row, include_rationale: bool = True) -> Dict[str, Any]:
+    """Convert a stored version row to an API record."""
+    record = {
+        'claim_id': row['claim_id'],
+        'version': row['version'],
+        'content_hash': row['content_hash'],
+        'source': row['source'],
+        'created_at': datetime.fromtimestamp(row['created_at']).isoformat(),
+    }
+    if include_rationale:
+        record['rationale'] = json.loads(row['rationale_json'])
+    return record
+
+
+class RationaleStore:
+    """Append-only store of rationale versions per claim."""
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """Initialize the store database (created on first use)."""
+        self.db_path = db_path or Config.get_rationale_db_path()
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; WAL keeps reads from blocking behind saves."""
+        conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def append(self, claim_id: str, rationale: Dict[str, Any], source: str = SOURCE_EDITED) -> Dict[str, Any]:
+        """
+        Append a new version of a claim's rationale.
+        
+        Saving content identical to the latest version does not create a new
+        version, so repeated saves are idempotent.
+        
+        Args:
+            claim_id: Claim identifier
+            rationale: Rationale dictionary
+            source: SOURCE_GENERATED or SOURCE_EDITED
+            
+        Returns:
+            Version record (without the rationale body) plus 'created' flag
+        """
+        rationale_json = serialize_rationale(rationale)
+        content_hash = hashlib.sha256(rationale_json.encode('utf-8')).hexdigest()
+        now = time.time()
+        
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                head = conn.execute(
+                    'SELECT v.* FROM claims c JOIN rationale_versions v '
+                    'ON v.claim_id = c.claim_id AND v.version = c.latest_version WHERE c.claim_id = ?',
+                    (claim_id,)
+                ).fetchone()
+                if head is not None and head['content_hash'] == content_hash:
+                    return {**_version_record(head, include_rationale=False), 'created': False}
+                
+                version = (head['version'] + 1) if head is not None else 1
+                conn.execute(
+                    'INSERT INTO rationale_versions (claim_id, version, content_hash, rationale_json, source, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (claim_id, version, content_hash, rationale_json, source, now)
+                )
+                conn.execute(
+                    'INSERT INTO claims (claim_id, latest_version, updated_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(claim_id) DO UPDATE SET latest_version = excluded.latest_version, '
+                    'updated_at = excluded.updated_at',
+                    (claim_id, version, now)
+                )
+        
+        return {
+            'claim_id': claim_id,
+            'version': version,
+            'content_hash': content_hash,
+            'source': source,
+            'created_at': datetime.fromtimestamp(now).isoformat(),
+            'created': True,
+        }
+    
+    def get_latest(self, claim_id: str) -> Optional[Dict[str, Any]]:
+        """Get the latest version of a claim's rationale (two primary-key lookups), or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT v.* FROM claims c JOIN rationale_versions v '
+                'ON v.claim_id = c.claim_id AND v.version = c.latest_version WHERE c.claim_id = ?',
+                (claim_id,)
+            ).fetchone()
+        return _version_record(row) if row is not None else None
+    
+    def get_version(self, claim_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Get one specific version of a claim's rationale, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT * FROM rationale_versions WHERE claim_id = ? AND version = ?',
+                (claim_id, version)
+            ).fetchone()
+        return _version_record(row) if row is not None else None
+    
+    def get_history(self, claim_id: str) -> List[Dict[str, Any]]:
+        """
+        Get every version of a claim's rationale, oldest first.
+        
+        Each entry lists the top-level fields changed from the previous
+        version; fetch a version to get its canonical JSON for a full diff.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT * FROM rationale_versions WHERE claim_id = ? ORDER BY version',
+                (claim_id,)
+            ).fetchall()
+        
+        history = []
+        previous = None
+        for row in rows:
+            current = json.loads(row['rationale_json'])
+            history.append({
+                **_version_record(row, include_rationale=False),
+                'changed_fields': _changed_fields(previous, current),
+            })
+            previous = current
+        return history
+
+
+# Global rationale store instance
+_rationale_store: Optional[RationaleStore] = None
+_rationale_store_lock = threading.Lock()
+
+
+def get_rationale_store() -> RationaleStore:
+    """Get global rationale store instance."""
+    global _rationale_store
+    if _rationale_store is None:
+        with _rationale_store_lock:
+            if _rationale_store is None:
+                _rationale_store = RationaleStore()
+    return _rationale_store
@@ -0,0 +1,257 @@
+"""
+Image rendition service: thumbnail, viewer and model tiers cached by content hash.
+
+Cache keys cover the rendition settings as well as the content, so changing
+tier sizes or quality re-renders instead of serving old files. The cache is
+kept under IMAGE_CACHE_MAX_MB by evicting the least recently used images.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+from PIL import Image
+from app.config import Config
+
+# Tiers served to the browser; the model tier is also returned inline as a data URL
+RENDITION_TIERS = ('thumbnail', 'viewer', 'model')
+
+# JPEG quality for browser-only tiers (thumbnails tolerate more compression)
+RENDITION_QUALITY = {
+    'thumbnail': 75,
+    'viewer': 82,
+}
+
+# Bump when rendition encoding changes in a way the settings in the key do not capture
+RENDITION_VERSION = 1
+
+_CONTENT_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Files this service writes to the cache folder (which may fall back to /tmp)
+_CACHE_FILE_PATTERN = re.compile(r'^([0-9a-f]{64})(?:_(?:thumbnail|viewer|model)\.jpg|\.json)$')
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _rendition_settings() -> bytes:
+    """Settings that shape the cached files, hashed into every cache key."""
+    settings = (
+        RENDITION_VERSION,
+        Config.MAX_IMAGE_DIMENSION,
+        Config.JPEG_QUALITY,
+        Config.MAX_IMAGE_SIZE_BYTES,
+        Config.VIEWER_IMAGE_DIMENSION,
+        Config.THUMBNAIL_DIMENSION,
+        sorted(RENDITION_QUALITY.items()),
+    )
+    return f"{settings!r}\n".encode('utf-8')
+
+
+def compute_content_hash(data: bytes) -> str:
+    """Return the rendition cache key: SHA-256 of the rendition settings and the content."""
+    digest = hashlib.sha256(_rendition_settings())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def compute_file_hash(file_path: str) -> str:
+    """Return the rendition cache key of a file, read in chunks."""
+    digest = hashlib.sha256(_rendition_settings())
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_rendition_path(content_hash: str, tier: str) -> Optional[str]:
+    """
+    Get the cache path of a rendition.
+    
+    Args:
+        content_hash: SHA-256 hex digest of the source content
+        tier: One of RENDITION_TIERS
+        
+    Returns:
+        File path, or None if the hash or tier is invalid
+    """
+    if tier not in RENDITION_TIERS or not _CONTENT_HASH_PATTERN.match(content_hash or ''):
+        return None
+    return os.path.join(Config.get_image_cache_folder(), f"{content_hash}_{tier}.jpg")
+
+
+def get_rendition_urls(content_hash: str) -> Dict[str, str]:
+    """Get browser URLs for the thumbnail and viewer tiers."""
+    return {
+        'thumbnail_url': f"/images/{content_hash}/thumbnail.jpg",
+        'viewer_url': f"/images/{content_hash}/viewer.jpg",
+    }
+
+
+def mark_used(path: str) -> None:
+    """Refresh a cached file's modification time, which eviction treats as its last use."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_rendition_cache(max_bytes: Optional[int] = None) -> int:
+    """
+    Evict least recently used images until the cache fits its size limit.
+    
+    An image's renditions and record are evicted together, ordered by the
+    newest modification time among them. Only files written by this service
+    are counted or removed.
+    
+    Args:
+        max_bytes: Size limit; defaults to IMAGE_CACHE_MAX_MB
+        
+    Returns:
+        Number of images evicted
+    """
+    if max_bytes is None:
+        max_bytes = int(Config.IMAGE_CACHE_MAX_MB * 1024 * 1024)
+    cache_folder = Config.get_image_cache_folder()
+    
+    entries: Dict[str, Dict] = {}
+    total = 0
+    try:
+        with os.scandir(cache_folder) as scan:
+            for item in scan:
+                match = _CACHE_FILE_PATTERN.match(item.name)
+                if not match or not item.is_file():
+                    continue
+                stat = item.stat()
+                entry = entries.setdefault(match.group(1), {'paths': [], 'size': 0, 'used': 0.0})
+                entry['paths'].append(item.path)
+                entry['size'] += stat.st_size
+                entry['used'] = max(entry['used'], stat.st_mtime)
+                total += stat.st_size
+    except OSError as e:
+        print(f"Warning: Could not scan image cache: {str(e)}")
+        return 0
+    
+    evicted = 0
+    for entry in sorted(entries.values(), key=lambda item: item['used']):
+        if total <= max_bytes:
+            break
+        for path in entry['paths']:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= entry['size']
+        evicted += 1
+    return evicted
+
+
+def _maybe_prune() -> None:
+    """Prune after writes, at most once per IMAGE_CACHE_PRUNE_INTERVAL seconds per process."""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < Config.IMAGE_CACHE_PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        prune_rendition_cache()
+    finally:
+        _prune_lock.release()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write bytes via a temporary file so readers never see a partial image."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encode_tier(pil_image: Image.Image, dimension: int, quality: int) -> Tuple[Image.Image, bytes]:
+    """Downscale (never upscale) to the tier dimension and encode as JPEG."""
+    tier_image = pil_image
+    if max(pil_image.size) > dimension:
+        tier_image = pil_image.copy()
+        tier_image.thumbnail((dimension, dimension), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    tier_image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return tier_image, buffer.getvalue()
+
+
+def store_renditions(pil_image: Image.Image, model_bytes: bytes, content_hash: str) -> Dict[str, str]:
+    """
+    Write all rendition tiers for an image that has already been decoded once.
+    
+    The viewer tier is derived from the model-tier image and the thumbnail from
+    the viewer tier, so no tier requires a second decode of the source.
+    
+    Args:
+        pil_image: RGB image at model-tier dimensions
+        model_bytes: Encoded model-tier JPEG
+        content_hash: Cache key for the source content
+        
+    Returns:
+        Dictionary of rendition URLs
+    """
+    try:
+        model_path = get_rendition_path(content_hash, 'model')
+        if not os.path.exists(model_path):
+            _write_atomic(model_path, model_bytes)
+        
+        viewer_path = get_rendition_path(content_hash, 'viewer')
+        thumbnail_path = get_rendition_path(content_hash, 'thumbnail')
+        if not (os.path.exists(viewer_path) and os.path.exists(thumbnail_path)):
+            if max(pil_image.size) <= Config.VIEWER_IMAGE_DIMENSION:
+                viewer_image, viewer_bytes = pil_image, model_bytes
+            else:
+                viewer_image, viewer_bytes = _encode_tier(
+                    pil_image, Config.VIEWER_IMAGE_DIMENSION, RENDITION_QUALITY['viewer']
+                )
+            _write_atomic(viewer_path, viewer_bytes)
+            
+            _, thumbnail_bytes = _encode_tier(
+                viewer_image, Config.THUMBNAIL_DIMENSION, RENDITION_QUALITY['thumbnail']
+            )
+            _write_atomic(thumbnail_path, thumbnail_bytes)
+    except OSError as e:
+        # Renditions are an optimization; the inline model image still works
+        print(f"Warning: Could not cache image renditions: {str(e)}")
+        return {}
+    
+    _maybe_prune()
+    return get_rendition_urls(content_hash)
+
+
+def load_image_record(content_hash: str) -> Optional[Dict]:
+    """
+    Load a cached extraction record (dimensions, hashes) and its model-tier bytes.
+    
+    Returns:
+        Record dictionary with 'model_bytes' added, or None on a cache miss
+    """
+    model_path = get_rendition_path(content_hash, 'model')
+    if not model_path:
+        return None
+    record_path = os.path.join(Config.get_image_cache_folder(), f"{content_hash}.json")
+    try:
+        with open(record_path, 'r') as file:
+            record = json.load(file)
+        with open(model_path, 'rb') as file:
+            record['model_bytes'] = file.read()
+        mark_used(record_path)
+        return record
+    except (OSError, ValueError):
+        return None
+
+
+def save_image_record(content_hash: str, record: Dict) -> None:
+    """Save the extraction record for an image so re-uploads skip decoding."""
+    record_path = os.path.join(Config.get_image_cache_folder(), f"{content_hash}.json")
+    try:
+        _write_atomic(record_path, json.dumps(record).encode('utf-8'))
+    except OSError as e:
+        print(f"Warning: Could not cache image record: {str(e)}")
+
@@ -0,0 +1,188 @@
+"""
+Vision detail planning: per-image low/high detail under a per-request token budget.
+
+Low detail only lowers the token cost; every image is still uploaded as a full
+data URL. The number of images and their combined size are therefore capped
+separately (MAX_TOTAL_IMAGES_PER_REQUEST, VISION_MAX_PAYLOAD_MB).
+"""
+import math
+import base64
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from app.config import Config
+
+# Image roles, in the order they are given budget
+ROLE_PHOTO = 'photo'            # Standalone uploaded image (damage photos, scene photos)
+ROLE_SCAN = 'scan'              # PDF image on a page with no extracted text
+ROLE_PAGE_IMAGE = 'page_image'  # PDF image on a page whose text is already in the prompt
+ROLE_PRIORITY = (ROLE_PHOTO, ROLE_SCAN, ROLE_PAGE_IMAGE)
+
+# OpenAI vision pricing model: low detail is a flat cost; high detail fits the
+# image in 2048x2048, scales the short side to 768 and charges per 512px tile
+LOW_DETAIL_TOKENS = 85
+HIGH_DETAIL_BASE_TOKENS = 85
+HIGH_DETAIL_TILE_TOKENS = 170
+HIGH_DETAIL_MAX_DIMENSION = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+HIGH_DETAIL_TILE_SIZE = 512
+
+
+def estimate_vision_tokens(width: int, height: int, detail: str) -> int:
+    """
+    Estimate the input tokens an image costs at a given detail level.
+    
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        detail: 'low' or 'high'
+        
+    Returns:
+        Estimated token count
+    """
+    if detail == 'low' or not width or not height:
+        return LOW_DETAIL_TOKENS
+    
+    scale = min(1.0, HIGH_DETAIL_MAX_DIMENSION / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    
+    tiles = math.ceil(width / HIGH_DETAIL_TILE_SIZE) * math.ceil(height / HIGH_DETAIL_TILE_SIZE)
+    return HIGH_DETAIL_BASE_TOKENS + HIGH_DETAIL_TILE_TOKENS * tiles
+
+
+def get_image_role(file_type: str, page_text: str = '') -> str:
+    """Classify an image by where it came from and whether its page has text."""
+    if file_type == 'image':
+        return ROLE_PHOTO
+    if len(page_text.strip()) >= Config.VISION_PAGE_TEXT_MIN_CHARS:
+        return ROLE_PAGE_IMAGE
+    return ROLE_SCAN
+
+
+def choose_image_detail(role: str, width: int, height: int) -> str:
+    """
+    Choose the preferred detail level for an image.
+    
+    Small images gain nothing from high detail (low detail already sees them
+    at full resolution), and images on pages whose text is already extracted
+    are logos, stamps or scans of that text.
+    """
+    if max(width or 0, height or 0) <= Config.VISION_LOW_DETAIL_MAX_DIMENSION:
+        return 'low'
+    if role == ROLE_PAGE_IMAGE:
+        return 'low'
+    return 'high'
+
+
+def _read_dimensions(base64_data: str) -> Tuple[int, int]:
+    """Read image dimensions from the encoded header without decoding pixels."""
+    try:
+        with Image.open(BytesIO(base64.b64decode(base64_data))) as img:
+            return img.size
+    except Exception:
+        # Unknown size is planned as a full-size image
+        return Config.MAX_IMAGE_DIMENSION, Config.MAX_IMAGE_DIMENSION
+
+
+class VisionDetailPlanner:
+    """Collects images for one request and assigns detail levels within a token budget."""
+    
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        max_images: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """Initialize with optional token, image-count and payload limits; they default to Config values."""
+        self.token_budget = Config.VISION_TOKEN_BUDGET if token_budget is None else token_budget
+        self.max_images = Config.MAX_TOTAL_IMAGES_PER_REQUEST if max_images is None else max_images
+        self.max_bytes = int(Config.VISION_MAX_PAYLOAD_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.candidates: List[Dict[str, Any]] = []
+        self.tokens_planned = 0
+        self.downgraded = 0
+        self.skipped = 0
+    
+    def add(
+        self,
+        url: str,
+        base64_data: str,
+        role: str,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        label: Optional[str] = None
+    ) -> None:
+        """
+        Queue an image for planning.
+        
+        Args:
+            url: Data URL sent to the model
+            base64_data: Base64 payload (used to read dimensions when not supplied)
+            role: One of ROLE_PRIORITY
+            width: Image width in pixels, if known
+            height: Image height in pixels, if known
+            label: Filename reported when the image does not fit the budget
+        """
+        if not width or not height:
+            width, height = _read_dimensions(base64_data)
+        self.candidates.append({
+            'url': url,
+            'role': role,
+            'width': width,
+            'height': height,
+            'label': label,
+            'preferred': choose_image_detail(role, width, height),
+        })
+    
+    def plan(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Assign detail levels.
+        
+        Every image is first admitted at low detail in role priority order, so
+        photos are the last to be dropped, until the token budget, the image
+        count or the payload size runs out; the remaining token budget then
+        upgrades images that prefer high detail, again photos first.
+        
+        Returns:
+            Tuple of (planned, skipped); planned entries keep their input order
+            and carry 'detail' and 'tokens'
+        """
+        order = sorted(
+            range(len(self.candidates)),
+            key=lambda i: ROLE_PRIORITY.index(self.candidates[i]['role'])
+        )
+        remaining = self.token_budget
+        payload_bytes = 0
+        admitted = set()
+        for i in order:
+            if remaining < LOW_DETAIL_TOKENS or len(admitted) >= self.max_images:
+                break
+            candidate = self.candidates[i]
+            if payload_bytes + len(candidate['url']) > self.max_bytes:
+                # A smaller image further down may still fit
+                continue
+            payload_bytes += len(candidate['url'])
+            candidate['detail'] = 'low'
+            candidate['tokens'] = LOW_DETAIL_TOKENS
+            remaining -= LOW_DETAIL_TOKENS
+            admitted.add(i)
+        
+        for i in order:
+            candidate = self.candidates[i]
+            if i not in admitted or candidate['preferred'] != 'high':
+                continue
+            high_tokens = estimate_vision_tokens(candidate['width'], candidate['height'], 'high')
+            extra = high_tokens - LOW_DETAIL_TOKENS
+            if extra <= remaining:
+                candidate['detail'] = 'high'
+                candidate['tokens'] = high_tokens
+                remaining -= extra
+            else:
+                self.downgraded += 1
+        
+        planned = [self.candidates[i] for i in range(len(self.candidates)) if i in admitted]
+        skipped = [self.candidates[i] for i in range(len(self.candidates)) if i not in admitted]
+        self.tokens_planned = self.token_budget - remaining
+        self.skipped = len(skipped)
+        return planned, skipped
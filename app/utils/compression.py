@@ -0,0 +1,203 @@
+"""
+Compressed transport: gzip/deflate request bodies and negotiated response compression.
+"""
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+from flask import Response, request
+from app.config import Config
+
+try:
+    import brotli
+except ImportError:  # Optional; responses fall back to gzip without it
+    brotli = None
+
+# Response types worth compressing; images, PDFs, audio and archives are already compressed
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+})
+
+# Bodies at least this large are compressed as they are sent rather than in one buffer
+_STREAM_MIN_BYTES = 1024 * 1024
+
+# zlib wbits for each request Content-Encoding (gzip header, zlib header)
+_REQUEST_WBITS = {'gzip': 31, 'x-gzip': 31, 'deflate': 15}
+
+_READ_SIZE = 64 * 1024
+
+
+def _error_response(start_response, status: str, message: str):
+    body = (json.dumps({'error': message}) + '\n').encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class RequestDecompressionMiddleware:
+    """
+    WSGI middleware that accepts gzip or deflate request bodies.
+    
+    The body is inflated before Flask sees it, so request.get_json and
+    MAX_CONTENT_LENGTH work on the decompressed data. Inflation stops at
+    MAX_DECOMPRESSED_REQUEST_BYTES; a body that would expand past it is
+    rejected with 413 without ever being held in full.
+    """
+    
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.wsgi_app(environ, start_response)
+        
+        wbits = _REQUEST_WBITS.get(encoding)
+        if wbits is None:
+            return _error_response(start_response, '415 Unsupported Media Type',
+                                   f'Unsupported Content-Encoding: {encoding}. Use gzip or deflate.')
+        
+        try:
+            body = self._inflate(environ['wsgi.input'], wbits, environ.get('CONTENT_LENGTH'))
+        except OverflowError:
+            return _error_response(start_response, '413 Request Entity Too Large',
+                                   'Decompressed request body is too large.')
+        except zlib.error:
+            return _error_response(start_response, '400 Bad Request',
+                                   f'Request body is not valid {encoding} data.')
+        
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+    
+    @staticmethod
+    def _inflate(stream, wbits: int, content_length: Optional[str]) -> bytes:
+        """
+        Inflate a request body, never producing more than the configured limit.
+        
+        Raises:
+            OverflowError: If the body inflates past MAX_DECOMPRESSED_REQUEST_BYTES
+            zlib.error: If the body is not valid compressed data
+        """
+        limit = Config.MAX_DECOMPRESSED_REQUEST_BYTES
+        remaining = int(content_length) if content_length and content_length.isdigit() else None
+        decompressor = zlib.decompressobj(wbits)
+        output = io.BytesIO()
+        
+        while remaining is None or remaining > 0:
+            chunk = stream.read(_READ_SIZE if remaining is None else min(_READ_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            # Cap each step's output so a tiny chunk cannot expand into gigabytes
+            data = chunk
+            while data:
+                output.write(decompressor.decompress(data, limit + 1 - output.tell()))
+                if output.tell() > limit:
+                    raise OverflowError('decompressed body exceeds limit')
+                data = decompressor.unconsumed_tail
+            if decompressor.eof:
+                break
+        
+        output.write(decompressor.flush())
+        if output.tell() > limit:
+            raise OverflowError('decompressed body exceeds limit')
+        if not decompressor.eof:
+            raise zlib.error('truncated compressed body')
+        return output.getvalue()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a response encoding from an Accept-Encoding header.
+    
+    Returns:
+        'br', 'gzip' or None (send uncompressed)
+    """
+    offered = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    
+    wildcard = offered.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = max(candidates, key=lambda name: offered.get(name, wildcard))
+    return best if offered.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    """Incremental br or gzip encoder with a common interface."""
+    
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=Config.BROTLI_QUALITY)
+            self.compress = self._compressor.process
+            self.finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._compressor.compress
+            self.finish = self._compressor.flush
+
+
+def _compress_stream(body: Iterable, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a response body (its encoded chunks) as it is sent."""
+    compressor = _Compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # The response only closes its current body, which is now this generator
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a response for clients that accept it (after_request hook).
+    
+    Skips HEAD requests, bodiless and partial responses, responses that
+    are already encoded, bodies smaller than COMPRESSION_MIN_BYTES and
+    types that do not compress (images, PDFs, audio, archives). Large and
+    streamed bodies are compressed chunk by chunk as they are sent.
+    """
+    if not Config.RESPONSE_COMPRESSION or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+    
+    length = response.calculate_content_length() if response.is_sequence else None
+    if length is not None and length < Config.COMPRESSION_MIN_BYTES:
+        return response
+    
+    if length is not None and length < _STREAM_MIN_BYTES:
+        compressor = _Compressor(encoding)
+        response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+    else:
+        response.response = _compress_stream(response.response, response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    
+    response.headers['Content-Encoding'] = encoding
+    # The encoded body differs byte-wise, so a strong validator no longer applies
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,221 @@
+"""
+Fact record type shared by the extraction, normalization and conflict stages.
+"""
+import sys
+import json
+import hashlib
+from enum import StrEnum
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+class FactCategory(StrEnum):
+    """Fact categories the extraction prompt asks for."""
+    MOVEMENT = 'movement'
+    ENVIRONMENT = 'environment'
+    COMPLIANCE = 'compliance'
+    IMPACT = 'impact'
+    LOCATION = 'location'
+    TEMPORAL = 'temporal'
+
+
+class FactSource(StrEnum):
+    """Document sources a fact can come from."""
+    FNOL = 'fnol'
+    CLAIMANT = 'claimant'
+    OTHER_DRIVER = 'other_driver'
+    POLICE = 'police'
+    REPAIR_ESTIMATE = 'repair_estimate'
+    POLICY = 'policy'
+    UNKNOWN = 'unknown'
+
+
+class FactValidationError(ValueError):
+    """A fact is missing required fields or has fields of the wrong type."""
+
+
+# Value -> the enum's own string, looked up on every fact built
+_CATEGORIES = {member.value: member.value for member in FactCategory}
+_SOURCES = {member.value: member.value for member in FactSource}
+
+# Keys held in slots; anything else a fact carries (e.g. resolved_value) goes in extra
+_FIELDS = ('source_text', 'extracted_fact', 'category', 'source', 'confidence', 'normalized_value', 'is_implied')
+_FIELD_SET = frozenset(_FIELDS) | {'fact_id'}
+
+
+def _intern(value: Any, known: Dict[str, str]) -> str:
+    """Map a category or source to its shared string so repeated values cost nothing."""
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        value = str(value)
+    return known.get(value) or sys.intern(value)
+
+
+def make_fact_id(source: str, category: str, extracted_fact: str, source_text: str) -> str:
+    """
+    Derive a fact ID from what the fact says and where it came from.
+    
+    Normalization does not change the ID, and extracting the same document
+    again gives the same IDs.
+    """
+    key = '\x1f'.join((source, category, extracted_fact, source_text))
+    return 'f_' + hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class Fact:
+    """
+    One extracted fact.
+    
+    Slots instead of a per-fact dict, and category and source strings shared
+    across all facts. Stages change facts in place rather than copying them;
+    convert with to_dict() at the JSON boundary.
+    """
+    
+    __slots__ = _FIELDS + ('fact_id', 'extra')
+    
+    def __init__(self, extracted_fact: str, source_text: str = '', category: str = '', source: str = '',
+                 confidence: float = 0.0, normalized_value: Optional[str] = None, is_implied: Optional[bool] = None,
+                 fact_id: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        self.extracted_fact = extracted_fact
+        self.source_text = source_text
+        self.category = _intern(category, _CATEGORIES)
+        self.source = _intern(source, _SOURCES)
+        self.confidence = confidence
+        self.normalized_value = normalized_value
+        self.is_implied = is_implied
+        self.fact_id = fact_id or make_fact_id(self.source, self.category, extracted_fact, source_text)
+        self.extra = extra or None
+    
+    def set_source(self, source: str) -> None:
+        """Change the source (keeps the shared string and the original fact ID)."""
+        self.source = _intern(source, _SOURCES)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Read a field by its JSON key, so code written for fact dicts also accepts Facts."""
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default) if self.extra else default
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], strict: bool = False) -> 'Fact':
+        """
+        Build a fact from its JSON form.
+        
+        Args:
+            data: Fact dictionary (as returned by the model or sent by the browser)
+            strict: Raise on invalid fields instead of coercing them
+            
+        Returns:
+            Fact instance
+            
+        Raises:
+            FactValidationError: If data is not a dictionary, or strict is set and a field is invalid
+        """
+        if not isinstance(data, dict):
+            raise FactValidationError(f"Expected a fact object, got {type(data).__name__}.")
+        
+        extracted_fact = data.get('extracted_fact')
+        source_text = data.get('source_text')
+        confidence = data.get('confidence')
+        if strict:
+            if not isinstance(extracted_fact, str) or not extracted_fact:
+                raise FactValidationError('extracted_fact must be a non-empty string.')
+            for key in ('source_text', 'category', 'source', 'normalized_value'):
+                if data.get(key) is not None and not isinstance(data[key], str):
+                    raise FactValidationError(f'{key} must be a string.')
+            if confidence is not None and (isinstance(confidence, bool) or not isinstance(confidence, (int, float))
+                                           or not 0 <= confidence <= 1):
+                raise FactValidationError('confidence must be a number between 0 and 1.')
+        
+        try:
+            confidence = float(confidence or 0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        normalized_value = data.get('normalized_value')
+        extra = {key: value for key, value in data.items() if key not in _FIELD_SET} or None
+        
+        return cls(
+            extracted_fact='' if extracted_fact is None else str(extracted_fact),
+            source_text='' if source_text is None else str(source_text),
+            category=data.get('category'),
+            source=data.get('source'),
+            confidence=confidence,
+            normalized_value=None if normalized_value is None else str(normalized_value),
+            is_implied=data.get('is_implied'),
+            fact_id=data.get('fact_id') if isinstance(data.get('fact_id'), str) else None,
+            extra=extra
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the JSON form the API returns (optional fields only when set)."""
+        data = {
+            'fact_id': self.fact_id,
+            'source_text': self.source_text,
+            'extracted_fact': self.extracted_fact,
+            'category': self.category,
+            'source': self.source,
+            'confidence': self.confidence,
+        }
+        if self.normalized_value is not None:
+            data['normalized_value'] = self.normalized_value
+        if self.is_implied is not None:
+            data['is_implied'] = self.is_implied
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    @classmethod
+    def from_json(cls, text: Union[str, bytes], strict: bool = False) -> 'Fact':
+        """Parse one fact from JSON."""
+        return cls.from_dict(json.loads(text), strict=strict)
+    
+    def to_json(self) -> str:
+        """Serialize one fact to compact JSON."""
+        return json.dumps(self.to_dict(), separators=(',', ':'), ensure_ascii=False)
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Fact):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    def __repr__(self) -> str:
+        return f"Fact({self.fact_id}, {self.category}/{self.source}: {self.extracted_fact[:40]!r})"
+
+
+def to_fact(fact: Union[Fact, Dict[str, Any]]) -> Fact:
+    """Accept a Fact or a fact dictionary."""
+    return fact if isinstance(fact, Fact) else Fact.from_dict(fact)
+
+
+def facts_from_dicts(items: Iterable[Any], strict: bool = False) -> List[Fact]:
+    """
+    Build facts from a list of dictionaries.
+    
+    Raises:
+        FactValidationError: If strict is set and an entry is invalid (the message names its position)
+    """
+    facts = []
+    for position, item in enumerate(items):
+        try:
+            facts.append(item if isinstance(item, Fact) else Fact.from_dict(item, strict=strict))
+        except FactValidationError as e:
+            if strict:
+                raise FactValidationError(f"Fact {position + 1}: {e}")
+            # Not a fact object at all; the model occasionally returns stray strings
+    return facts
+
+
+def facts_to_dicts(facts: Iterable[Fact]) -> List[Dict[str, Any]]:
+    """Convert facts to their JSON form."""
+    return [fact.to_dict() for fact in facts]
+
+
+def facts_from_json(text: Union[str, bytes], strict: bool = False) -> List[Fact]:
+    """Parse a JSON array of facts."""
+    return facts_from_dicts(json.loads(text), strict=strict)
+
+
+def facts_to_json(facts: Iterable[Fact]) -> str:
+    """Serialize facts to a compact JSON array."""
+    return json.dumps(facts_to_dicts(facts), separators=(',', ':'), ensure_ascii=False)
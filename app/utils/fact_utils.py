@@ -2,70 +2,80 @@
 Fact processing utilities.
 """
 import re
-from typing import List, Dict, Any
+import json
+from typing import List, Dict, Any, Union
 from app.services.openai_service import get_openai_service
+from app.services import model_router
+from app.services.model_router import TASK_CONFLICT_DETECTION
 from app.prompts import get_conflict_detection_prompt
+from app.utils.fact_model import Fact, FactCategory, to_fact
+from app.utils.prompt_format import format_fact_matrix
 
+# Compass words in location facts and their abbreviations
+DIRECTION_MAPPING = {
+    'north': 'N', 'south': 'S', 'east': 'E', 'west': 'W',
+    'northeast': 'NE', 'northwest': 'NW',
+    'southeast': 'SE', 'southwest': 'SW'
+}
 
-def normalize_facts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})\s*(AM|PM|am|pm)?')
+
+
+def normalize_facts(facts_list: List[Union[Fact, Dict[str, Any]]]) -> List[Fact]:
     """
     Unify conflicting facts into standard schema.
     
+    Facts are normalized in place; dictionaries are converted to Facts first.
+    
     Args:
-        facts_list: List of fact dictionaries
+        facts_list: List of facts or fact dictionaries
         
     Returns:
-        List of normalized fact dictionaries
+        List of normalized facts
     """
     normalized_facts = []
     
     for fact in facts_list:
-        normalized = fact.copy()
+        fact = to_fact(fact)
+        category = fact.category
         
         # Normalize directions
-        if 'normalized_value' in fact and fact.get('category') == 'location':
-            direction = fact.get('normalized_value', '').lower()
-            direction_mapping = {
-                'north': 'N', 'south': 'S', 'east': 'E', 'west': 'W',
-                'northeast': 'NE', 'northwest': 'NW',
-                'southeast': 'SE', 'southwest': 'SW'
-            }
-            for key, value in direction_mapping.items():
+        if category == FactCategory.LOCATION and fact.normalized_value is not None:
+            direction = fact.normalized_value.lower()
+            for key, value in DIRECTION_MAPPING.items():
                 if key in direction:
-                    normalized['normalized_value'] = value
+                    fact.normalized_value = value
                     break
         
         # Normalize impact points
-        if fact.get('category') == 'impact':
-            impact = fact.get('normalized_value', '').lower()
-            impact = impact.replace('-', '_').replace(' ', '_')
-            normalized['normalized_value'] = impact
+        elif category == FactCategory.IMPACT:
+            impact = (fact.normalized_value or '').lower()
+            fact.normalized_value = impact.replace('-', '_').replace(' ', '_')
         
         # Normalize time formats
-        if fact.get('category') == 'temporal':
-            time_value = fact.get('normalized_value', '')
+        elif category == FactCategory.TEMPORAL:
             # Try to extract and normalize time format
-            time_match = re.search(r'(\d{1,2}):(\d{2})\s*(AM|PM|am|pm)?', time_value)
+            time_match = _TIME_PATTERN.search(fact.normalized_value or '')
             if time_match:
                 hour = int(time_match.group(1))
                 minute = time_match.group(2)
                 period = time_match.group(3) or ''
                 if period:
-                    normalized['normalized_value'] = f"{hour:02d}:{minute} {period.upper()}"
+                    fact.normalized_value = f"{hour:02d}:{minute} {period.upper()}"
                 else:
-                    normalized['normalized_value'] = f"{hour:02d}:{minute}"
+                    fact.normalized_value = f"{hour:02d}:{minute}"
         
-        normalized_facts.append(normalized)
+        normalized_facts.append(fact)
     
     return normalized_facts
 
 
-def detect_conflicts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def detect_conflicts(facts_list: List[Union[Fact, Dict[str, Any]]]) -> List[Dict[str, Any]]:
     """
     Identify contradictions across sources using OpenAI.
     
     Args:
-        facts_list: List of fact dictionaries
+        facts_list: List of facts or fact dictionaries
         
     Returns:
         List of conflict dictionaries
@@ -79,28 +89,16 @@ def detect_conflicts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         # Need at least 2 facts to have conflicts
         return []
     
+    facts_list = [to_fact(fact) for fact in facts_list]
+    
     # Format facts for the prompt
-    facts_text = "\n\nFact Matrix:\n"
-    for idx, fact in enumerate(facts_list):
-        facts_text += f"\nFact {idx + 1}:\n"
-        facts_text += f"  Source Text: {fact.get('source_text', 'N/A')}\n"
-        facts_text += f"  Extracted Fact: {fact.get('extracted_fact', 'N/A')}\n"
-        facts_text += f"  Category: {fact.get('category', 'N/A')}\n"
-        facts_text += f"  Source: {fact.get('source', 'N/A')}\n"
-        facts_text += f"  Confidence: {fact.get('confidence', 0)}\n"
-        if fact.get('normalized_value'):
-            facts_text += f"  Normalized Value: {fact.get('normalized_value')}\n"
-        if fact.get('is_implied'):
-            facts_text += f"  Is Implied: {fact.get('is_implied')}\n"
-    
-    # Prepare content for OpenAI
-    system_prompt = get_conflict_detection_prompt()
-    full_prompt = system_prompt + facts_text
-    
-    # Call OpenAI API with JSON mode
-    result = openai_service.call_with_json_response(
-        system_prompt=None,
-        user_content=full_prompt,
+    facts_text = format_fact_matrix(facts_list)
+    
+    # Call OpenAI API with JSON mode; the static instructions lead so their prefix can be cached
+    result = model_router.call_json(
+        TASK_CONFLICT_DETECTION,
+        system_prompt=get_conflict_detection_prompt(),
+        user_content=facts_text,
         max_tokens=4000
     )
     
@@ -126,8 +124,8 @@ def detect_conflicts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             # Find matching facts from the fact matrix
             matching_facts = []
             for fact in facts_list:
-                fact_source = fact.get('source', '')
-                fact_value = fact.get('normalized_value', '') or fact.get('extracted_fact', '')
+                fact_source = fact.source
+                fact_value = fact.normalized_value or fact.extracted_fact
                 
                 # Check if this fact matches the value and source
                 if fact_source in detail_sources:
@@ -142,7 +140,7 @@ def detect_conflicts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             else:
                 # Fallback: use source_text from matching facts
                 for fact in matching_facts[:3]:  # Limit to 3 snippets
-                    snippet = fact.get('source_text', '')
+                    snippet = fact.source_text
                     if snippet and snippet not in final_snippets:
                         final_snippets.append(snippet[:200])  # Limit snippet length
             
@@ -167,3 +165,116 @@ def detect_conflicts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return formatted_conflicts
 
 
+
+
+def _fact_value(fact: Dict[str, Any]) -> str:
+    """Lowercased value a fact is matched on (normalized value, else the extracted fact)."""
+    return str(fact.get('normalized_value') or fact.get('extracted_fact') or '').lower().strip()
+
+
+def _values_match(fact_value: str, value: str) -> bool:
+    """Fuzzy value match used by the fact table: equal, or one contains the other."""
+    return fact_value == value or value in fact_value or fact_value in value
+
+
+def build_conflict_links(facts: List[Dict[str, Any]], conflicts: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """
+    Map each fact to the conflicts it takes part in.
+    
+    A fact belongs to a conflict when its source is one of the conflict's
+    sources and its value fuzzily matches one of the conflicting values (or a
+    value_details entry that names the fact's source). Values are indexed by
+    source once, so each fact is only compared with the values from its own
+    source instead of scanning every conflict.
+    
+    Args:
+        facts: Fact matrix
+        conflicts: Conflicts detected in the fact matrix
+        
+    Returns:
+        {fact index (as a string): [conflict indices, ascending]} for linked facts only
+    """
+    # source -> {lowercased value: sorted conflict indices}
+    values_by_source: Dict[str, Dict[str, List[int]]] = {}
+    for conflict_index, conflict in enumerate(conflicts or []):
+        conflict_sources = set(conflict.get('sources') or [])
+        for source in conflict_sources:
+            for value in conflict.get('conflicting_values') or []:
+                _add_conflict_value(values_by_source, source, value, conflict_index)
+        for detail in conflict.get('value_details') or []:
+            for source in conflict_sources.intersection(detail.get('sources') or []):
+                _add_conflict_value(values_by_source, source, detail.get('value'), conflict_index)
+    
+    links = {}
+    for fact_index, fact in enumerate(facts or []):
+        candidates = values_by_source.get(fact.get('source') or '')
+        fact_value = _fact_value(fact)
+        if not candidates or not fact_value:
+            continue
+        matched = set(candidates.get(fact_value, ()))
+        for value, conflict_indices in candidates.items():
+            if value != fact_value and _values_match(fact_value, value):
+                matched.update(conflict_indices)
+        if matched:
+            links[str(fact_index)] = sorted(matched)
+    return links
+
+
+def _add_conflict_value(values_by_source: Dict[str, Dict[str, List[int]]], source: str, value: Any, conflict_index: int) -> None:
+    value = str(value or '').lower().strip()
+    if not value:
+        return
+    indices = values_by_source.setdefault(source, {}).setdefault(value, [])
+    if not indices or indices[-1] != conflict_index:
+        indices.append(conflict_index)
+
+
+# "3", "Fact 3" or "fact #3" in a signal's related_facts refers to a fact by its 1-based number
+_FACT_REFERENCE = re.compile(r'^\s*(?:fact\s*#?\s*)?(\d+)\s*$', re.IGNORECASE)
+
+
+def build_signal_links(facts: List[Dict[str, Any]], signals: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """
+    Map each fact to the liability signals it supports.
+    
+    Related facts given as fact numbers link directly. Otherwise a fact links
+    to a signal when its extracted fact appears in the signal's evidence text
+    or a related fact description, or when its source text contains the start
+    of the evidence text.
+    
+    Args:
+        facts: Fact matrix the signals were generated from
+        signals: Liability signals
+        
+    Returns:
+        {fact index (as a string): [signal indices, ascending]} for linked facts only
+    """
+    prepared = []
+    linked: Dict[int, set] = {}
+    for signal_index, signal in enumerate(signals or []):
+        evidence = str(signal.get('evidence_text') or '').lower()
+        related_texts = []
+        for related in signal.get('related_facts') or []:
+            reference = _FACT_REFERENCE.match(str(related)) if isinstance(related, (int, str)) else None
+            if reference:
+                fact_index = int(reference.group(1)) - 1
+                if 0 <= fact_index < len(facts or []):
+                    linked.setdefault(fact_index, set()).add(signal_index)
+            elif isinstance(related, str):
+                related_texts.append(related.lower())
+            else:
+                related_texts.append(json.dumps(related).lower())
+        prepared.append((signal_index, evidence, evidence[:50], related_texts))
+    
+    for fact_index, fact in enumerate(facts or []):
+        fact_text = str(fact.get('extracted_fact') or '').lower()
+        source_text = str(fact.get('source_text') or '').lower()
+        if not fact_text:
+            continue
+        for signal_index, evidence, evidence_start, related_texts in prepared:
+            if (fact_text in evidence
+                    or (evidence_start and evidence_start in source_text)
+                    or any(fact_text in related or related[:50] in fact_text for related in related_texts if related)):
+                linked.setdefault(fact_index, set()).add(signal_index)
+    
+    return {str(fact_index): sorted(indices) for fact_index, indices in sorted(linked.items())}
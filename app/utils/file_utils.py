@@ -3,6 +3,9 @@ File handling utilities.
 """
 from typing import Tuple
 from app.services.openai_service import get_openai_service
+from app.services import model_router
+from app.services.model_router import TASK_CLASSIFICATION
+from app.services.metrics_service import span, STAGE_CLASSIFICATION
 from app.prompts import document_classification_prompt
 
 
@@ -55,13 +58,16 @@ def identify_document_source_from_content(content_text: str, filename: str = '')
     # Limit content to first 2000 characters for efficiency
     content_sample = content_text[:2000] if len(content_text) > 2000 else content_text
     
-    full_prompt = document_classification_prompt + f"\n\nFilename: {filename}\n\nContent:\n{content_sample}"
+    user_content = f"Filename: {filename}\n\nContent:\n{content_sample}"
     
-    result = openai_service.call_with_json_response(
-        system_prompt=None,
-        user_content=full_prompt,
-        max_tokens=500
-    )
+    with span(STAGE_CLASSIFICATION):
+        result = model_router.call_json(
+            TASK_CLASSIFICATION,
+            system_prompt=document_classification_prompt,
+            user_content=user_content,
+            accept=model_router.accept_classification,
+            max_tokens=500
+        )
     
     if not result:
         return ('unknown', False)
@@ -0,0 +1,130 @@
+"""
+Flask JSON provider backed by orjson, with the standard library as fallback.
+"""
+import json
+import logging
+from typing import Any, List
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from app.config import Config
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is used without it
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# The fallback is logged once per process, not once per provider
+_fallback_warned = False
+
+# Nesting levels of a response split into separately encoded parts (top-level
+# fields, then e.g. each page of an upload), so large bodies are never joined
+_PART_DEPTH = 2
+
+# Containers with more entries than this are encoded in one call; splitting
+# many small items (a fact list) costs more than the copy it saves
+_MAX_SPLIT_ENTRIES = 64
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes and parses with orjson when it is installed.
+    
+    Output matches the default provider's: the same default() hook handles
+    dates, dataclasses and UUIDs, and keys are sorted unless sort_keys is
+    turned off. Anything orjson cannot handle (custom json.dumps arguments,
+    integers over 64 bits, NaN in request bodies) goes through the standard
+    library instead.
+    
+    Responses of JSON_CHUNK_MIN_BYTES or more are returned as a list of
+    encoded parts. Werkzeug still sets Content-Length, and the server writes
+    the parts one after another, so the body is never copied into one buffer.
+    """
+    
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        global _fallback_warned
+        if orjson is None and not _fallback_warned:
+            _fallback_warned = True
+            logger.warning("orjson is not installed; JSON responses use the slower standard library encoder")
+    
+    @staticmethod
+    def _orjson_options(sort_keys: bool) -> int:
+        # Dates and dataclasses go through default() so they render as the default provider renders them
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        return options | orjson.OPT_SORT_KEYS if sort_keys else options
+    
+    def _encode(self, obj: Any) -> bytes:
+        """Encode one value compactly."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(self.sort_keys))
+            except orjson.JSONEncodeError:
+                pass
+        return json.dumps(
+            obj, default=self.default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys, separators=(',', ':')
+        ).encode('utf-8')
+    
+    def encode_parts(self, obj: Any, depth: int = _PART_DEPTH) -> List[bytes]:
+        """
+        Encode a value as a list of byte strings that concatenate to its compact JSON.
+        
+        Args:
+            obj: Value to encode
+            depth: Levels of dicts and lists to split into separate parts
+            
+        Returns:
+            Encoded parts
+        """
+        if depth <= 0 or not isinstance(obj, (dict, list)) or not obj or len(obj) > _MAX_SPLIT_ENTRIES:
+            return [self._encode(obj)]
+        
+        parts = []
+        if isinstance(obj, dict):
+            if not all(isinstance(key, str) for key in obj):
+                return [self._encode(obj)]
+            keys = sorted(obj) if self.sort_keys else list(obj)
+            for position, key in enumerate(keys):
+                parts.append((b'{' if position == 0 else b',') + self._encode(key) + b':')
+                parts.extend(self.encode_parts(obj[key], depth - 1))
+            parts.append(b'}')
+        else:
+            for position, item in enumerate(obj):
+                parts.append(b'[' if position == 0 else b',')
+                parts.extend(self.encode_parts(item, depth - 1))
+            parts.append(b']')
+        return parts
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Indentation, custom encoder classes and the like are standard library features
+        if (orjson is None or kwargs.keys() - {'default', 'ensure_ascii', 'sort_keys', 'separators'}
+                or kwargs.get('separators', (',', ':')) != (',', ':')):
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(
+                obj, default=kwargs.get('default', self.default), option=self._orjson_options(kwargs.get('sort_keys', self.sort_keys))
+            ).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Let the standard library accept what it accepts (NaN) and word the error
+            return super().loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Indented debug output keeps the default behaviour
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        
+        obj = self._prepare_response_obj(args, kwargs)
+        parts = self.encode_parts(obj)
+        parts.append(b'\n')
+        if len(parts) < 3 or sum(len(part) for part in parts) < Config.JSON_CHUNK_MIN_BYTES:
+            return self._app.response_class(b''.join(parts), mimetype=self.mimetype)
+        return self._app.response_class(parts, mimetype=self.mimetype)
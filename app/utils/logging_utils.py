@@ -0,0 +1,137 @@
+"""
+Logging setup: level gating, JSON output, sampling and off-thread log I/O.
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+from app.config import Config
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any extra={...} fields."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through one in N records from call sites that opt in.
+    
+    High-volume lines pass extra={'sample_every': N}; the first record from
+    each call site is kept, then every Nth one. Other records always pass.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._seen: Dict[Tuple[str, int], int] = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, 'sample_every', None)
+        if not every or every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._seen.get(key, 0)
+            self._seen[key] = count + 1
+        return count % every == 0
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Hand records to a background listener instead of writing them in the calling thread.
+    
+    Only the message is rendered before queueing (arguments may change after
+    the call returns); formatting, exception rendering and the write itself
+    happen on the listener thread. When the queue is full the record is
+    dropped rather than blocking the request.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Background listener writing queued records (None when logging is synchronous)
+_listener: Optional[QueueListener] = None
+_configured = False
+
+
+def _restart_listener() -> None:
+    """Listener threads do not survive fork(); start a new one in the child."""
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def configure_logging() -> None:
+    """
+    Configure the root logger from LOG_LEVEL, LOG_FORMAT and LOG_ASYNC.
+    
+    Safe to call more than once; only the first call has an effect.
+    """
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+    
+    formatter = JSONFormatter() if Config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+    
+    if Config.LOG_ASYNC:
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        handler = AsyncQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_listener)
+    else:
+        handler = stream_handler
+    handler.addFilter(SamplingFilter())
+    
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
@@ -0,0 +1,200 @@
+"""
+Prompt serialization for fact matrices and liability signals.
+
+Facts are rendered as one pipe-separated row each under a single header,
+instead of a labelled block per fact, and each distinct source quote is
+written once and referenced by ID. On large claims, where many facts share
+a quote, this sends roughly half the input tokens of the labelled layout.
+When every quote is distinct the quotes dominate, so prompts that never
+cite source text leave them out (quotes=False).
+"""
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Union
+from app.config import Config
+from app.utils.fact_model import Fact
+
+logger = logging.getLogger(__name__)
+
+FactLike = Union[Fact, Dict[str, Any]]
+
+# Explains the short column keys; kept fixed so it costs the same on every call
+FACT_MATRIX_LEGEND = (
+    "Columns: #=fact number, cat=category, src=source document, conf=confidence, "
+    "fact=extracted fact, norm=normalized value, q=source quote ID (blank if none, = if the quote is the fact text). "
+    "Facts ending in * are implied rather than stated. "
+    "Source quotes are listed once; when citing source text, copy the quote text, not its ID."
+)
+
+# Legend without the quote column, for prompts that never cite source text
+FACT_MATRIX_LEGEND_NO_QUOTES = (
+    "Columns: #=fact number, cat=category, src=source document, conf=confidence, "
+    "fact=extracted fact, norm=normalized value. "
+    "Facts ending in * are implied rather than stated."
+)
+
+SIGNAL_LEGEND = "Columns: #=signal number, type=signal type, sev=severity score, impact=impact on liability, evidence=evidence text"
+
+
+# Fact fields rendered by _fact_row, in argument order
+_ROW_FIELDS = ('category', 'source', 'confidence', 'extracted_fact', 'normalized_value', 'is_implied')
+
+
+def _field(fact: FactLike, key: str) -> Any:
+    return getattr(fact, key) if isinstance(fact, Fact) else fact.get(key)
+
+
+def _scalar(value: Any) -> Any:
+    """Make a field value usable as a cache key (request bodies may hold lists or objects)."""
+    return value if value is None or isinstance(value, (str, int, float)) else str(value)
+
+
+@lru_cache(maxsize=Config.PROMPT_CACHE_SIZE)
+def _clean_text(value: Any) -> str:
+    if value is None:
+        return ''
+    text = value if isinstance(value, str) else str(value)
+    if '|' in text:
+        text = text.replace('|', '/')
+    return ' '.join(text.split())
+
+
+def _clean(value: Any) -> str:
+    """Render a value on one line with no column separators."""
+    return _clean_text(_scalar(value))
+
+
+@lru_cache(maxsize=Config.PROMPT_CACHE_SIZE)
+def _fact_row(category: Any, source: Any, confidence: Any, extracted_fact: Any,
+              normalized_value: Any, is_implied: Any) -> str:
+    """
+    Render the columns of one fact after its number and before its quote ID.
+    
+    Cached on the field values, so a fact sent to several prompts (or again
+    after an edit elsewhere in the matrix) is rendered once.
+    """
+    try:
+        confidence_text = f"{round(float(confidence or 0), 2):g}"
+    except (TypeError, ValueError):
+        confidence_text = '0'
+    fact_text = _clean(extracted_fact) or 'N/A'
+    if is_implied:
+        fact_text += '*'
+    return f"{_clean(category)}|{_clean(source)}|{confidence_text}|{fact_text}|{_clean(normalized_value)}"
+
+
+def format_fact_matrix(facts: Iterable[FactLike], title: str = 'Fact Matrix', quotes: bool = True) -> str:
+    """
+    Render facts as a compact table for a prompt.
+    
+    Args:
+        facts: Facts or fact dictionaries, numbered from 1 in the given order
+        title: Heading for the section
+        quotes: Include source quotes; prompts that never cite source text
+            (timeline, recommendation, escalation) leave them out, since the
+            quotes are most of the matrix when they are distinct
+        
+    Returns:
+        Prompt text, starting with a blank line so it can follow a system prompt directly
+    """
+    quote_ids: Dict[str, str] = {}
+    quote_lines: List[str] = []
+    rows: List[str] = []
+    for number, fact in enumerate(facts, 1):
+        row = _fact_row(*(_scalar(_field(fact, key)) for key in _ROW_FIELDS))
+        if not quotes:
+            rows.append(f"{number}|{row}")
+            continue
+        quote = _clean(_field(fact, 'source_text'))
+        quote_id = ''
+        if quote and quote == _clean(_field(fact, 'extracted_fact')):
+            quote_id = '='  # Verbatim fact; the quote would repeat it
+        elif quote:
+            quote_id = quote_ids.get(quote)
+            if quote_id is None:
+                quote_id = quote_ids[quote] = f"Q{len(quote_ids) + 1}"
+                quote_lines.append(f"{quote_id}: {quote}")
+        rows.append(f"{number}|{row}|{quote_id}")
+    
+    if quotes:
+        parts = [f"\n\n{title}:", FACT_MATRIX_LEGEND]
+        if quote_lines:
+            parts.append("Source quotes:")
+            parts.extend(quote_lines)
+        parts.append("Facts:")
+        parts.append("#|cat|src|conf|fact|norm|q")
+    else:
+        parts = [f"\n\n{title}:", FACT_MATRIX_LEGEND_NO_QUOTES, "#|cat|src|conf|fact|norm"]
+    parts.extend(rows)
+    text = "\n".join(parts) + "\n"
+    
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Serialized %d facts (%d source quotes) into ~%d tokens",
+                     len(rows), len(quote_lines), count_tokens(text))
+    return text
+
+
+def format_fact_list(facts: Iterable[FactLike], title: str = 'Facts', numbered: bool = False) -> str:
+    """Render just the extracted fact of each fact, one per line."""
+    lines = [f"\n\n{title}:"]
+    for number, fact in enumerate(facts, 1):
+        marker = f"{number}." if numbered else "-"
+        lines.append(f"{marker} {_clean(_field(fact, 'extracted_fact')) or 'N/A'}")
+    return "\n".join(lines) + "\n"
+
+
+def format_signals(signals: Optional[List[Dict[str, Any]]], title: str = 'Liability Signals',
+                   with_related: bool = False) -> str:
+    """
+    Render liability signals as a compact table for a prompt.
+    
+    Args:
+        signals: Signal dictionaries as returned by the liability signals analysis
+        title: Heading for the section
+        with_related: Add the related facts and discrepancies columns
+    """
+    if not signals:
+        return f"\n\n{title}:\nNo liability signals provided.\n"
+    
+    legend = SIGNAL_LEGEND
+    header = "#|type|sev|impact|evidence"
+    if with_related:
+        legend += ", related=related facts, notes=discrepancies"
+        header += "|related|notes"
+    
+    lines = [f"\n\n{title}:", legend, header]
+    for number, signal in enumerate(signals, 1):
+        row = (f"{number}|{_clean(signal.get('signal_type')) or 'N/A'}|{_clean(signal.get('severity_score', 0))}"
+               f"|{_clean(signal.get('impact_on_liability')) or 'N/A'}|{_clean(signal.get('evidence_text')) or 'N/A'}")
+        if with_related:
+            related = signal.get('related_facts') or []
+            related_text = ', '.join(str(item) for item in related) if isinstance(related, list) else related
+            row += f"|{_clean(related_text)}|{_clean(signal.get('discrepancies'))}"
+        lines.append(row)
+    return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=1)
+def _token_encoder():
+    """tiktoken encoder for the configured model, or None when tiktoken is unavailable."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(Config.TOKEN_COUNT_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        # Not installed, or the encoding files cannot be fetched
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens a prompt will use.
+    
+    Exact with tiktoken installed; otherwise estimated at four characters per token.
+    """
+    encoder = _token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return (len(text) + 3) // 4
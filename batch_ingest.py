@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Headless batch ingestion of claim folders.
+Usage: python batch_ingest.py CLAIMS_DIR [-o results.jsonl] [--extract-workers N]
+                              [--fact-workers N] [--analysis-workers N] [--no-store-rationales]
+                              [--openai-batch]
+
+Each subdirectory of CLAIMS_DIR is one claim. Every claim is extracted,
+classified, fact-extracted (with conflict detection) and analyzed, and one
+JSON line per claim is appended to the results file. Rerunning with the same
+results file resumes: finished claims are skipped and saved fact-stage results
+are reused. Press Ctrl+C to stop after the claims already in flight.
+
+With --openai-batch, model calls are collected into OpenAI Batch API jobs
+(half price, separate rate limits, results within the completion window)
+instead of being sent one by one.
+"""
+import os
+import sys
+import argparse
+import threading
+
+
+def print_claim(record):
+    """Print one line per finished claim."""
+    seconds = sum(value for key, value in record['stage_seconds'].items() if '.' not in key)
+    if record['status'] == 'ok':
+        recommendation = record.get('recommendation') or {}
+        print(f"  ok      {record['claim_id']}: {len(record['facts'] or [])} facts, "
+              f"{len(record['conflicts'] or [])} conflicts, claimant "
+              f"{recommendation.get('claimant_liability_percent', '?')}% ({seconds:.1f}s)")
+    else:
+        print(f"  failed  {record['claim_id']} at {record['failed_stage']}: {record['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run claim folders through extraction and analysis without the browser')
+    parser.add_argument('claims_dir', help='Directory whose subdirectories are claim folders')
+    parser.add_argument('-o', '--output', help='JSONL results file (default: <claims_dir>/batch_results.jsonl)')
+    parser.add_argument('--extract-workers', type=int, help='File extraction workers (default BATCH_EXTRACT_WORKERS)')
+    parser.add_argument('--fact-workers', type=int, help='Fact extraction workers (default BATCH_FACT_WORKERS)')
+    parser.add_argument('--analysis-workers', type=int, help='Analysis workers (default BATCH_ANALYSIS_WORKERS)')
+    parser.add_argument('--no-store-rationales', action='store_true', help='Do not save rationales to the rationale store')
+    parser.add_argument('--openai-batch', action='store_true', help='Send model calls through the OpenAI Batch API')
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.claims_dir):
+        print(f"Not a directory: {args.claims_dir}")
+        sys.exit(2)
+    
+    from app.services.openai_service import get_openai_service
+    from app.services.batch_service import BatchIngestJob, JOB_COMPLETED
+    
+    if not get_openai_service().is_available():
+        print("OPENAI_API_KEY is not set.")
+        sys.exit(2)
+    
+    output_path = args.output or os.path.join(args.claims_dir, 'batch_results.jsonl')
+    job = BatchIngestJob(
+        args.claims_dir,
+        output_path,
+        extract_workers=args.extract_workers,
+        fact_workers=args.fact_workers,
+        analysis_workers=args.analysis_workers,
+        store_rationales=not args.no_store_rationales,
+        openai_batch=args.openai_batch,
+        on_claim_done=print_claim
+    )
+    
+    print(f"Ingesting claims from {args.claims_dir} -> {output_path}")
+    result = {}
+    runner = threading.Thread(target=lambda: result.update(job.run()), daemon=True)
+    runner.start()
+    try:
+        while runner.is_alive():
+            runner.join(0.5)
+    except KeyboardInterrupt:
+        # A second Ctrl+C exits immediately; finished claims are already on disk
+        print("Stopping after the claims in flight...")
+        job.stop()
+        runner.join()
+    stats = result
+    
+    print("-" * 50)
+    print(f"Claims: {stats['claims_total']} total, {stats['claims_skipped']} already done, "
+          f"{stats['claims_ok']} ok, {stats['claims_failed']} failed")
+    print(f"Files extracted: {stats['files_extracted']}")
+    if 'openai_batches' in stats:
+        batches = stats['openai_batches']
+        print(f"OpenAI batches: {batches['batches_submitted']} submitted, {batches['requests_submitted']} requests, "
+              f"{batches['requests_failed']} failed")
+    print(f"Elapsed: {stats['elapsed_seconds']:.1f}s  Throughput: {stats['claims_per_hour']:.1f} claims/hour")
+    if stats.get('error'):
+        print(f"Error: {stats['error']}")
+    sys.exit(0 if stats['status'] == JOB_COMPLETED and not stats['claims_failed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Latency and quality benchmark for model routing.
+Usage: python benchmark_model_routing.py [runs]
+
+Runs the small-tier tasks (document classification, summary, timeline) on
+the documents in "sample files" three ways: small model only, routed
+(small model, escalating to the large one when its answer is rejected) and
+large model only. Reports median latency, how often the answer passed the
+task's validation, classification accuracy against the known document
+types, and how often routing escalated. Needs OPENAI_API_KEY; every run
+makes real API calls.
+"""
+import os
+import sys
+import time
+import statistics
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample files')
+
+# Fixture corpus: sample document -> document type it should be classified as
+LABELS = {
+    'claimant_statement.pdf': 'claimant',
+    'other_driver_statement.pdf': 'other_driver',
+    'police_report.pdf': 'police',
+    'repair_estimate.pdf': 'repair_estimate',
+    'Sample policy.pdf': 'policy',
+}
+
+FACTS = [
+    {'extracted_fact': 'Claimant was stopped at a red light on Main Street', 'category': 'movement', 'source': 'claimant', 'confidence': 0.9},
+    {'extracted_fact': 'Other driver was travelling at about 35 mph', 'category': 'movement', 'source': 'police', 'confidence': 0.8},
+    {'extracted_fact': 'Collision occurred at 5:45 PM', 'category': 'temporal', 'source': 'police', 'confidence': 0.95},
+    {'extracted_fact': 'Other driver says the light was yellow', 'category': 'compliance', 'source': 'other_driver', 'confidence': 0.7},
+    {'extracted_fact': 'Rear bumper and trunk damaged', 'category': 'impact', 'source': 'repair_estimate', 'confidence': 0.9},
+    {'extracted_fact': 'Road surface was wet from rain', 'category': 'environment', 'source': 'police', 'confidence': 0.85},
+]
+
+MODES = ('small', 'routed', 'large')
+
+
+def load_corpus():
+    """Text of each labelled sample document."""
+    from app.services.pdf_service import extract_pdf_content
+    
+    corpus = []
+    for filename, label in LABELS.items():
+        path = os.path.join(SAMPLE_DIR, filename)
+        if not os.path.exists(path):
+            print(f"Skipping missing fixture: {filename}")
+            continue
+        pages = extract_pdf_content(path).get('pages', [])
+        text = '\n'.join(page.get('text', '') for page in pages).strip()
+        corpus.append((filename, label, text))
+    return corpus
+
+
+def run(task, mode, call, accept):
+    """
+    Make one call in the given mode.
+    
+    Returns:
+        (seconds, result, accepted, escalated)
+    """
+    from app.config import Config
+    from app.services import model_router
+    
+    models = []
+    
+    def tracked(model):
+        models.append(model)
+        return call(model)
+    
+    start = time.perf_counter()
+    try:
+        if mode == 'routed':
+            result = model_router.run_with_escalation(task, tracked, accept)
+        else:
+            result = tracked(Config.OPENAI_SMALL_MODEL if mode == 'small' else Config.OPENAI_MODEL)
+    except Exception as e:
+        print(f"  {task}/{mode} failed: {e}")
+        result = None
+    elapsed = time.perf_counter() - start
+    return elapsed, result, result is not None and accept(result), len(models) > 1
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app.config import Config
+    from app.prompts import document_classification_prompt, get_summary_prompt, get_timeline_prompt
+    from app.services import model_router
+    from app.services.openai_service import get_openai_service
+    from app.utils.prompt_format import format_fact_list
+    
+    service = get_openai_service()
+    if not service.is_available():
+        raise SystemExit("OPENAI_API_KEY is not set; this benchmark calls the API.")
+    
+    corpus = load_corpus()
+    documents_text = '\n'.join(f"\n--- {name} ---\n{text[:4000]}" for name, _, text in corpus)
+    facts_text = format_fact_list(FACTS, numbered=True)
+    
+    print(f"Models: small={Config.OPENAI_SMALL_MODEL}, large={Config.OPENAI_MODEL}; "
+          f"{len(corpus)} documents, {runs} runs")
+    print("-" * 78)
+    print(f"{'task':<16}{'mode':<8}{'median ms':>11}{'valid':>9}{'accuracy':>10}{'escalated':>11}")
+    
+    for mode in MODES:
+        # Classification: one call per document, scored against its label
+        times, valid, correct, escalated, total = [], 0, 0, 0, 0
+        for _ in range(runs):
+            for _, label, text in corpus:
+                elapsed, result, accepted, was_escalated = run(
+                    model_router.TASK_CLASSIFICATION, mode,
+                    lambda model: service.call_with_json_response(
+                        document_classification_prompt, f"Filename: document.pdf\n\nContent:\n{text[:2000]}",
+                        max_tokens=500, model=model
+                    ),
+                    model_router.accept_classification
+                )
+                times.append(elapsed)
+                total += 1
+                valid += accepted
+                correct += bool(result) and result.get('document_type') == label
+                escalated += was_escalated
+        print(f"{'classification':<16}{mode:<8}{statistics.median(times) * 1000:>11.0f}"
+              f"{valid / total:>9.0%}{correct / total:>10.0%}{escalated / total:>11.0%}")
+        
+        for task, system_prompt, user_content, accept, text_reply in (
+            (model_router.TASK_SUMMARY, get_summary_prompt(), documents_text, model_router.accept_text, True),
+            (model_router.TASK_TIMELINE, get_timeline_prompt(), facts_text, model_router.accept_timeline, False),
+        ):
+            method = service.call_with_text_response if text_reply else service.call_with_json_response
+            times, valid, escalated = [], 0, 0
+            for _ in range(runs):
+                elapsed, _, accepted, was_escalated = run(
+                    task, mode,
+                    lambda model: method(system_prompt, user_content, max_tokens=2000, model=model),
+                    accept
+                )
+                times.append(elapsed)
+                valid += accepted
+                escalated += was_escalated
+            print(f"{task:<16}{mode:<8}{statistics.median(times) * 1000:>11.0f}"
+                  f"{valid / runs:>9.0%}{'-':>10}{escalated / runs:>11.0%}")
+
+
+if __name__ == '__main__':
+    main()
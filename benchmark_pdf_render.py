@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Render-time benchmark for claim rationale PDFs.
+Usage: python benchmark_pdf_render.py [sections_scale] [runs]
+
+Builds a large synthetic rationale (long narrative sections and many bullet
+items), then times /download-claim-rationale-pdf for a first render, fresh
+renders of changed content, and re-downloads of unchanged content (render
+cache hits).
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+PARAGRAPH = (
+    "The claimant's vehicle was travelling northbound in the right lane when the insured "
+    "vehicle changed lanes without signalling. Witness statements & the police report "
+    "agree on the point of impact; photos show damage to the front passenger quarter panel. "
+)
+
+
+def build_rationale(scale, variant=0):
+    """Build a rationale roughly `scale` pages long."""
+    return {
+        'incident_summary': PARAGRAPH * (4 * scale) + f"(variant {variant})",
+        'evidence_overview': {
+            'narratives': PARAGRAPH * (2 * scale),
+            'photos': "<p>" + PARAGRAPH * scale + "</p>",
+        },
+        'liability_assessment_logic': PARAGRAPH * (4 * scale),
+        'key_evidence': [f"Evidence item {i}: {PARAGRAPH}" for i in range(10 * scale)],
+        'open_questions': [f"<b>Question {i}</b>: confirm the sequence of events?" for i in range(5 * scale)],
+        'coverage_considerations': PARAGRAPH * (2 * scale),
+        'recommendation': PARAGRAPH * scale,
+    }
+
+
+def timed_post(client, rationale):
+    start = time.perf_counter()
+    response = client.post('/download-claim-rationale-pdf', json={'rationale': rationale})
+    body = response.get_data()
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f"Unexpected status {response.status_code}: {body[:200]}")
+    return elapsed, len(body)
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    
+    # Keep benchmark output out of the real cache
+    os.environ.setdefault('PDF_CACHE_FOLDER', tempfile.mkdtemp(prefix='pdf_cache_bench_'))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app
+    
+    client = create_app().test_client()
+    
+    first_ms, size = timed_post(client, build_rationale(scale, variant=-1))
+    fresh = [timed_post(client, build_rationale(scale, variant=i))[0] for i in range(runs)]
+    cached = [timed_post(client, build_rationale(scale, variant=0))[0] for _ in range(runs)]
+    
+    print(f"Rationale scale {scale} ({size / 1024:.0f} KB PDF), {runs} runs")
+    print("-" * 50)
+    print(f"First render (imports + styles): {first_ms:8.1f} ms")
+    print(f"Fresh render (median):           {statistics.median(fresh):8.1f} ms")
+    print(f"Unchanged re-download (median):  {statistics.median(cached):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of the OpenAI Batch API backend against the local stub.
+Usage: python check_openai_batch.py
+
+Starts tests/utils/openai_batch_stub.py on a free port, points
+BatchOpenAIService at it and sends concurrent calls through one
+OpenAIBatchCollector per scenario: every request succeeding, injected
+per-request failures, a batch that expires half way through and a batch
+that fails outright. Fails if any call gets the wrong answer or error, or
+if the calls are not packed into a single batch.
+"""
+import os
+import sys
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PROJECT_DIR, 'tests', 'utils'))
+
+import openai_batch_stub as stub  # noqa: E402
+
+CALLS_PER_SCENARIO = 4
+STUB_DELAY_SECONDS = 0.2
+
+# (name, stub settings, expected successes, text every error must contain)
+SCENARIOS = (
+    ('completed', {'final_status': 'completed', 'failures_left': 0}, CALLS_PER_SCENARIO, None),
+    ('injected failure', {'final_status': 'completed', 'failures_left': 1}, CALLS_PER_SCENARIO - 1, 'Injected failure'),
+    ('expired', {'final_status': 'expired', 'failures_left': 0}, CALLS_PER_SCENARIO // 2, 'expired'),
+    ('failed', {'final_status': 'failed', 'failures_left': 0}, 0, 'Injected batch failure'),
+)
+
+
+def start_stub():
+    """
+    Serve the stub on a free local port in a daemon thread.
+    
+    Returns:
+        The running server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), stub.OpenAIBatchStubHandler)
+    stub.OpenAIBatchStubHandler.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, name='openai-batch-stub', daemon=True).start()
+    return server
+
+
+def run_scenario(service_class, collector_class, settings):
+    """
+    Send concurrent JSON calls through a fresh collector.
+    
+    Returns:
+        Tuple of (list of (answer, error) per call, collector stats)
+    """
+    stub.state.update(delay=STUB_DELAY_SECONDS, **settings)
+    service = service_class()
+    service.collector = collector_class(service.client, window_seconds=0.2, poll_interval=0.1)
+    
+    def call(index):
+        try:
+            return service.call_with_json_response(
+                system_prompt='Return the claim analysis as JSON.',
+                user_content=f'Check call {index}',
+                max_tokens=100
+            ), None
+        except ValueError as e:
+            return None, str(e)
+    
+    with ThreadPoolExecutor(CALLS_PER_SCENARIO) as executor:
+        results = list(executor.map(call, range(CALLS_PER_SCENARIO)))
+    return results, service.collector.stats
+
+
+def main():
+    server = start_stub()
+    # Set before the app modules load, since Config reads the environment once
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    os.environ['OPENAI_API_KEY'] = 'stub-key'
+    sys.path.insert(0, PROJECT_DIR)
+    from app.services.openai_batch_service import BatchOpenAIService, OpenAIBatchCollector
+    # The failure scenarios log expected errors; the summary below reports what matters
+    logging.disable(logging.ERROR)
+    
+    failures = []
+    for name, settings, expected_ok, expected_error in SCENARIOS:
+        results, stats = run_scenario(BatchOpenAIService, OpenAIBatchCollector, settings)
+        answers = [answer for answer, _ in results if answer is not None]
+        errors = [error for _, error in results if error is not None]
+        print(f"{name:18} {len(answers)} ok, {len(errors)} failed, {stats['batches_submitted']} batch(es)")
+        
+        if len(answers) != expected_ok:
+            failures.append(f"{name}: expected {expected_ok} successful calls, got {len(answers)}")
+        if any(answer != stub.STUB_ANSWER for answer in answers):
+            failures.append(f"{name}: a call returned something other than the stub answer")
+        if expected_error and any(expected_error not in error for error in errors):
+            failures.append(f"{name}: expected every error to mention '{expected_error}', got {errors}")
+        if stats['batches_submitted'] != 1:
+            failures.append(f"{name}: expected the calls in 1 batch, got {stats['batches_submitted']}")
+        if stats['requests_failed'] != len(errors):
+            failures.append(f"{name}: collector counted {stats['requests_failed']} failures for {len(errors)} errors")
+    
+    server.shutdown()
+    print("-" * 50)
+    if failures:
+        print("❌ FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ OK")
+
+
+if __name__ == '__main__':
+    main()
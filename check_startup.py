@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the app factory.
+Usage: python check_startup.py [budget_ms]
+
+Runs `python -X importtime` on `create_app()` in a fresh interpreter and fails
+if the cumulative import time exceeds the budget or if a heavy extraction
+library is imported while routes are registered.
+"""
+import os
+import re
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 600
+
+# Libraries that must only load on first use, never at startup
+LAZY_MODULES = ('openai', 'pdfplumber', 'PyPDF2', 'requests', 'reportlab', 'app_module')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def measure_imports():
+    """
+    Import and create the app in a fresh interpreter.
+    
+    Returns:
+        Tuple of ({top_level_module: cumulative_us}, set of every module imported)
+    """
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+        cwd=project_dir,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+    
+    cumulative = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        imported.add(match.group(4))
+        if len(match.group(3)) == 1:  # Top-level imports only, so nothing is counted twice
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative, imported
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    cumulative, imported = measure_imports()
+    total_ms = sum(cumulative.values()) / 1000
+    
+    print(f"Import time for create_app(): {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    print("-" * 50)
+    for name, micros in sorted(cumulative.items(), key=lambda item: -item[1])[:10]:
+        print(f"{micros / 1000:8.1f} ms  {name}")
+    
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        failures.append(f"Imported at startup (should be lazy): {', '.join(eager)}")
+    if total_ms > budget_ms:
+        failures.append(f"Import time {total_ms:.0f} ms exceeds budget of {budget_ms:.0f} ms")
+    
+    if failures:
+        print("❌ FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ OK")
+
+
+if __name__ == '__main__':
+    main()
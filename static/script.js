@@ -42,10 +42,66 @@ let isEscalatedToSupervisor = false;
 // Flag to prevent multiple simultaneous calls to analyzeLiabilitySignals
 let isAnalyzingLiabilitySignals = false;
 
+// Set while a rationale is being generated, so a stored one does not replace the loading state
+let isGeneratingClaimRationale = false;
+
 // Store missing evidence and email tracking
 let currentMissingEvidence = [];
 let sentEmails = {}; // Track sent emails by evidence item
 
+// JSON bodies at least this large are gzipped when the browser supports CompressionStream
+const REQUEST_GZIP_MIN_BYTES = 64 * 1024;
+
+// Build fetch() options for POSTing JSON; large bodies (page text, base64 images) are sent gzipped
+async function buildJsonRequest(payload) {
+    const json = JSON.stringify(payload);
+    const headers = { 'Content-Type': 'application/json' };
+    if (json.length < REQUEST_GZIP_MIN_BYTES || typeof CompressionStream === 'undefined') {
+        return { method: 'POST', headers: headers, body: json };
+    }
+    
+    const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    const body = await new Response(stream).blob();
+    headers['Content-Encoding'] = 'gzip';
+    return { method: 'POST', headers: headers, body: body };
+}
+
+// Last response per analysis endpoint, replayed when the server answers 304 Not Modified
+const analysisResponseCache = {};
+
+// POST to an analysis endpoint, reusing the last result if the server says it is unchanged.
+// These are POSTs, so the browser cache never revalidates them; the ETag is sent by hand.
+async function fetchAnalysis(url, payload) {
+    const init = await buildJsonRequest(payload);
+    const cached = analysisResponseCache[url];
+    if (cached) {
+        init.headers['If-None-Match'] = cached.etag;
+    }
+    
+    const response = await fetch(url, init);
+    if (response.status === 304 && cached) {
+        return new Response(cached.body, { status: 200, headers: { 'Content-Type': 'application/json' } });
+    }
+    
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        analysisResponseCache[url] = { etag: etag, body: await response.clone().text() };
+    }
+    return response;
+}
+
+// Claim ID used to store facts and rationales server-side; a new one is minted for each extraction
+function newClaimId() {
+    return (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `claim-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+// Claim ID of the facts currently loaded, or null before the first extraction
+function getClaimId() {
+    return (currentFactsData && currentFactsData.claim_id) || null;
+}
+
 // Mapping function to convert evidence_needed strings to checkItem keys
 function mapEvidenceNeededToKey(evidenceNeeded) {
     if (!evidenceNeeded) return 'unknown';
@@ -398,6 +454,11 @@ function switchTab(tabName, skipLoadTimeline = false) {
         }
     }
     
+    // Reopening the claim rationale reads the stored version instead of regenerating it
+    if (tabName === 'claim-rationale' && !(currentClaimRationaleData && currentClaimRationaleData.rationale)) {
+        loadClaimRationale();
+    }
+    
     const targetTabId = tabIdMap[tabName];
     if (targetTabId) {
         const targetTab = document.getElementById(targetTabId);
@@ -903,7 +964,7 @@ function openFileInNewTab(data) {
             ${data.size ? `<div class="metadata-item"><strong>Size:</strong> ${formatFileSize(data.size)}</div>` : ''}
         </div>
         <div class="image-container">
-            <img src="${data.data}" alt="${escapeHtml(filename)}">
+            <img src="${data.viewer_url ? new URL(data.viewer_url, window.location.origin).href : data.data}" alt="${escapeHtml(filename)}">
         </div>
     </div>
 </body>
@@ -1162,15 +1223,11 @@ function extractFacts() {
     
     // Prepare files data to send
     const filesData = Object.values(uploadedFiles);
+    const claimId = newClaimId();
     
     // Send to backend
-    fetch('/extract-facts', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ files: filesData })
-    })
+    buildJsonRequest({ files: filesData, claim_id: claimId })
+    .then(init => fetch('/extract-facts', init))
     .then(async response => {
         // Try to parse JSON response
         let data;
@@ -1215,6 +1272,12 @@ function extractFacts() {
                 console.log('DEBUG: No existing acceptedVersions to preserve');
             }
             
+            // A new extraction is a new claim: its rationale history starts empty
+            data.claim_id = data.claim_id || claimId;
+            if (getClaimId() !== data.claim_id) {
+                resetClaimRationale();
+            }
+            
             currentFactsData = data;
             console.log('DEBUG: Updated currentFactsData:', currentFactsData);
             console.log('DEBUG: Updated acceptedVersions:', currentFactsData.acceptedVersions);
@@ -1261,15 +1324,11 @@ function extractFactsAndSignals() {
     
     // Prepare files data to send
     const filesData = Object.values(uploadedFiles);
+    const claimId = newClaimId();
     
     // Send to backend
-    fetch('/extract-facts', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ files: filesData })
-    })
+    buildJsonRequest({ files: filesData, claim_id: claimId })
+    .then(init => fetch('/extract-facts', init))
     .then(async response => {
         // Try to parse JSON response
         let data;
@@ -1313,6 +1372,12 @@ function extractFactsAndSignals() {
                 console.log('DEBUG: No existing acceptedVersions to preserve');
             }
             
+            // A new extraction is a new claim: its rationale history starts empty
+            data.claim_id = data.claim_id || claimId;
+            if (getClaimId() !== data.claim_id) {
+                resetClaimRationale();
+            }
+            
             currentFactsData = data;
             console.log('DEBUG: Updated currentFactsData:', currentFactsData);
             console.log('DEBUG: Updated acceptedVersions:', currentFactsData.acceptedVersions);
@@ -1352,8 +1417,8 @@ function displayFactMatrix(factsData) {
     // Switch to Fact Matrix tab
     switchTab('fact-matrix');
     
-    // Render facts table
-    renderFactTable(factsData.facts);
+    // Render facts table (first page from the server when the facts are indexed there)
+    filterFacts();
     
     // Check if there are any conflicts
     const hasConflicts = factsData.conflicts && factsData.conflicts.length > 0;
@@ -1384,11 +1449,35 @@ function renderFactTable(facts) {
     });
 }
 
+// Position of each fact object in currentFactsData.facts, so filtered or
+// sorted rows can still look up their links by original index
+let factIndexCache = { facts: null, indexByFact: null };
+
+function getOriginalFactIndex(fact, fallbackIndex) {
+    const facts = currentFactsData && currentFactsData.facts;
+    if (!facts) return fallbackIndex;
+    
+    if (factIndexCache.facts !== facts) {
+        factIndexCache = { facts: facts, indexByFact: new Map(facts.map((f, i) => [f, i])) };
+    }
+    const index = factIndexCache.indexByFact.get(fact);
+    return index === undefined ? fallbackIndex : index;
+}
+
 function getFactConflictInfo(fact, factIndex) {
     if (!currentFactsData || !currentFactsData.conflicts || currentFactsData.conflicts.length === 0) {
         return null;
     }
     
+    // Links computed by the server: fact index -> conflict indices
+    if (currentFactsData.conflict_links) {
+        const conflictIndices = currentFactsData.conflict_links[String(getOriginalFactIndex(fact, factIndex))];
+        if (!conflictIndices || conflictIndices.length === 0) {
+            return null;
+        }
+        return { conflictIndex: conflictIndices[0], conflict: currentFactsData.conflicts[conflictIndices[0]] };
+    }
+    
     const factSource = fact.source || '';
     const factValue = fact.normalized_value || fact.extracted_fact || '';
     const factValueLower = factValue.toLowerCase().trim();
@@ -1438,6 +1527,15 @@ function getFactSignalInfo(fact, factIndex) {
         return null;
     }
     
+    // Links computed by the server: fact index -> signal indices
+    if (currentLiabilitySignalsData.signal_links) {
+        const signalIndices = currentLiabilitySignalsData.signal_links[String(getOriginalFactIndex(fact, factIndex))];
+        if (!signalIndices || signalIndices.length === 0) {
+            return null;
+        }
+        return currentLiabilitySignalsData.signals[signalIndices[0]];
+    }
+    
     // Try to match fact with signal by related facts or evidence text
     const factText = (fact.extracted_fact || '').toLowerCase();
     const sourceText = (fact.source_text || '').toLowerCase();
@@ -1466,6 +1564,7 @@ function getFactSignalInfo(fact, factIndex) {
 function renderFactRow(fact, index) {
     const row = document.createElement('tr');
     row.dataset.index = index;
+    row.dataset.factIndex = getOriginalFactIndex(fact, index);
     row.dataset.factNumber = index + 1;
     row.dataset.category = fact.category || '';
     row.dataset.source = fact.source || '';
@@ -1625,9 +1724,114 @@ function toggleSourceText(index) {
     }
 }
 
+// Fact matrix paging: filters, search and sorting run on the server
+// (/claims/<claim_id>/facts) and only one page of rows is rendered at a time
+const FACT_PAGE_SIZE = 50;
+let factQueryTimer = null;
+let factQuerySeq = 0;
+
+function getFactQueryParams() {
+    const params = new URLSearchParams({
+        category: document.getElementById('categoryFilter').value,
+        source: document.getElementById('sourceFilter').value,
+        search: document.getElementById('searchFilter').value,
+        sort: document.getElementById('sortBy').value,
+        limit: String(FACT_PAGE_SIZE)
+    });
+    return params;
+}
+
 function filterFacts() {
     if (!currentFactsData || !currentFactsData.facts) return;
     
+    // Facts not indexed on the server (older responses): filter in the browser
+    if (!currentFactsData.claim_id) {
+        filterFactsLocally();
+        return;
+    }
+    
+    // Debounce typing in the search box
+    clearTimeout(factQueryTimer);
+    factQueryTimer = setTimeout(() => loadFactPage(null), 150);
+}
+
+function loadFactPage(cursor) {
+    const seq = ++factQuerySeq;
+    const params = getFactQueryParams();
+    if (cursor) params.set('cursor', cursor);
+    
+    fetch(`/claims/${encodeURIComponent(currentFactsData.claim_id)}/facts?${params.toString()}`)
+    .then(response => {
+        if (!response.ok) throw new Error(`Fact query failed: ${response.status}`);
+        return response.json();
+    })
+    .then(page => {
+        // A newer query was started while this one was in flight
+        if (seq !== factQuerySeq) return;
+        
+        // Render the browser's own fact objects so client-side edits (resolved conflicts) show
+        const facts = page.items.map(item => currentFactsData.facts[item.index]).filter(Boolean);
+        const startPosition = cursor ? factTableBody.querySelectorAll('tr[data-fact-index]').length : 0;
+        renderFactPage(facts, startPosition, page.total, page.next_cursor, Boolean(cursor));
+    })
+    .catch(err => {
+        // The worker that indexed the facts may have restarted; fall back to local filtering
+        console.warn('Fact query unavailable, filtering locally:', err);
+        if (seq === factQuerySeq) filterFactsLocally();
+    });
+}
+
+function renderFactPage(facts, startPosition, total, nextCursor, append) {
+    if (!append) {
+        renderFactTable(facts);
+    } else {
+        const moreRow = factTableBody.querySelector('.fact-load-more-row');
+        if (moreRow) moreRow.remove();
+        facts.forEach((fact, offset) => {
+            factTableBody.appendChild(renderFactRow(fact, startPosition + offset));
+        });
+    }
+    
+    if (nextCursor) {
+        const shown = startPosition + facts.length;
+        const row = document.createElement('tr');
+        row.className = 'fact-load-more-row';
+        const cell = document.createElement('td');
+        cell.colSpan = 9;
+        cell.style.textAlign = 'center';
+        cell.style.padding = '12px';
+        const button = document.createElement('button');
+        button.className = 'nav-button';
+        button.textContent = `Show more facts (${shown} of ${total})`;
+        button.onclick = () => {
+            button.disabled = true;
+            loadFactPage(nextCursor);
+        };
+        cell.appendChild(button);
+        row.appendChild(cell);
+        factTableBody.appendChild(row);
+    }
+}
+
+function syncFactIndex() {
+    if (!currentFactsData || !currentFactsData.claim_id) {
+        filterFacts();
+        return;
+    }
+    
+    // Re-index edited facts so search and sorting see the accepted values
+    fetch(`/claims/${encodeURIComponent(currentFactsData.claim_id)}/facts`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ facts: currentFactsData.facts })
+    })
+    .catch(err => console.warn('Could not re-index facts:', err))
+    .finally(() => filterFacts());
+}
+
+function filterFactsLocally() {
+    if (!currentFactsData || !currentFactsData.facts) return;
+    
     const categoryFilter = document.getElementById('categoryFilter').value;
     const sourceFilter = document.getElementById('sourceFilter').value;
     const searchFilter = document.getElementById('searchFilter').value.toLowerCase();
@@ -2065,8 +2269,8 @@ function acceptConflictVersion(conflictIndex, variantIndex, acceptedValue) {
             fact.resolved_timestamp = new Date().toISOString();
         });
         
-        // Re-render the fact table to reflect updates (always re-render to update conflict badges)
-        renderFactTable(currentFactsData.facts);
+        // Re-index the edited facts and re-render the table (always re-render to update conflict badges)
+        syncFactIndex();
     }
     
     // Update UI to show accepted version
@@ -2512,7 +2716,7 @@ function displayContent(data) {
         
         pagesDiv.innerHTML = `
             <div class="image-display">
-                <img src="${data.data}" alt="${escapeHtml(data.filename || 'Image')}" class="uploaded-image">
+                <img src="${data.viewer_url || data.data}" alt="${escapeHtml(data.filename || 'Image')}" class="uploaded-image">
             </div>
         `;
     } else if (data.type === 'audio') {
@@ -2606,7 +2810,8 @@ function displayContent(data) {
                         imgDiv.className = 'page-image';
                         
                         const imgElement = document.createElement('img');
-                        imgElement.src = img.data;
+                        // Prefer the cached thumbnail over the full model-size data URL
+                        imgElement.src = img.thumbnail_url || img.data;
                         imgElement.alt = `Image ${index + 1} from page ${page.page_number}`;
                         imgElement.loading = 'lazy';
                         
@@ -2735,13 +2940,7 @@ function analyzeLiabilitySignals() {
     console.log('LIABILITY_SIGNAL_LOG: [analyzeLiabilitySignals] Request body size:', JSON.stringify({ facts: factsData }).length, 'bytes');
     
     const requestStartTime = Date.now();
-    fetch('/analyze-liability-signals', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ facts: factsData })
-    })
+    fetchAnalysis('/analyze-liability-signals', { facts: factsData })
     .then(response => {
         const requestDuration = Date.now() - requestStartTime;
         console.log('LIABILITY_SIGNAL_LOG: [analyzeLiabilitySignals] API response received');
@@ -3092,11 +3291,13 @@ function updateLiabilityColumns(signalsData) {
     const allRows = factTableBody.querySelectorAll('tr');
     
     allRows.forEach((row, index) => {
-        const fact = currentFactsData.facts[index];
+        // Rows may be a filtered page, so look facts up by their original index
+        const factIndex = row.dataset.factIndex !== undefined ? parseInt(row.dataset.factIndex, 10) : index;
+        const fact = currentFactsData.facts[factIndex];
         if (!fact) return;
         
         // Find matching signal for this fact
-        const signalInfo = getFactSignalInfo(fact, index);
+        const signalInfo = getFactSignalInfo(fact, factIndex);
         
         // Update Signal Type cell
         const signalTypeCell = row.querySelector('.liability-signal-type-cell');
@@ -3286,13 +3487,7 @@ function checkEvidenceCompleteness() {
     const filesData = Object.values(uploadedFiles);
     
     // Send to backend
-    fetch('/check-evidence-completeness', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ files: filesData })
-    })
+    fetchAnalysis('/check-evidence-completeness', { files: filesData })
     .then(response => response.json())
     .then(data => {
         hideTabLoading('evidenceCompleteness');
@@ -3428,13 +3623,7 @@ function generateLiabilityRecommendationForTab() {
     const signalsData = currentLiabilitySignalsData.signals;
     
     // Send to backend
-    fetch('/get-liability-recommendation', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ facts: factsData, signals: signalsData })
-    })
+    fetchAnalysis('/get-liability-recommendation', { facts: factsData, signals: signalsData })
     .then(response => response.json())
     .then(data => {
         hideTabLoading('liabilityRecommendation');
@@ -3481,13 +3670,7 @@ function getLiabilityRecommendation() {
     const signalsData = currentLiabilitySignalsData.signals;
     
     // Send to backend
-    fetch('/get-liability-recommendation', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ facts: factsData, signals: signalsData })
-    })
+    fetchAnalysis('/get-liability-recommendation', { facts: factsData, signals: signalsData })
     .then(response => response.json())
     .then(data => {
         loading.style.display = 'none';
@@ -3662,18 +3845,10 @@ function generateTimeline() {
     // Trigger parallel API calls for Step 2
     Promise.all([
         // Timeline
-        fetch('/generate-timeline', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ facts: factsData })
-        }).then(r => r.json()),
+        fetchAnalysis('/generate-timeline', { facts: factsData }).then(r => r.json()),
         
         // Liability Recommendation
-        fetch('/get-liability-recommendation', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ facts: factsData, signals: signalsData })
-        }).then(r => r.json())
+        fetchAnalysis('/get-liability-recommendation', { facts: factsData, signals: signalsData }).then(r => r.json())
     ])
     .then(([timelineData, recommendationData]) => {
         hideTabLoading('timeline');
@@ -3939,6 +4114,7 @@ function generateClaimRationale() {
     }
     
     // Switch to claim rationale tab to show loading indicator
+    isGeneratingClaimRationale = true;
     switchTab('claim-rationale');
     
     // Show loading state
@@ -3957,15 +4133,11 @@ function generateClaimRationale() {
     const filesData = Object.values(uploadedFiles);
     
     // Send to backend
-    fetch('/generate-claim-rationale', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ facts: factsData, signals: signalsData, files: filesData })
-    })
+    buildJsonRequest({ facts: factsData, signals: signalsData, files: filesData, claim_id: getClaimId() })
+    .then(init => fetch('/generate-claim-rationale', init))
     .then(response => response.json())
     .then(data => {
+        isGeneratingClaimRationale = false;
         hideTabLoading('claimRationale');
         
         if (data.error) {
@@ -3982,12 +4154,45 @@ function generateClaimRationale() {
         }
     })
     .catch(err => {
+        isGeneratingClaimRationale = false;
         hideTabLoading('claimRationale');
         showError('Failed to generate claim rationale. Please try again.');
         console.error('Error:', err);
     });
 }
 
+// Forget the rationale shown for the previous claim
+function resetClaimRationale() {
+    currentClaimRationaleData = null;
+    const emptyState = document.getElementById('rationaleEmptyState');
+    const display = document.getElementById('rationaleDisplay');
+    if (emptyState) emptyState.style.display = 'block';
+    if (display) display.style.display = 'none';
+}
+
+function loadClaimRationale() {
+    const claimId = getClaimId();
+    if (isGeneratingClaimRationale || !claimId) {
+        return;
+    }
+    fetch(`/claims/${encodeURIComponent(claimId)}/rationale`)
+    .then(response => response.ok ? response.json() : null)
+    .then(data => {
+        // Ignore if nothing is stored or a rationale was generated meanwhile
+        if (!data || !data.rationale || isGeneratingClaimRationale ||
+            (currentClaimRationaleData && currentClaimRationaleData.rationale)) {
+            return;
+        }
+        currentClaimRationaleData = data;
+        updateStepIndicators();
+        updateProgress();
+        displayClaimRationale(data.rationale);
+    })
+    .catch(err => {
+        console.error('Error loading stored claim rationale:', err);
+    });
+}
+
 function displayClaimRationale(rationale) {
     // Switch to Claim Rationale tab
     switchTab('claim-rationale');
@@ -4335,7 +4540,7 @@ function saveEditedRationale() {
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({ rationale: editedRationale })
+        body: JSON.stringify({ rationale: editedRationale, claim_id: getClaimId() })
     })
     .then(response => response.json())
     .then(data => {
@@ -4457,13 +4662,7 @@ function generateEscalationPackageForModal() {
     const signalsData = currentLiabilitySignalsData.signals;
     
     // Send to backend
-    fetch('/generate-escalation-package', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ facts: factsData, signals: signalsData })
-    })
+    fetchAnalysis('/generate-escalation-package', { facts: factsData, signals: signalsData })
     .then(response => response.json())
     .then(data => {
         const modalLoading = document.getElementById('escalationModalLoading');
@@ -4656,6 +4855,9 @@ function showSuccessToast(message) {
     }, 3000);
 }
 
+// Last downloaded rationale PDF, reused when the server reports it unchanged
+let rationalePdfCache = null;
+
 function downloadClaimRationalePDF() {
     if (!currentClaimRationaleData || !currentClaimRationaleData.rationale) {
         showError('No claim rationale available to download.');
@@ -4664,15 +4866,20 @@ function downloadClaimRationalePDF() {
     
     console.log('Downloading PDF with rationale data:', currentClaimRationaleData.rationale);
     
-    // Send request to backend to generate PDF
+    // Send request to backend to generate PDF; an unchanged rationale is answered with 304
+    const headers = { 'Content-Type': 'application/json' };
+    if (rationalePdfCache) {
+        headers['If-None-Match'] = rationalePdfCache.etag;
+    }
     fetch('/download-claim-rationale-pdf', {
         method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
+        headers: headers,
         body: JSON.stringify({ rationale: currentClaimRationaleData.rationale })
     })
     .then(response => {
+        if (response.status === 304 && rationalePdfCache) {
+            return rationalePdfCache.blob;
+        }
         // Check if response is OK
         if (!response.ok) {
             // Try to parse error message from response
@@ -4689,7 +4896,11 @@ function downloadClaimRationalePDF() {
         // Check if response is actually a PDF
         const contentType = response.headers.get('content-type');
         if (contentType && contentType.includes('application/pdf')) {
-            return response.blob();
+            const etag = response.headers.get('ETag');
+            return response.blob().then(blob => {
+                rationalePdfCache = etag ? { etag: etag, blob: blob } : null;
+                return blob;
+            });
         } else {
             // If not PDF, try to parse as JSON error
             return response.json().then(errorData => {
@@ -5349,16 +5560,20 @@ function sendEmailRequest() {
                 sentEmails[key].push({
                     to: contact.email,
                     to_name: contact.name,
-                    sent_at: data.sent_at || new Date().toISOString(),
-                    message_id: data.message_id
+                    sent_at: data.sent_at || data.queued_at || new Date().toISOString(),
+                    message_id: data.message_id,
+                    status: data.status || 'sent'
                 });
             });
             
             // Update UI to show email status
             updateEmailStatusIndicators();
             
-            // Show success message
-            showSuccessMessage(`Email sent successfully to ${contact.name} (${contact.email})`);
+            // Show success message (delivery continues in the background outbox)
+            showSuccessMessage(`Email queued for ${contact.name} (${contact.email})`);
+            if (data.message_ids) {
+                pollEmailStatus(data.message_ids);
+            }
             
             // Close modal after a short delay
             setTimeout(() => {
@@ -5376,6 +5591,43 @@ function sendEmailRequest() {
     });
 }
 
+const EMAIL_STATUS_POLL_INTERVAL_MS = 2000;
+const EMAIL_STATUS_MAX_POLLS = 30;
+
+function pollEmailStatus(messageIds, attempt = 0) {
+    // Follow queued emails until the outbox reports them sent or failed
+    fetch(`/email-status?ids=${encodeURIComponent(messageIds.join(','))}`)
+        .then(response => response.json())
+        .then(data => {
+            const messages = data.messages || [];
+            const pending = [];
+            messages.forEach(message => {
+                Object.values(sentEmails).forEach(entries => {
+                    entries.forEach(entry => {
+                        if (entry.message_id === message.id) {
+                            entry.status = message.status;
+                            if (message.sent_at) {
+                                entry.sent_at = message.sent_at;
+                            }
+                        }
+                    });
+                });
+                if (message.status === 'failed') {
+                    showError(`Email to ${message.to} failed: ${message.error || 'unknown error'}`);
+                } else if (message.status !== 'sent') {
+                    pending.push(message.id);
+                }
+            });
+            updateEmailStatusIndicators();
+            if (pending.length > 0 && attempt + 1 < EMAIL_STATUS_MAX_POLLS) {
+                setTimeout(() => pollEmailStatus(pending, attempt + 1), EMAIL_STATUS_POLL_INTERVAL_MS);
+            }
+        })
+        .catch(err => {
+            console.error('Email status poll error:', err);
+        });
+}
+
 function updateEmailStatusIndicators() {
     // Update evidence completeness table to show email status
     const checksTableBody = document.getElementById('checksTableBody');
@@ -5411,8 +5663,16 @@ function updateEmailStatusIndicators() {
             // Create email sent badge
             const emailSentBadge = document.createElement('span');
             emailSentBadge.className = 'check-status status-email-sent';
-            emailSentBadge.innerHTML = '📧 Email Sent';
-            emailSentBadge.title = `Email sent to ${recipientName}${sentDate ? ` on ${sentDate}` : ''}`;
+            if (latestEmail.status === 'queued' || latestEmail.status === 'sending') {
+                emailSentBadge.innerHTML = '📧 Email Queued';
+                emailSentBadge.title = `Email to ${recipientName} is queued for delivery`;
+            } else if (latestEmail.status === 'failed') {
+                emailSentBadge.innerHTML = '📧 Email Failed';
+                emailSentBadge.title = `Email to ${recipientName} could not be delivered`;
+            } else {
+                emailSentBadge.innerHTML = '📧 Email Sent';
+                emailSentBadge.title = `Email sent to ${recipientName}${sentDate ? ` on ${sentDate}` : ''}`;
+            }
             
             // Check if status cell already has a container
             let statusContainer = statusCell.querySelector('.status-badge-container');
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI Files and Batch APIs.
+Usage: python tests/utils/openai_batch_stub.py [port] [--delay 2.0] [--fail N] [--status failed]
+
+Start the app (or batch_ingest.py --openai-batch) with
+OPENAI_BASE_URL=http://localhost:<port>/v1 and any non-empty OPENAI_API_KEY.
+Batches move to 'completed' after --delay seconds; every request gets one
+JSON answer containing the keys each claim prompt reads (facts, signals,
+liability percentages, timeline and rationale sections). The first N
+requests can be answered with an error line, or whole batches can end in
+another status, to exercise failure handling.
+
+Endpoints:
+  POST /v1/files                     Upload a batch input file (multipart)
+  GET  /v1/files/{id}/content        Download an input, output or error file
+  POST /v1/batches                   Create a batch
+  GET  /v1/batches/{id}              Retrieve a batch (completes it once due)
+  POST /v1/batches/{id}/cancel       Cancel a batch
+  GET  /stats                        Counts of files, batches and requests seen
+"""
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+files = {}
+batches = {}
+state = {'delay': 2.0, 'failures_left': 0, 'final_status': 'completed', 'requests': 0}
+lock = threading.RLock()  # Re-entered when a batch is completed inside a locked request
+
+# One answer that satisfies every claim prompt's JSON shape
+STUB_ANSWER = {
+    'facts': [
+        {
+            'source_text': 'Stub source text',
+            'extracted_fact': 'The other driver entered the intersection on a red light.',
+            'category': 'liability',
+            'source': 'police',
+            'confidence': 0.9
+        }
+    ],
+    'signals': [
+        {
+            'signal_type': 'traffic_control_violation',
+            'impact_on_liability': 'Increases other driver liability',
+            'severity_score': 0.8
+        }
+    ],
+    'claimant_liability_percent': 20,
+    'other_driver_liability_percent': 80,
+    'timeline': [{'time': 'T0', 'event': 'Collision in intersection'}],
+    'incident_summary': 'Stub incident summary.',
+    'recommendation': 'Accept liability at 80% for the other driver.',
+}
+
+
+def _now():
+    return int(time.time())
+
+
+def _file_object(file_id):
+    entry = files[file_id]
+    return {
+        'id': file_id,
+        'object': 'file',
+        'bytes': len(entry['content']),
+        'created_at': entry['created_at'],
+        'filename': entry['filename'],
+        'purpose': entry['purpose'],
+        'status': 'processed',
+    }
+
+
+def _answer(request):
+    """Build the output (or error) line for one batch input line."""
+    with lock:
+        state['requests'] += 1
+        fail = state['failures_left'] > 0
+        if fail:
+            state['failures_left'] -= 1
+    if fail:
+        return False, {
+            'id': f"batch_req_{uuid.uuid4().hex}",
+            'custom_id': request['custom_id'],
+            'response': {
+                'status_code': 500,
+                'request_id': uuid.uuid4().hex,
+                'body': {'error': {'message': 'Injected failure', 'type': 'server_error'}}
+            },
+            'error': None,
+        }
+    body = request.get('body', {})
+    return True, {
+        'id': f"batch_req_{uuid.uuid4().hex}",
+        'custom_id': request['custom_id'],
+        'response': {
+            'status_code': 200,
+            'request_id': uuid.uuid4().hex,
+            'body': {
+                'id': f"chatcmpl-{uuid.uuid4().hex}",
+                'object': 'chat.completion',
+                'created': _now(),
+                'model': body.get('model', 'gpt-4o'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': json.dumps(STUB_ANSWER)},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150},
+            }
+        },
+        'error': None,
+    }
+
+
+def _complete(batch):
+    """Produce output and error files for a batch that is due."""
+    input_lines = files[batch['input_file_id']]['content'].decode('utf-8').splitlines()
+    requests = [json.loads(line) for line in input_lines if line.strip()]
+    status = state['final_status']
+    batch['request_counts'] = {'total': len(requests), 'completed': 0, 'failed': 0}
+    batch['status'] = status
+    batch[f"{status}_at" if status != 'completed' else 'completed_at'] = _now()
+    if status == 'failed':
+        batch['errors'] = {'object': 'list', 'data': [{'code': 'invalid_request', 'message': 'Injected batch failure'}]}
+        return
+    if status == 'expired':
+        requests = requests[:len(requests) // 2]  # Only part of the batch finished
+
+    outputs, errors = [], []
+    for request in requests:
+        ok, line = _answer(request)
+        (outputs if ok else errors).append(json.dumps(line))
+    batch['request_counts'].update(completed=len(outputs), failed=len(errors))
+    for key, lines in (('output_file_id', outputs), ('error_file_id', errors)):
+        if lines:
+            file_id = f"file-{uuid.uuid4().hex}"
+            files[file_id] = {
+                'content': ('\n'.join(lines) + '\n').encode('utf-8'),
+                'filename': f"{batch['id']}_{key.split('_')[0]}.jsonl",
+                'purpose': 'batch_output',
+                'created_at': _now(),
+            }
+            batch[key] = file_id
+
+
+class OpenAIBatchStubHandler(BaseHTTPRequestHandler):
+    """Request handler mimicking the parts of the OpenAI API the batch backend uses."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        raw_body = self._read_body()
+        parts = self.path.rstrip('/').split('/')
+
+        if self.path == '/v1/files':
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode('utf-8') + raw_body
+            )
+            fields = {}
+            for part in message.iter_parts():
+                fields[part.get_param('name', header='content-disposition')] = (
+                    part.get_filename(), part.get_payload(decode=True)
+                )
+            if 'file' not in fields:
+                self._send_json(400, {'error': {'message': 'file is required', 'type': 'invalid_request_error'}})
+                return
+            file_id = f"file-{uuid.uuid4().hex}"
+            with lock:
+                files[file_id] = {
+                    'content': fields['file'][1],
+                    'filename': fields['file'][0] or 'upload.jsonl',
+                    'purpose': (fields.get('purpose') or (None, b'batch'))[1].decode('utf-8'),
+                    'created_at': _now(),
+                }
+                self._send_json(200, _file_object(file_id))
+            return
+
+        if self.path == '/v1/batches':
+            payload = json.loads(raw_body or b'{}')
+            with lock:
+                if payload.get('input_file_id') not in files:
+                    self._send_json(400, {'error': {'message': 'input_file_id not found', 'type': 'invalid_request_error'}})
+                    return
+                batch_id = f"batch_{uuid.uuid4().hex}"
+                batches[batch_id] = {
+                    'id': batch_id,
+                    'object': 'batch',
+                    'endpoint': payload.get('endpoint'),
+                    'input_file_id': payload['input_file_id'],
+                    'completion_window': payload.get('completion_window', '24h'),
+                    'status': 'in_progress',
+                    'created_at': _now(),
+                    'in_progress_at': _now(),
+                    'output_file_id': None,
+                    'error_file_id': None,
+                    'errors': None,
+                    '_due': time.time() + state['delay'],
+                }
+                self._send_json(200, {k: v for k, v in batches[batch_id].items() if not k.startswith('_')})
+            return
+
+        if len(parts) == 5 and parts[:3] == ['', 'v1', 'batches'] and parts[4] == 'cancel':
+            with lock:
+                batch = batches.get(parts[3])
+                if batch is None:
+                    self._not_found()
+                    return
+                batch['status'] = 'cancelled'
+                batch['cancelled_at'] = _now()
+                self._send_json(200, {k: v for k, v in batch.items() if not k.startswith('_')})
+            return
+
+        self._not_found()
+
+    def do_GET(self):
+        parts = self.path.rstrip('/').split('/')
+
+        if self.path == '/stats':
+            with lock:
+                self._send_json(200, {
+                    'files': len(files),
+                    'batches': len(batches),
+                    'requests': state['requests'],
+                })
+            return
+
+        if len(parts) == 4 and parts[:3] == ['', 'v1', 'batches']:
+            with lock:
+                batch = batches.get(parts[3])
+                if batch is None:
+                    self._not_found()
+                    return
+                if batch['status'] == 'in_progress' and time.time() >= batch['_due']:
+                    _complete(batch)
+                self._send_json(200, {k: v for k, v in batch.items() if not k.startswith('_')})
+            return
+
+        if len(parts) == 5 and parts[:3] == ['', 'v1', 'files'] and parts[4] == 'content':
+            with lock:
+                entry = files.get(parts[3])
+            if entry is None:
+                self._not_found()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(entry['content'])))
+            self.end_headers()
+            self.wfile.write(entry['content'])
+            return
+
+        self._not_found()
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[OPENAI BATCH STUB] {format % args}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in OpenAI Batch API server')
+    parser.add_argument('port', nargs='?', type=int, default=3040)
+    parser.add_argument('--delay', type=float, default=2.0, help='Seconds before a batch completes')
+    parser.add_argument('--fail', type=int, default=0, help='Answer the first N requests with an error line')
+    parser.add_argument('--status', default='completed', choices=('completed', 'failed', 'expired'),
+                        help='Final status of every batch')
+    args = parser.parse_args()
+
+    state.update(delay=args.delay, failures_left=args.fail, final_status=args.status)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), OpenAIBatchStubHandler)
+    print(f"OpenAI batch stub listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
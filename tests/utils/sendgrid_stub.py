@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the SendGrid v3 mail API.
+Usage: python tests/utils/sendgrid_stub.py [port] [--fail N] [--status 503] [--delay 0.0]
+
+Start the app with SENDGRID_API_URL=http://localhost:<port> (and any non-empty
+SENDGRID_API_KEY / SENDGRID_FROM_EMAIL) so emails are accepted here instead of
+being sent. The first N requests can be answered with an error status to
+exercise client retries.
+
+Endpoints:
+  POST /v3/mail/send   Accept a message (202 + X-Message-Id), or 400/401 like SendGrid
+  GET  /messages       List accepted messages as JSON
+  DELETE /messages     Clear accepted messages
+"""
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+messages = []
+state = {'failures_left': 0, 'fail_status': 503, 'delay': 0.0}
+lock = threading.Lock()
+
+
+class SendGridStubHandler(BaseHTTPRequestHandler):
+    """Request handler mimicking the parts of SendGrid the app uses."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled clients reuse connections
+
+    def _send_json(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw_body = self.rfile.read(length)
+
+        if self.path != '/v3/mail/send':
+            self._send_json(404, {'errors': [{'message': 'Not found'}]})
+            return
+
+        if state['delay']:
+            time.sleep(state['delay'])
+
+        with lock:
+            if state['failures_left'] > 0:
+                state['failures_left'] -= 1
+                self._send_json(state['fail_status'], {'errors': [{'message': 'Injected failure'}]},
+                                headers={'Retry-After': '0'})
+                return
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._send_json(401, {'errors': [{'message': 'Missing API key'}]})
+            return
+
+        try:
+            payload = json.loads(raw_body or b'{}')
+        except ValueError:
+            self._send_json(400, {'errors': [{'message': 'Invalid JSON'}]})
+            return
+
+        personalizations = payload.get('personalizations') or []
+        if not personalizations or len(personalizations) > 1000:
+            self._send_json(400, {'errors': [{'message': 'personalizations must contain 1 to 1000 items'}]})
+            return
+        if not payload.get('from', {}).get('email') or not payload.get('content'):
+            self._send_json(400, {'errors': [{'message': 'from and content are required'}]})
+            return
+
+        message_id = uuid.uuid4().hex
+        with lock:
+            messages.append({'message_id': message_id, 'received_at': time.time(), 'payload': payload})
+        self._send_json(202, headers={'X-Message-Id': message_id})
+
+    def do_GET(self):
+        if self.path != '/messages':
+            self._send_json(404, {'errors': [{'message': 'Not found'}]})
+            return
+        with lock:
+            self._send_json(200, list(messages))
+
+    def do_DELETE(self):
+        if self.path != '/messages':
+            self._send_json(404, {'errors': [{'message': 'Not found'}]})
+            return
+        with lock:
+            messages.clear()
+        self._send_json(200, {'cleared': True})
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[SENDGRID STUB] {format % args}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in SendGrid server')
+    parser.add_argument('port', nargs='?', type=int, default=3030)
+    parser.add_argument('--fail', type=int, default=0, help='Fail the first N send requests')
+    parser.add_argument('--status', type=int, default=503, help='Status code for injected failures')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering a send')
+    args = parser.parse_args()
+
+    state.update(failures_left=args.fail, fail_status=args.status, delay=args.delay)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), SendGridStubHandler)
+    print(f"SendGrid stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()